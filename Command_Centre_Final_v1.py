@@ -1,198 +1,245 @@
 import os
+import argparse
+import json
 import pandas as pd
+from contextlib import contextmanager
 from datetime import datetime
-import re
 from sqlalchemy import create_engine
 
-# Folder where Flask API saves uploaded files
-UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "uploads")
+import run_metrics
+import upload_store
 
-data_dump_path = os.path.join(UPLOAD_DIR, "Digital Dashboard Queue Names Data Dump.xlsx")
-layout_path    = os.path.join(UPLOAD_DIR, "Digital Dashboard Layout + Requirements.xlsx")
-reso_dump_path = os.path.join(UPLOAD_DIR, "Resolution Queue Volume Data.xlsx")
-reso_map_path  = os.path.join(UPLOAD_DIR, "Reso Doc Types vs Processing Queue Names.xlsx")
-boa_path       = os.path.join(UPLOAD_DIR, "BOA - Time Off Work.xlsm")
-
-pro_pf_path  = os.path.join(UPLOAD_DIR, "Personal Folder.xlsx")
-reso_pf_path = os.path.join(UPLOAD_DIR, "ECISS Resolutions Personal Folder.xlsx")
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: no cross-process locking
+    fcntl = None
+
+from db_export import enable_sqlite_transactions, export_to_databases
+from document_store import has_documents, load_documents
+from document_tracker import current_window, sla_percent, state_base, track_document_throughput
+from dump_stream import stream_distinct_dump
+from input_schema import INPUT_SCHEMAS, conform, usecols, validate_inputs
+from layout_template import (GRAND_TOTAL_LABEL, OTHER_SECTION_ROWS, OTHER_TOTAL_LABEL,
+                             category_membership, clean_columns, screen_template, table_template)
+from history_store import append_snapshot, executive_snapshot, layout_snapshot
+from pipeline_dag import Stage, discard_cached, file_fingerprint, remember_fingerprint, run_stages
+from output_writers import parse_formats, write_outputs, write_xlsx
+from queue_aggregates import build_queue_aggregates
+from rollup_engine import ChildrenOf, OverrideLevel, SumLevel, ZeroLevel, apply_rollups
+from roster_index import lookup_shifts, roster_index
+from screen_config import EXECUTIVE_METRICS, load_screen_config, metric_column
+from sql_aggregates import stream_sql_queue_aggregates
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Folder where Flask API saves uploaded files (CC_UPLOAD_DIR overrides it)
+UPLOAD_DIR = os.getenv("CC_UPLOAD_DIR", os.path.join(BASE_DIR, "uploads"))
+
+DATA_DUMP_FILE = "Digital Dashboard Queue Names Data Dump.xlsx"
+LAYOUT_FILE    = "Digital Dashboard Layout + Requirements.xlsx"
+RESO_DUMP_FILE = "Resolution Queue Volume Data.xlsx"
+RESO_MAP_FILE  = "Reso Doc Types vs Processing Queue Names.xlsx"
+BOA_FILE       = "BOA - Time Off Work.xlsm"
+
+PRO_PF_FILE  = "Personal Folder.xlsx"
+RESO_PF_FILE = "ECISS Resolutions Personal Folder.xlsx"
+
+CALENDAR_FILE = "Calendar of Events.xlsx"
+
+# The full input set: a batch containing all of these can be processed right away
+INPUT_FILENAMES = [
+    DATA_DUMP_FILE, LAYOUT_FILE, RESO_DUMP_FILE, RESO_MAP_FILE,
+    BOA_FILE, PRO_PF_FILE, RESO_PF_FILE, CALENDAR_FILE
+]
+
+def set_upload_dir(upload_dir):
+    """Point every input path at `upload_dir` (used by benchmarks and input snapshots)."""
+    global UPLOAD_DIR, data_dump_path, layout_path, reso_dump_path, reso_map_path
+    global boa_path, pro_pf_path, reso_pf_path, calendar_path
+    UPLOAD_DIR = upload_dir
+
+    data_dump_path = os.path.join(UPLOAD_DIR, DATA_DUMP_FILE)
+    layout_path    = os.path.join(UPLOAD_DIR, LAYOUT_FILE)
+    reso_dump_path = os.path.join(UPLOAD_DIR, RESO_DUMP_FILE)
+    reso_map_path  = os.path.join(UPLOAD_DIR, RESO_MAP_FILE)
+    boa_path       = os.path.join(UPLOAD_DIR, BOA_FILE)
+
+    pro_pf_path  = os.path.join(UPLOAD_DIR, PRO_PF_FILE)
+    reso_pf_path = os.path.join(UPLOAD_DIR, RESO_PF_FILE)
+
+    calendar_path = os.path.join(UPLOAD_DIR, CALENDAR_FILE)
+
+set_upload_dir(UPLOAD_DIR)
+
+# Worker processes for parallel workbook loads and stages (1 = run everything in-process)
+PIPELINE_WORKERS = int(os.getenv("CC_PIPELINE_WORKERS", "1"))
+# Stream the data dump in read-only chunks instead of loading the sheet (month-end dumps)
+STREAM_DATA_DUMP = os.getenv("CC_STREAM_DATA_DUMP", "0") == "1"
+# Where per-queue aggregates are computed: "pandas" (in process) or "sql" (pushed down to the
+# database at SQL_ENGINE_URL, raw rows loaded there and only changed inputs reloaded). The
+# category rollups and the Executive View run in pandas on either engine.
+AGGREGATION_ENGINE = os.getenv("CC_AGGREGATION_ENGINE", "pandas")
+SQL_ENGINE_URL = os.getenv("CC_SQL_ENGINE_URL", f"sqlite:///{os.path.join(BASE_DIR, 'data', 'aggregation.db')}")
+
+# Where the workbook and table snapshots are written, and which formats a run writes
+# (comma-separated: xlsx, parquet, json)
+OUTPUT_DIR = os.getenv("CC_OUTPUT_DIR", os.path.join(BASE_DIR, "output"))
+OUTPUT_FORMATS = os.getenv("CC_OUTPUT_FORMATS", "xlsx")
+
+# Memoized stage outputs, keyed by the content hash of each stage's inputs
+STAGE_CACHE_DIR = os.path.join(BASE_DIR, "data", "stage_cache")
+
+# Layout screens and Executive View sections rendered each run
+SCREENS_CONFIG_PATH = os.getenv("CC_SCREENS_CONFIG", os.path.join(BASE_DIR, "screens.json"))
+LAYOUT_SCREENS, EXECUTIVE_SECTIONS = load_screen_config(SCREENS_CONFIG_PATH)
+
+# Document index carried between runs for Accepted / QC'ed / Resolutions Completed / SLA %
+DOCUMENT_STATE_PATH = os.getenv("CC_DOCUMENT_STATE", os.path.join(BASE_DIR, "data", "document_state.npz"))
+
+# Lock files shared by every process that can start a run (Flask worker, cron, manual)
+RUN_LOCK_PATH = os.path.join(BASE_DIR, "data", "preprocessing.lock")
+QUEUE_LOCK_PATH = os.path.join(BASE_DIR, "data", "preprocessing.queued.lock")
+
+# Rewritten after every completed run; readers use its mtime to invalidate cached screens
+RUN_MARKER_PATH = os.path.join(BASE_DIR, "data", "last_run.json")
+# Structured per-stage / per-input spans of recent runs, served by /api/metrics
+RUN_METRICS_PATH = os.path.join(BASE_DIR, "data", "run_metrics.json")
 
-calendar_path = os.path.join(UPLOAD_DIR, "Calendar of Events.xlsx")
+# --- SQLite (local backup) ---
+SQLITE_PATH = os.path.join(BASE_DIR, "data", "Processed_Data_DB.db")
 
-def clean_columns(df):
-    df.columns = (
-        df.columns.astype(str)
-        .str.strip()
-        .str.replace("\xa0", " ", regex=False)
-        .str.replace(r"\s+", " ", regex=True)
-    )
-    return df
+# --- PostgreSQL (Minikube database) ---
+POSTGRES_USER = "cc_pipeline_user"
+POSTGRES_PASSWORD = "admin"
+POSTGRES_DB = "command_centre"
+POSTGRES_HOST = "192.168.49.2"    # Python runs on the host
+POSTGRES_PORT = "30032"        # NodePort from your YAML
 
 def safe_numeric(series_or_scalar, output_df):
     if isinstance(series_or_scalar, (int, float)):
         return pd.Series([series_or_scalar] * len(output_df), index=output_df.index)
     return pd.to_numeric(series_or_scalar, errors="coerce").fillna(0)
 
-dump_wb = pd.ExcelFile(data_dump_path)
-data_dump_df = pd.read_excel(dump_wb, sheet_name="ag-grid")
-
-reso_df = pd.read_excel(reso_dump_path, sheet_name="ag-grid")
-reso_map_df = pd.read_excel(reso_map_path, sheet_name="Added by Charmaine")
-
-pro_pf_df = pd.read_excel(pro_pf_path)
-reso_pf_df = pd.read_excel(reso_pf_path)
-
-# --- Normalize Lock Status ---
-data_dump_df["Lock Status"] = (
-    data_dump_df["Lock Status"]
-    .astype(str)
-    .str.strip()
-    .str.upper()
-    .replace({"Y": "LOCKED", "LOCKED": "LOCKED"})
-)
-
-def map_personal_folder_counts(folder_df, reso_map_df):
-    counts = folder_df.groupby("Doc Type")["Document ID"].nunique().reset_index(name="PFCount")
-    mapped = pd.merge(
-        counts,
-        reso_map_df[["Doc_Type", "Queue_Desc"]],
-        left_on="Doc Type",
-        right_on="Doc_Type",
-        how="left"
-    )
-    return mapped.groupby("Queue_Desc")["PFCount"].sum().to_dict()
+# --- Workbook loaders ---
+def read_input(path, sheet_name=0, header=0, schema=None):
+    """pd.read_excel under an input-file span (parse time, file size, rows).
+
+    With a `schema` (see input_schema.INPUT_SCHEMAS) only its columns are kept, already
+    converted to their compact dtypes; the sheet comes from the schema.
+    """
+    kwargs = {}
+    if schema is not None:
+        sheet_name = INPUT_SCHEMAS[schema].sheet
+        kwargs["usecols"] = usecols(schema)
+    with run_metrics.span(os.path.basename(path), kind="input", bytes=os.path.getsize(path),
+                          sheet=sheet_name if isinstance(sheet_name, str) else None) as entry:
+        df = pd.read_excel(path, sheet_name=sheet_name, header=header, **kwargs)
+        if schema is not None:
+            df = conform(df, schema, source=f"{os.path.basename(path)} [{sheet_name}]")
+        entry["rows_out"] = len(df)
+    return df
+
+_reference_cache = {}   # (file name, sheet, header, schema) -> (fingerprint, frame)
+
+def read_reference_sheet(path, sheet_name=0, header=0, schema=None):
+    """Parsed reference sheet (e.g. the reso mapping), reused while the file is unchanged.
+    Keyed by file name, not path: every promoted upload snapshot lives in a new directory."""
+    key = (os.path.basename(path), sheet_name, header, schema)
+    fingerprint = file_fingerprint(path)
+    cached = _reference_cache.get(key)
+    if cached is None or cached[0] != fingerprint:
+        cached = (fingerprint, read_input(path, sheet_name=sheet_name, header=header, schema=schema))
+        _reference_cache[key] = cached
+    return cached[1].copy()
+
+def input_paths():
+    """Schema name -> current path of every input read by column name."""
+    return {
+        "data_dump": data_dump_path,
+        "reso_dump": reso_dump_path,
+        "reso_map": reso_map_path,
+        "pro_pf": pro_pf_path,
+        "reso_pf": reso_pf_path,
+        "boa": boa_path,
+        "calendar": calendar_path,
+    }
 
-# --- Processing function for layout sheets (GDC & HNW) ---
-def process_layout_sheet(sheet_name, category_headers):
-    layout_wb = pd.ExcelFile(layout_path)
-    layout_df = pd.read_excel(layout_wb, sheet_name=sheet_name, header=None)
+def load_data_dump():
+    return read_input(data_dump_path, schema="data_dump")
 
-    header_row_idx = layout_df[layout_df.apply(
-        lambda row: row.astype(str).str.contains("PRO Queue", case=False).any(),
-        axis=1
-    )].index[0]
+def stream_data_dump():
+    """Distinct (Queue, Document ID, Lock Status) rows of the dump, read in bounded memory.
+    Gives build_queue_aggregates exactly the counts load_data_dump() would."""
+    with run_metrics.span(os.path.basename(data_dump_path), kind="input", bytes=os.path.getsize(data_dump_path),
+                          sheet=INPUT_SCHEMAS["data_dump"].sheet, mode="stream") as entry:
+        df = stream_distinct_dump(data_dump_path)
+        entry["rows_out"] = len(df)
+    return df
 
-    columns = layout_df.iloc[header_row_idx].tolist()
-    columns = [str(c).strip().replace("\xa0", " ") for c in columns]
+def load_reso_dump():
+    return read_input(reso_dump_path, schema="reso_dump")
 
-    output_df = layout_df.iloc[header_row_idx+1:].reset_index(drop=True)
-    output_df.columns = columns
-    output_df = clean_columns(output_df)
+def load_reso_map():
+    return read_reference_sheet(reso_map_path, schema="reso_map")
 
-    if "QueueName" not in output_df.columns:
-        output_df.insert(0, "QueueName", layout_df.iloc[header_row_idx+1:, 0].reset_index(drop=True))
+def load_pro_personal_folder():
+    return read_input(pro_pf_path, schema="pro_pf")
 
-    output_df["QueueName"] = (
-        output_df["QueueName"].astype(str)
-        .str.strip()
-        .str.replace(r"\s+", " ", regex=True)
-    )
+def load_reso_personal_folder():
+    return read_input(reso_pf_path, schema="reso_pf")
 
-    # --- PRO QUEUES ---
-    pro_entries = data_dump_df[~data_dump_df["Queue"].astype(str).str.endswith("QC", na=False)].copy()
-    pro_counts = pro_entries.groupby("Queue")["Document ID"].nunique().to_dict()
-    pro_locked_counts = pro_entries[pro_entries["Lock Status"] == "LOCKED"].groupby("Queue")["Document ID"].nunique().to_dict()
-
-    output_df["PRO Queue"] = output_df["QueueName"].map(pro_counts).fillna(0).astype(int)
-    output_df["User Locked PRO"] = output_df["QueueName"].map(pro_locked_counts).fillna(0).astype(int)
-
-    # --- QC QUEUES ---
-    qc_entries = data_dump_df[data_dump_df["Queue"].astype(str).str.endswith("QC", na=False)].copy()
-    qc_entries["BaseQueue"] = qc_entries["Queue"].astype(str).str.replace(r"QC$", "", regex=True).str.strip()
-
-    qc_counts = qc_entries.groupby("BaseQueue")["Document ID"].nunique().to_dict()
-    qc_locked_counts = qc_entries[qc_entries["Lock Status"] == "LOCKED"].groupby("BaseQueue")["Document ID"].nunique().to_dict()
-
-    output_df["QC Queue"] = output_df["QueueName"].map(qc_counts).fillna(0).astype(int)
-    output_df["User Locked QC"] = output_df["QueueName"].map(qc_locked_counts).fillna(0).astype(int)
-
-    # --- Processed Volumes ---
-    processed_counts = data_dump_df.groupby("Queue")["Document ID"].nunique().to_dict()
-    output_df["Processed Volumes"] = output_df["QueueName"].map(processed_counts).fillna(0).astype(int)
-
-    # --- Reso Queue Mapping (only for GDC) ---
-    if sheet_name == "CC Full View of GDC+GTA screen1":
-        reso_counts = reso_df.groupby("Doc Type")["Doc ID"].nunique().reset_index(name="ResoCount")
-        reso_with_desc = pd.merge(reso_counts, reso_map_df[["Doc_Type", "Queue_Desc"]],
-                                  left_on="Doc Type", right_on="Doc_Type", how="left")
-        reso_final_counts = reso_with_desc.groupby("Queue_Desc")["ResoCount"].sum().to_dict()
-        output_df["Reso Queue"] = output_df["QueueName"].map(reso_final_counts).fillna(0).astype(int)
-
-    # PRO Personal Folders
-    pro_pf_counts = map_personal_folder_counts(pro_pf_df, reso_map_df)
-    if "PRO Personal Folders" in output_df.columns:
-        output_df["PRO Personal Folders"] = output_df["QueueName"].map(pro_pf_counts).fillna(0).astype(int)
-
-    # RESO Personal Folders
-    reso_pf_counts = map_personal_folder_counts(reso_pf_df, reso_map_df)
-    if "RESO Personal Folders" in output_df.columns:
-        output_df["RESO Personal Folders"] = output_df["QueueName"].map(reso_pf_counts).fillna(0).astype(int)
-
-    output_df["Accepted Volumes"] = 0
-    output_df["QC'ed Volumes"] = 0
-    output_df["Resolutions Completed Volumes"] = 0
-    output_df["SLA % Completed"] = 0
-
-    # --- Build Queue → Category mapping ---
-    queue_to_category = {}
-    current_cat = None
-    for q in output_df["QueueName"]:
-        if q in category_headers:
-            current_cat = q
-        elif q == "Grand Total by Queue:":
-            continue
-        elif current_cat is not None:
-            queue_to_category[q] = current_cat
-    output_df["Category"] = output_df["QueueName"].map(queue_to_category)
+def sql_queue_aggregates(db_url):
+    """Per-queue aggregates computed in the database at `db_url`, fed straight from the input workbooks."""
+    return stream_sql_queue_aggregates(input_paths(), db_url)
+
+# --- Layout screen engine: renders any configured screen (screens.json) ---
+def process_layout_sheet(screen, queue_aggregates, throughput):
+    # Header position, cleaned columns and row labels come precompiled (parsed once per layout file)
+    template = screen_template(layout_path, screen.sheet, STAGE_CACHE_DIR)
+    output_df = template.frame.copy()
+
+    # --- Queue metrics (one aligned lookup into the shared aggregate table) ---
+    queue_metrics = queue_aggregates.reindex(output_df["QueueName"]).fillna(0).astype(int)
+    queue_metrics.index = output_df.index
+
+    for col in screen.metrics:
+        if col in queue_metrics.columns:
+            output_df[col] = queue_metrics[col]
+
+    # --- Throughput since the start of the window (document moves between successive dumps) ---
+    queue_throughput = throughput.reindex(output_df["QueueName"]).fillna(0).astype(int)
+    queue_throughput.index = output_df.index
+    for col in throughput.columns:
+        # "SLA Met Volumes" is only needed for SLA % and dropped once that is computed
+        wanted = "SLA % Completed" if col == "SLA Met Volumes" else col
+        if wanted in screen.metrics:
+            output_df[col] = queue_throughput[col]
+
+    # --- Queue → Category mapping ---
+    output_df["Category"] = category_membership(template, set(screen.categories))
 
     numeric_metrics = [c for c in [
         "PRO Queue", "QC Queue", "User Locked PRO", "User Locked QC",
         "Processed Volumes", "Reso Queue",
         "PRO Personal Folders", "RESO Personal Folders",  # added into numeric metrics
-        "Accepted Volumes", "QC'ed Volumes", "Resolutions Completed Volumes"
+        "Accepted Volumes", "QC'ed Volumes", "Resolutions Completed Volumes", "SLA Met Volumes"
     ] if c in output_df.columns]
 
-    for cat in category_headers:
-        child_rows = output_df[output_df["Category"] == cat]
-        totals = child_rows[numeric_metrics].sum(numeric_only=True)
-        for col in numeric_metrics:
-            output_df.loc[output_df["QueueName"] == cat, col] = totals.get(col, 0)
-
-    special_map = {
-        "Doc Translation": "DocTranslation",
-        "Reso Validation": "ResolutionValidation",
-        "RMA": "ResolutionManagerApproval",
-        "Index Queue": "General Index"
-    }
-    special_counts = (
-        data_dump_df[data_dump_df["Queue"].isin(special_map.values())]
-        .groupby("Queue")["Document ID"].nunique().to_dict()
-    )
-    for label, queue_val in special_map.items():
-        if label in output_df["QueueName"].values:
-            output_df.loc[output_df["QueueName"] == label, "PRO Queue"] = special_counts.get(queue_val, 0)
-
-    other_section_rows = [
-        "Other - Total",
-        "Incoming Fax Queue",
-        "Incoming Email Queue",
-        "Index Queue",
-        "Doc Translation",
-        "Reso Validation",
-        "RMA",
-        "United Doc Translation"
+    # --- Rollups: category headers, "Other" section and grand total, one level at a time ---
+    special_counts = queue_aggregates["Processed Volumes"]
+    levels = [
+        SumLevel({cat: ChildrenOf(cat) for cat in screen.categories}),
+        OverrideLevel("PRO Queue", {label: special_counts.get(q, 0) for label, q in screen.special_queues.items()}),
+        SumLevel({OTHER_TOTAL_LABEL: OTHER_SECTION_ROWS}),
+        ZeroLevel([OTHER_TOTAL_LABEL] + OTHER_SECTION_ROWS, keep=["PRO Queue"]),
+        SumLevel({GRAND_TOTAL_LABEL: sorted(screen.categories) + [OTHER_TOTAL_LABEL]}),
     ]
-    other_totals = output_df.loc[output_df["QueueName"].isin(other_section_rows[1:]), numeric_metrics].sum(numeric_only=True)
-    for col in numeric_metrics:
-        output_df.loc[output_df["QueueName"] == "Other - Total", col] = other_totals.get(col, 0)
-    for row in other_section_rows:
-        for col in numeric_metrics:
-            if col != "PRO Queue":
-                output_df.loc[output_df["QueueName"] == row, col] = 0
-
-    grand_total_sources = set(category_headers) | {"Other - Total"}
-    grand_totals = output_df.loc[output_df["QueueName"].isin(grand_total_sources), numeric_metrics].sum(numeric_only=True)
-    for col in numeric_metrics:
-        output_df.loc[output_df["QueueName"] == "Grand Total by Queue:", col] = grand_totals.get(col, 0)
+    apply_rollups(output_df, numeric_metrics, levels, output_df["QueueName"], output_df["Category"])
+
+    # SLA % from the rolled-up counts, so category and total rows are volume-weighted
+    if "SLA Met Volumes" in output_df.columns:
+        output_df["SLA % Completed"] = sla_percent(output_df["QC'ed Volumes"], output_df["SLA Met Volumes"])
+        output_df = output_df.drop(columns=["SLA Met Volumes"])
 
     if "Total" in output_df.columns:
         output_df["Total"] = (
@@ -226,56 +273,38 @@ def process_layout_sheet(sheet_name, category_headers):
 
     return output_df
 
-def process_executive_view(df_gdc, df_hnw):
+def process_executive_view(sections, **screens):
+    """Executive View from the rendered layout screens (keyword per screen name), one block per section."""
     time_now = datetime.now().strftime("%I:%M %p")
     columns = [
         "Executive View",
-        "Total Outstanding Processing Volumes",
-        "Total Outstanding Quality Control Volumes",
+        *EXECUTIVE_METRICS,
         f"Bulletin Board (Generated at {time_now})"
     ]
     exec_rows = []
 
-    # --- GDC/GTA ---
-    gdc_cats = ["FINANCIAL - Total", "QUASI NON-FINANCIAL - Total", "NON-FINANCIAL - Total"]
-    gdc_proc = df_gdc.loc[gdc_cats, "PRO Queue"].sum()
-    gdc_qc   = df_gdc.loc[gdc_cats, "QC Queue"].sum()
-    exec_rows.append(["GDC/GTA Volumes", gdc_proc, gdc_qc, ""])
-    for cat in gdc_cats:
-        exec_rows.append([cat.replace(" - Total", ""), df_gdc.loc[cat, "PRO Queue"], df_gdc.loc[cat, "QC Queue"], ""])
-
-    # --- HNW ---
-    hnw_cats = ["INSTITUTIONAL - Total", "APP INVESTMENT - Total", "UNITED FINANCIALS - Total"]
-    hnw_proc = df_hnw.loc[hnw_cats, "PRO Queue"].sum()
-    hnw_qc   = df_hnw.loc[hnw_cats, "QC Queue"].sum()
-    exec_rows.append(["HNW Volumes", hnw_proc, hnw_qc, ""])
-    for cat in hnw_cats:
-        exec_rows.append([cat.replace(" - Total", ""), df_hnw.loc[cat, "PRO Queue"], df_hnw.loc[cat, "QC Queue"], ""])
-
-    # --- RESOLUTION NIGO ---
-    if "Reso Queue" in df_gdc.columns:
-        reso_proc = df_gdc.loc[gdc_cats, "Reso Queue"].sum()
-        exec_rows.append(["RESOLUTION NIGO Volumes", reso_proc, 0, ""])
-        for cat in gdc_cats:
-            exec_rows.append([cat.replace(" - Total", ""), df_gdc.loc[cat, "Reso Queue"], 0, ""])
-
-    # --- Other Queues ---
-    other_rows = [
-        "Other - Total",
-        "Incoming Email Queue",
-        "Incoming Fax Queue",
-        "Index Queue",
-        "Doc Translation",
-        "Reso Validation",
-        "RMA"
-    ]
-    if "Other - Total" in df_gdc.index:
-        exec_rows.append(["Other Queues", df_gdc.loc["Other - Total", "PRO Queue"], 0, ""])
-        for row in other_rows[1:]:
-            if row in df_gdc.index:
-                exec_rows.append([row, df_gdc.loc[row, "PRO Queue"], 0, ""])
-            else:
-                exec_rows.append([row, 0, 0, ""])
+    for section in sections:
+        df = screens[section.screen]
+        if section.processing not in df.columns:
+            continue
+        if section.total_row is not None and section.total_row not in df.index:
+            continue
+
+        def cell(row, col):
+            if col is None or col not in df.columns or row not in df.index:
+                return 0
+            return df.loc[row, col]
+
+        if section.total_row is not None:
+            header = [cell(section.total_row, section.processing), cell(section.total_row, section.quality_control)]
+        else:
+            present = [row for row in section.rows if row in df.index]
+            header = [df.loc[present, col].sum() if col in df.columns else 0
+                      for col in (section.processing, section.quality_control)]
+        exec_rows.append([section.label] + header + [""])
+        for row in section.rows:
+            exec_rows.append([row.replace(" - Total", ""), cell(row, section.processing),
+                              cell(row, section.quality_control), ""])
 
     df_exec = pd.DataFrame(exec_rows, columns=columns)
     return df_exec
@@ -283,48 +312,11 @@ def process_executive_view(df_gdc, df_hnw):
 
 def process_users_productivity():
     # --- Load USERS_Productivity screen2 from layout ---
-    layout_df = pd.read_excel(layout_path, sheet_name="USERS_Productivity screen2", header=None)
-
-    
-    columns = layout_df.iloc[0].tolist()
-    layout_df = layout_df[1:].reset_index(drop=True)
-    layout_df.columns = [str(c).strip() for c in columns]
-
-    # --- Load BOA MasterList ---
-    boa_df = pd.read_excel(boa_path,
-        sheet_name="MasterList_of_Members"
-    )
-
-    # --- Normalization helpers ---
-    def normalize_agent_name(name):
-        return str(name).strip().upper()
-
-    def normalize_supervisor_name(name):
-        base = re.sub(r"-.*", "", str(name)).strip()  
-        if "," in base:  
-            parts = base.split(",")
-            last = parts[0].strip()
-            first = parts[1].strip().split()[0]  
-            return f"{first} {last}".upper()
-        else:
-            return base.upper()
-
-    
-    boa_df["Member_clean"] = boa_df["Member Name"].astype(str).apply(normalize_agent_name)
-    boa_df["Supervisor_clean"] = boa_df["Supervisor"].astype(str).apply(normalize_supervisor_name)
+    layout_df = table_template(layout_path, "USERS_Productivity screen2", STAGE_CACHE_DIR).frame.copy()
 
-    layout_df["Name_clean"] = layout_df[layout_df.columns[0]].astype(str).apply(normalize_agent_name)
-    layout_df["Supervisor_clean"] = layout_df[layout_df.columns[0]].astype(str).apply(normalize_supervisor_name)
-
-    shift_map = boa_df.set_index("Member_clean")["Shift Schedule"].to_dict()
-    supervisor_shift_map = boa_df.set_index("Supervisor_clean")["Shift Schedule"].to_dict()
-
-    layout_df["Shift Schedule"] = layout_df["Name_clean"].map(shift_map)
-    layout_df["Shift Schedule"] = layout_df["Shift Schedule"].fillna(
-        layout_df["Supervisor_clean"].map(supervisor_shift_map)
-    )
-
-    layout_df = layout_df.drop(columns=["Name_clean", "Supervisor_clean"], errors="ignore")
+    # --- Shift Schedule from the BOA MasterList (indexed once per BOA file) ---
+    roster = roster_index(boa_path, STAGE_CACHE_DIR, lambda: read_input(boa_path, schema="boa"))
+    layout_df["Shift Schedule"] = lookup_shifts(roster, layout_df[layout_df.columns[0]])
 
     # Update Bulletin Board column with timestamp
     time_now = datetime.now().strftime("%I:%M %p")
@@ -336,7 +328,7 @@ def process_users_productivity():
     return layout_df
 
 def process_calendar_events():
-    cal_df = pd.read_excel(calendar_path, sheet_name="Events")
+    cal_df = read_input(calendar_path, schema="calendar")
 
     cal_df.columns = [str(c).strip() for c in cal_df.columns]
 
@@ -354,104 +346,273 @@ def process_calendar_events():
 
     return cal_df
 
-df_gdc = process_layout_sheet(
-    sheet_name="CC Full View of GDC+GTA screen1",
-    category_headers={"FINANCIAL - Total", "QUASI NON-FINANCIAL - Total", "NON-FINANCIAL - Total"}
-)
-
-df_hnw = process_layout_sheet(
-    sheet_name="CC Full View of HNW Qs1bis",
-    category_headers={"INSTITUTIONAL - Total", "APP INVESTMENT - Total", "UNITED FINANCIALS - Total"}
-)
-
-# --- Executive View (depends on GDC + HNW) ---
-df_exec = process_executive_view(df_gdc, df_hnw)
-
-# --- Users Productivity ---
-df_users = process_users_productivity()
-
-df_calendar = process_calendar_events()
-
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-output_path = rf"C:\Users\edmichaeljoil.fajard\Documents\CBPS - Command Centre Dashboard\Processed_Dashboard_Output.xlsx"
-
-with pd.ExcelWriter(output_path, engine="openpyxl") as writer:
-    df_gdc.to_excel(writer, index=False, sheet_name="CC Full View of GDC+GTA screen1")
-    df_hnw.to_excel(writer, index=False, sheet_name="CC Full View of HNW Qs1bis")
-    df_users.to_excel(writer, index=False, sheet_name="USERS_Productivity screen2")
-    df_exec.to_excel(writer, index=False, sheet_name="Executive View")
-    df_calendar.to_excel(writer, index=False, sheet_name="Calendar of Events")
-    
-print(f"Processed dashboard saved to {output_path}")
-
-# --- Export to both SQLite and PostgreSQL via SQLAlchemy ---
-
-# --- SQLite (local backup) ---
-sqlite_path = os.path.join(os.path.dirname(__file__), "data", "Processed_Data_DB.db")
-sqlite_engine = create_engine(f"sqlite:///{sqlite_path}", echo=False)
-
-# --- PostgreSQL (Minikube database) ---
-POSTGRES_USER = "cc_pipeline_user"
-POSTGRES_PASSWORD = "admin"
-POSTGRES_DB = "command_centre"
-POSTGRES_HOST = "192.168.49.2"    # Python runs on the host
-POSTGRES_PORT = "30032"        # NodePort from your YAML
-
-try:
-    postgres_engine = create_engine(
-        f"postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}",
-        echo=False
-    )
-    print("PostgreSQL connection initialized.")
-except Exception as e:
-    postgres_engine = None
-    print("Could not connect to PostgreSQL:", e)
-
 # --- Clean up column names ---
 def sanitize_columns(df):
     df = df.copy()
     df.columns = [
         f"col_{i}" if (not str(col).strip() or str(col).lower() == "nan")
-        else str(col).strip().replace(" ", "_").replace("-", "_")
+        else metric_column(col)
         for i, col in enumerate(df.columns)
     ]
     return df
 
-# --- Prepare all DataFrames ---
-df_dict = {
-    "gdc_gta": sanitize_columns(df_gdc),
-    "hnw": sanitize_columns(df_hnw),
-    "users_productivity": sanitize_columns(df_users),
-    "executive_view": sanitize_columns(df_exec),
-    "calendar_of_events": sanitize_columns(df_calendar)
-}
-
-# --- Function to save to both databases ---
-def save_to_databases(df_dict, sqlite_engine, postgres_engine=None):
-    for name, df in df_dict.items():
-        try:
-            # Save to SQLite
-            df.to_sql(name, sqlite_engine, if_exists="replace", index=False)
-            print(f"Saved '{name}' to SQLite")
-
-            # Save to PostgreSQL (if available)
-            if postgres_engine:
-                df.to_sql(name, postgres_engine, if_exists="replace", index=False)
-                print(f"Saved '{name}' to PostgreSQL")
-        except Exception as e:
-            print(f"Error saving '{name}':", e)
-
-# --- Execute save ---
-save_to_databases(df_dict, sqlite_engine, postgres_engine)
-
-print(f"SQLite database saved to {sqlite_path}")
-if postgres_engine:
-    print("PostgreSQL export completed successfully.")
-
+# --- Database engines (created once per process and reused between runs) ---
+_engines = {}
 
+def get_sqlite_engine():
+    if "sqlite" not in _engines:
+        _engines["sqlite"] = enable_sqlite_transactions(
+            create_engine(f"sqlite:///{SQLITE_PATH}", echo=False)
+        )
+    return _engines["sqlite"]
 
+def get_postgres_engine():
+    if "postgres" not in _engines:
+        try:
+            _engines["postgres"] = create_engine(
+                f"postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}",
+                echo=False
+            )
+            print("PostgreSQL connection initialized.")
+        except Exception as e:
+            print("Could not connect to PostgreSQL:", e)
+            return None
+    return _engines["postgres"]
+
+# --- Input snapshot: every run reads one complete, immutable set of inputs ---
+def use_input_snapshot():
+    """Promote the latest complete set of staged uploads and point the input paths at it.
+
+    While some input has never been staged, the run reads the previous snapshot. On first use,
+    inputs that only exist in the plain uploads folder are staged from there. Returns the
+    snapshot record, or None when there is no complete set yet (inputs are then read from
+    UPLOAD_DIR and validate_inputs names whatever is missing).
+    """
+    snapshot = upload_store.promote(INPUT_FILENAMES) or upload_store.current_snapshot()
+    if snapshot is None:
+        adopted = upload_store.adopt_directory(UPLOAD_DIR, INPUT_FILENAMES)
+        if adopted:
+            print(f"Staged {len(adopted)} input(s) from {UPLOAD_DIR}: {', '.join(adopted)}")
+        snapshot = upload_store.promote(INPUT_FILENAMES)
+    if snapshot is None:
+        return None
+    set_upload_dir(snapshot["dir"])
+    # The store already hashed every file: reuse those hashes as the stage-cache fingerprints
+    for name, entry in snapshot["files"].items():
+        remember_fingerprint(os.path.join(snapshot["dir"], name), entry["sha256"])
+    print(f"Reading input snapshot {snapshot['id']} (promoted {snapshot['promoted_at']}).")
+    return snapshot
+
+# --- Single-flight execution across processes ---
+@contextmanager
+def single_flight():
+    """Allow one active run plus at most one waiting run across all processes.
+
+    Yields True once this process holds the run lock, or False straight away when another
+    run is already waiting: that run starts after the active one and sees the same inputs.
+    """
+    if fcntl is None:
+        yield True
+        return
+
+    os.makedirs(os.path.dirname(RUN_LOCK_PATH), exist_ok=True)
+    with open(QUEUE_LOCK_PATH, "a") as queue_fh, open(RUN_LOCK_PATH, "a") as run_fh:
+        try:
+            fcntl.flock(queue_fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print("A preprocessing run is already queued; coalescing with it.")
+            yield False
+            return
+        try:
+            fcntl.flock(run_fh, fcntl.LOCK_EX)
+        finally:
+            fcntl.flock(queue_fh, fcntl.LOCK_UN)
+        try:
+            yield True
+        finally:
+            fcntl.flock(run_fh, fcntl.LOCK_UN)
+
+# --- Stage DAG: a stage reruns only when its input files or upstream outputs change ---
+def build_stages(stream_dump=False, engine="pandas"):
+    try:
+        tracked_inputs = ":".join(file_fingerprint(p) for p in (data_dump_path, reso_dump_path, reso_map_path))
+    except OSError:
+        tracked_inputs = None
+    return [
+        # --- Raw workbook loads (independent of each other, never memoized) ---
+        Stage("data_dump", stream_data_dump if stream_dump else load_data_dump,
+              files=(data_dump_path,), transient=True),
+        Stage("reso_dump", load_reso_dump, files=(reso_dump_path,), transient=True),
+        Stage("reso_map", load_reso_map, files=(reso_map_path,), transient=True),
+        Stage("pro_pf", load_pro_personal_folder, files=(pro_pf_path,), transient=True),
+        Stage("reso_pf", load_reso_personal_folder, files=(reso_pf_path,), transient=True),
+        # --- Document moves since the previous run's dumps (keyed on the index they are applied to) ---
+        Stage("document_throughput", track_document_throughput,
+              deps={"data_dump_df": "data_dump", "reso_df": "reso_dump", "reso_map_df": "reso_map"},
+              params={
+                  "state_path": DOCUMENT_STATE_PATH,
+                  "window": current_window(),
+                  "inputs": tracked_inputs,
+                  "base": state_base(DOCUMENT_STATE_PATH, tracked_inputs)
+              }),
+        # --- Per-queue aggregates, computed once and shared by every layout screen ---
+        # (sql: the raw tables are streamed from the workbooks, the loader stages are not used)
+        Stage("queue_aggregates", sql_queue_aggregates,
+              files=(data_dump_path, reso_dump_path, reso_map_path, pro_pf_path, reso_pf_path),
+              params={"db_url": SQL_ENGINE_URL})
+        if engine == "sql" else
+        Stage("queue_aggregates", build_queue_aggregates,
+              deps={
+                  "data_dump_df": "data_dump",
+                  "reso_df": "reso_dump",
+                  "reso_map_df": "reso_map",
+                  "pro_pf_df": "pro_pf",
+                  "reso_pf_df": "reso_pf"
+              }),
+        # --- Layout screens (screens.json), all rendered from the same aggregates ---
+        *[Stage(screen.name, process_layout_sheet,
+                files=(layout_path,),
+                deps={"queue_aggregates": "queue_aggregates", "throughput": "document_throughput"},
+                params={"screen": screen})
+          for screen in LAYOUT_SCREENS],
+        # --- Document-level rows behind the counts, for drill-downs ---
+        # (writes the SQLite table itself; only the row count is memoized)
+        Stage("documents", load_documents,
+              deps={
+                  "data_dump_df": "data_dump",
+                  "reso_df": "reso_dump",
+                  "reso_map_df": "reso_map",
+                  "pro_pf_df": "pro_pf",
+                  "reso_pf_df": "reso_pf"
+              },
+              params={"db_path": SQLITE_PATH}),
+        # --- Executive View (depends on the layout screens its sections read) ---
+        Stage("executive_view", process_executive_view,
+              deps={name: name for name in sorted({section.screen for section in EXECUTIVE_SECTIONS})},
+              params={"sections": EXECUTIVE_SECTIONS}),
+        # --- Users Productivity ---
+        Stage("users_productivity", process_users_productivity, files=(layout_path, boa_path)),
+        Stage("calendar", process_calendar_events, files=(calendar_path,)),
+    ]
 
+# Stage output -> (workbook sheet, database table)
+OUTPUTS = [(screen.name, screen.sheet, screen.table) for screen in LAYOUT_SCREENS] + [
+    ("users_productivity", "USERS_Productivity screen2", "users_productivity"),
+    ("executive_view", "Executive View", "executive_view"),
+    ("calendar", "Calendar of Events", "calendar_of_events"),
+]
 
+def workbook_sheets(results):
+    return [(sheet_name, results[stage_name]) for stage_name, sheet_name, _ in OUTPUTS]
 
+def write_dashboard_workbook(results, output_path):
+    write_xlsx(workbook_sheets(results), output_path)
 
+def database_frames(results):
+    return {table: sanitize_columns(results[stage_name]) for stage_name, _, table in OUTPUTS}
 
+def main(force=False, workers=None, stream_dump=None, formats=None, output_dir=None, engine=None):
+    with single_flight() as acquired:
+        if not acquired:
+            return {"stages_executed": [], "output_path": None, "outputs": {}, "coalesced": True}
+        run_metrics.begin_run()
+        try:
+            summary = run_pipeline(force=force, workers=workers, stream_dump=stream_dump,
+                                   formats=formats, output_dir=output_dir, engine=engine)
+        except Exception as e:
+            run_metrics.finish_run(RUN_METRICS_PATH, "failed", error=str(e))
+            raise
+        run_metrics.finish_run(RUN_METRICS_PATH, "succeeded", stages_executed=summary["stages_executed"])
+        return summary
+
+def run_pipeline(force=False, workers=None, stream_dump=None, formats=None, output_dir=None, engine=None):
+    workers = PIPELINE_WORKERS if workers is None else workers
+    stream_dump = STREAM_DATA_DUMP if stream_dump is None else stream_dump
+    formats = parse_formats(OUTPUT_FORMATS if formats is None else formats)
+    output_dir = OUTPUT_DIR if output_dir is None else output_dir
+    engine = AGGREGATION_ENGINE if engine is None else engine
+    if engine not in ("pandas", "sql"):
+        raise ValueError(f"Unknown aggregation engine '{engine}', expected pandas or sql")
+    snapshot = use_input_snapshot()
+    # Fail fast, naming every missing file/sheet/column, before any stage starts
+    validate_inputs(input_paths())
+    # The document table lives outside the stage cache: rebuild it if it went missing
+    if not has_documents(get_sqlite_engine()):
+        discard_cached(STAGE_CACHE_DIR, "documents")
+    # Worker processes start from a fresh import: hand them the snapshot's upload dir (input and layout paths)
+    results, _, executed = run_stages(build_stages(stream_dump, engine), STAGE_CACHE_DIR, BASE_DIR,
+                                      force=force, max_workers=workers,
+                                      initializer=set_upload_dir, initargs=(UPLOAD_DIR,))
+    print(f"Stages executed this run: {', '.join(executed) if executed else 'none (all cached)'}")
+
+    df_exec = results["executive_view"]
+
+    # --- Prepare all DataFrames (database tables and table snapshots share them) ---
+    df_dict = database_frames(results)
+
+    # --- Workbook / snapshots: each file written aside and renamed into place ---
+    outputs = write_outputs(workbook_sheets(results), df_dict, formats, output_dir)
+    output_path = outputs.get("xlsx")
+    for fmt, paths in outputs.items():
+        where = paths if isinstance(paths, str) else os.path.dirname(next(iter(paths.values())))
+        print(f"Processed dashboard ({fmt}) saved to {where}")
+
+    # --- Export to both SQLite and PostgreSQL via SQLAlchemy ---
+
+    sqlite_engine = get_sqlite_engine()
+    postgres_engine = get_postgres_engine()
+
+    # --- Execute save (bulk load into staging tables, then one atomic swap per target) ---
+    exported = export_to_databases(df_dict, sqlite_engine, postgres_engine)
+
+    if exported["SQLite"]:
+        print(f"SQLite database saved to {SQLITE_PATH}")
+    if exported.get("PostgreSQL"):
+        print("PostgreSQL export completed successfully.")
+
+    # --- Document drill-down table (SQLite only), loaded by the "documents" stage ---
+    if "documents" in executed:
+        if results["documents"] is None:
+            discard_cached(STAGE_CACHE_DIR, "documents")   # retry on the next run
+        else:
+            print(f"Loaded {results['documents']} document rows.")
+
+    # --- Append this run's per-queue volumes to the history table ---
+    try:
+        with run_metrics.span("history_append", kind="output") as entry:
+            snapshots = {screen.table: layout_snapshot(results[screen.name], screen.table) for screen in LAYOUT_SCREENS}
+            snapshots["executive_view"] = executive_snapshot(df_exec, sections={s.label for s in EXECUTIVE_SECTIONS})
+            n_rows = append_snapshot(sqlite_engine, snapshots)
+            entry["rows_out"] = n_rows
+        print(f"Appended {n_rows} history rows.")
+    except Exception as e:
+        print("Error appending history snapshot:", e)
+
+    summary = {"stages_executed": executed, "output_path": output_path, "outputs": outputs,
+               "input_snapshot": snapshot["id"] if snapshot is not None else None, "coalesced": False}
+    write_run_marker(summary)
+    return summary
+
+def write_run_marker(summary):
+    marker = dict(summary, finished_at=datetime.now().isoformat(timespec="seconds"))
+    tmp_path = f"{RUN_MARKER_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(marker, f)
+    os.replace(tmp_path, RUN_MARKER_PATH)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the Command Centre dashboard outputs.")
+    parser.add_argument("--force", action="store_true", help="ignore memoized stage outputs and rebuild everything")
+    parser.add_argument("--workers", type=int, default=None,
+                        help=f"worker processes for loads and stages (default: CC_PIPELINE_WORKERS={PIPELINE_WORKERS})")
+    parser.add_argument("--stream-dump", action="store_true", default=None,
+                        help="stream the data dump in bounded memory (default: CC_STREAM_DATA_DUMP)")
+    parser.add_argument("--engine", choices=["pandas", "sql"], default=None,
+                        help=f"where per-queue aggregates are computed (default: CC_AGGREGATION_ENGINE={AGGREGATION_ENGINE})")
+    parser.add_argument("--formats", default=None,
+                        help=f"output formats, comma-separated: xlsx, parquet, json (default: CC_OUTPUT_FORMATS={OUTPUT_FORMATS})")
+    parser.add_argument("--output-dir", default=None,
+                        help=f"where outputs are written (default: CC_OUTPUT_DIR={OUTPUT_DIR})")
+    args = parser.parse_args()
+    main(force=args.force, workers=args.workers, stream_dump=args.stream_dump,
+         formats=args.formats, output_dir=args.output_dir, engine=args.engine)
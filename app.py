@@ -1,58 +1,107 @@
-from flask import Flask, request, jsonify, Blueprint
+from flask import Flask, Response, request, jsonify, Blueprint
 import base64
+import io
+import json
 import os
-import pandas as pd
-import subprocess, threading, time
+import threading
+import time
+
+import dashboard_cache
+import document_store
+import history_store
+import preprocessing_scheduler
+import preprocessing_worker
+import request_pool
+import run_metrics
+import screen_events
+import upload_store
+from Command_Centre_Final_v1 import INPUT_FILENAMES, LAYOUT_SCREENS, RUN_METRICS_PATH, get_sqlite_engine, input_paths
+from upload_inspect import inspect_upload
 
 app = Flask(__name__)
 
 # URL prefix for Apache reverse proxy
 api_bp = Blueprint('api', __name__, url_prefix='/command_centre')
 
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-print("Files in uploads:", os.listdir(UPLOAD_DIR))
-
-preprocess_timer = None
-lock = threading.Lock()
-
-def schedule_preprocessing():
-    """Cancel any existing timer and schedule a new one."""
-    global preprocess_timer
-    with lock:
-        if preprocess_timer is not None:
-            print("Existing timer found, cancelling previous schedule.")
-            preprocess_timer.cancel()
-
-        def run_after_delay():
-            print("Delay complete. Starting preprocessing script...")
-            try:
-                venv_python = "/usr/bin/python3"  # or your venv if needed
-                result = subprocess.run(
-                    [venv_python, "Command_Centre_Final_v1.py"],
-                    capture_output=True,
-                    text=True,
-                    cwd="/opt/command_centre"
-                )
-                print("Preprocessing script executed")
-                print("STDOUT:", result.stdout)
-                print("STDERR:", result.stderr)
-            except Exception as e:
-                print("Error running preprocessing script:", str(e))
-
-            with lock:
-                preprocess_timer = None
-
-        # Start timer in a *detached background thread*
-        preprocess_timer = threading.Timer(60, run_after_delay)
-        preprocess_timer.daemon = True  # ensures thread continues in background
-        preprocess_timer.start()
-        print("Preprocessing scheduled in 60 seconds.")
+print("Staged inputs:", sorted(upload_store.staged()))
+
+# Input filename -> schema its sheet/header is checked against on upload
+UPLOAD_SCHEMAS = {os.path.basename(path): name for name, path in input_paths().items()}
+
+# Event streams: clients reconnect (and get a fresh snapshot) after SSE_STREAM_SECONDS
+SSE_STREAM_SECONDS = 15 * 60
+SSE_HEARTBEAT_SECONDS = 15
+SSE_RETRY_MS = 5000
+
+# Uploads received by this process: filename -> {"count", "bytes_total", "last_bytes"}
+_upload_stats = {}
+_upload_stats_lock = threading.Lock()
+
+def save_upload_stream(stream, filename):
+    """Store an upload in the content-addressed upload store; runs only see it once promoted."""
+    filename = os.path.basename(filename)
+    entry, changed = upload_store.ingest_stream(stream, filename, source="api")
+    return filename, upload_store.object_path(entry), entry, changed
+
+def record_upload(filename, size):
+    with _upload_stats_lock:
+        stats = _upload_stats.setdefault(filename, {"count": 0, "bytes_total": 0, "last_bytes": 0})
+        stats["count"] += 1
+        stats["bytes_total"] += size
+        stats["last_bytes"] = size
+
+def busy_response():
+    return jsonify({
+        "status": "error",
+        "message": "Upload processing is at capacity, retry shortly"
+    }), 429, {"Retry-After": str(request_pool.RETRY_AFTER_SECONDS)}
+
+def upload_response(filename, file_path, entry, changed):
+    record_upload(filename, entry["bytes"])
+    preprocessing_scheduler.notify_upload(filename, changed=changed)
+    # Parsing runs in the bounded pool so request threads stay free for everything else
+    outcome, inspected = request_pool.run(inspect_upload, file_path, UPLOAD_SCHEMAS.get(filename), filename)
+    if outcome == "busy":
+        # The file is stored and its run scheduled: only the check was skipped, so no 429 here
+        return jsonify({
+            "status": "accepted",
+            "api": "command_centre",
+            "filename": filename,
+            "bytes": entry["bytes"],
+            "sha256": entry["sha256"],
+            "unchanged": not changed,
+            "message": "File saved; upload checks are at capacity, so it was not checked"
+        }), 202
+    if outcome == "timeout":
+        return jsonify({
+            "status": "error",
+            "filename": filename,
+            "message": f"File saved, but checking it took over {request_pool.POOL_TIMEOUT_SECONDS:g} seconds"
+        }), 504
+    return jsonify({
+        "status": "success",
+        "api": "command_centre",
+        "filename": filename,
+        "bytes": entry["bytes"],
+        "sha256": entry["sha256"],
+        "unchanged": not changed,
+        "rows": inspected["rows"],
+        "cols": inspected["cols"],
+        "preview": inspected["preview"],
+        "problems": inspected["problems"]
+    }), 200
 
 @api_bp.route("/api/command_centre", methods=["POST"])
 def command_centre():
+    """Upload a workbook as multipart form data (field "file") or as legacy base64 JSON"""
+    if request_pool.saturated():
+        return busy_response()
     try:
+        if "file" in request.files:
+            upload = request.files["file"]
+            filename = request.form.get("filename") or upload.filename or "unknown.xlsx"
+            return upload_response(*save_upload_stream(upload.stream, filename))
+
         data = request.get_json()
         filename = data.get("filename", "unknown.xlsx")
         content_base64 = data.get("content")
@@ -61,35 +110,272 @@ def command_centre():
             return jsonify({"status": "error", "message": "No file content received"}), 400
 
         file_bytes = base64.b64decode(content_base64)
-        file_path = os.path.join(UPLOAD_DIR, filename)
-
-        with open(file_path, "wb") as f:
-            f.write(file_bytes)
-
-        df = pd.read_excel(file_path)
-        rows, cols = df.shape
-        preview = df.head(3).astype(str).to_dict(orient="records")
+        return upload_response(*save_upload_stream(io.BytesIO(file_bytes), filename))
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
 
-        return jsonify({
-            "status": "success",
-            "api": "command_centre",
-            "filename": filename,
-            "rows": rows,
-            "cols": cols,
-            "preview": preview
-        }), 200
+@api_bp.route("/api/command_centre/<path:filename>", methods=["PUT", "POST"])
+def command_centre_stream(filename):
+    """Upload a workbook as the raw request body (chunked transfer encoding supported)"""
+    if request_pool.saturated():
+        return busy_response()
+    try:
+        return upload_response(*save_upload_stream(request.stream, filename))
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
 @api_bp.route("/api/run_preprocessing", methods=["POST"])
 def run_preprocessing():
-    """Endpoint to (re)schedule preprocessing with a cooldown"""
-    schedule_preprocessing()
+    """Endpoint to trigger preprocessing: immediately for a complete batch, else after the debounce"""
+    delay = preprocessing_scheduler.request_run()
     return jsonify({
         "status": "scheduled",
-        "message": "Preprocessing will run in 1 minute if no new files arrive"
+        "delay_seconds": round(delay, 1),
+        "message": f"Preprocessing will run in {delay:.0f} seconds if no new files arrive",
+        "scheduler": preprocessing_scheduler.status()
     }), 200
 
+@api_bp.route("/api/preprocessing/scheduler", methods=["GET"])
+def scheduler_status():
+    return jsonify(preprocessing_scheduler.status()), 200
+
+@api_bp.route("/api/preprocessing", methods=["POST"])
+def submit_preprocessing():
+    """Queue a preprocessing run on the warm worker and return its job ID"""
+    data = request.get_json(silent=True) or {}
+    job = preprocessing_worker.submit_job(
+        source=data.get("source", "api"),
+        force=bool(data.get("force", False))
+    )
+    return jsonify({"status": "queued", "job_id": job["id"], "job": job}), 202
+
+@api_bp.route("/api/preprocessing/<job_id>", methods=["GET"])
+def preprocessing_status(job_id):
+    job = preprocessing_worker.get_job(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": f"Unknown job ID: {job_id}"}), 404
+    return jsonify(job), 200
+
+@api_bp.route("/api/history", methods=["GET"])
+def history_series():
+    """Time series for one queue or category total: ?screen=&queue=[&metric=&start=&end=]"""
+    screen = request.args.get("screen")
+    queue = request.args.get("queue")
+    if not screen or not queue:
+        return jsonify({"status": "error", "message": "screen and queue are required"}), 400
+    points = history_store.query_series(
+        get_sqlite_engine(), screen, queue,
+        metric=request.args.get("metric"),
+        start=request.args.get("start"),
+        end=request.args.get("end")
+    )
+    return jsonify({"status": "success", "screen": screen, "queue": queue, "points": points}), 200
+
+@api_bp.route("/api/history/delta", methods=["GET"])
+def history_delta():
+    """Period-over-period change: ?screen=&queue=&metric=[&period=1d]"""
+    screen = request.args.get("screen")
+    queue = request.args.get("queue")
+    metric = request.args.get("metric")
+    if not screen or not queue or not metric:
+        return jsonify({"status": "error", "message": "screen, queue and metric are required"}), 400
+    try:
+        delta = history_store.query_delta(get_sqlite_engine(), screen, queue, metric,
+                                          period=request.args.get("period", "1d"))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    if delta is None:
+        return jsonify({"status": "error", "message": "No history for this series"}), 404
+    return jsonify(dict(delta, status="success")), 200
+
+def flag_arg(name):
+    """Optional true/false query argument: None when absent."""
+    value = request.args.get(name)
+    if value is None or value == "":
+        return None
+    if value.lower() in ("1", "true", "yes"):
+        return True
+    if value.lower() in ("0", "false", "no"):
+        return False
+    raise ValueError(f"{name} must be true or false")
+
+def document_filter_args():
+    """Drill-down filters from ?metric=&queue=[&screen=] (one dashboard cell) or
+    ?source=&queue=&queue_column=&qc=&locked=, both narrowed by an optional &doc_type="""
+    metric = request.args.get("metric")
+    if metric:
+        if not request.args.get("queue"):
+            raise ValueError("queue is required with metric")
+        screen = request.args.get("screen")
+        special_queues = document_store.SPECIAL_PRO_QUEUES
+        if screen:
+            match = [s for s in LAYOUT_SCREENS if screen in (s.table, s.name)]
+            if not match:
+                raise ValueError(f"Unknown layout screen: {screen}")
+            special_queues = match[0].special_queues
+        filters = document_store.cell_filters(metric, request.args["queue"], special_queues)
+    else:
+        if not request.args.get("source"):
+            raise ValueError("metric or source is required")
+        filters = {
+            "source": request.args["source"],
+            "queue": request.args.get("queue") or None,
+            "queue_column": request.args.get("queue_column", "queue"),
+            "qc": flag_arg("qc"),
+            "locked": flag_arg("locked"),
+        }
+    if request.args.get("doc_type"):
+        filters["doc_type"] = request.args["doc_type"]
+    return filters
+
+@api_bp.route("/api/documents", methods=["GET"])
+def list_documents():
+    """Documents behind a dashboard cell, a page at a time: filters as in document_filter_args, &after=&page_size="""
+    try:
+        filters = document_filter_args()
+        limit = document_store.page_size(request.args.get("page_size"))
+        after = int(request.args.get("after", 0))
+        page = document_store.query_documents(get_sqlite_engine(), filters, after=after, limit=limit)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify(dict(page, status="success", filters=filters, page_size=limit)), 200
+
+@api_bp.route("/api/documents/doc_types", methods=["GET"])
+def document_doc_types():
+    """Document count per Doc Type behind a dashboard cell (e.g. what makes up a Reso backlog)"""
+    try:
+        filters = document_filter_args()
+        doc_types = document_store.doc_type_breakdown(get_sqlite_engine(), filters)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify({"status": "success", "filters": filters, "doc_types": doc_types}), 200
+
+@api_bp.route("/api/screens", methods=["GET"])
+def list_screens():
+    return jsonify({"status": "success", "screens": sorted(dashboard_cache.SCREEN_TABLES)}), 200
+
+@api_bp.route("/api/screens/<screen>", methods=["GET"])
+def screen_data(screen):
+    """Processed data for one screen from the in-memory cache: ?fields=a,b supported, ETag/304 and gzip"""
+    fields = [f.strip() for f in request.args.get("fields", "").split(",") if f.strip()]
+    try:
+        view = dashboard_cache.get_view(screen, fields)
+    except KeyError as e:
+        return jsonify({"status": "error", "message": e.args[0]}), 400
+    except LookupError as e:
+        return jsonify({"status": "error", "message": str(e)}), 404
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+    headers = {"ETag": f'"{view["etag"]}"', "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if request.if_none_match.contains(view["etag"]):
+        return Response(status=304, headers=headers)
+
+    body = view["body"]
+    if view["gzip"] is not None and "gzip" in request.accept_encodings:
+        body = view["gzip"]
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, status=200, mimetype="application/json", headers=headers)
+
+def sse_message(event, data, event_id):
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+@api_bp.route("/api/screens/<screen>/events", methods=["GET"])
+def screen_event_stream(screen):
+    """Server-sent events for one screen: a full snapshot on (re)connect, then only the cells each run changed"""
+    if screen not in dashboard_cache.SCREEN_TABLES:
+        return jsonify({"status": "error", "message": f"Unknown screen: {screen}"}), 404
+    if not screen_events.subscribe():
+        return jsonify({"status": "error", "message": "Too many open event streams, retry shortly"}), 429, \
+            {"Retry-After": str(SSE_HEARTBEAT_SECONDS)}
+    try:
+        view = dashboard_cache.get_view(screen)
+    except Exception as e:
+        screen_events.unsubscribe()
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+    def stream(view):
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        yield sse_message("snapshot", view["body"].decode("utf-8"), view["version"])
+        version = view["version"]
+        deadline = time.monotonic() + SSE_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            events = screen_events.wait_for(screen, version, SSE_HEARTBEAT_SECONDS)
+            if not events:
+                yield ": keep-alive\n\n"
+                continue
+            for event in events:
+                if event["type"] == "delta" and event["base"] == version:
+                    yield sse_message("delta", json.dumps(dict(event, screen=screen), separators=(",", ":")),
+                                      event["version"])
+                    version = event["version"]
+                else:
+                    # Shape changed, or this client holds a different base: resend the screen
+                    view = dashboard_cache.get_view(screen)
+                    yield sse_message("snapshot", view["body"].decode("utf-8"), view["version"])
+                    version = max(view["version"], event["version"])
+                    break
+
+    response = Response(stream(view), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # Released when the server closes the response, even if the client left before the first chunk
+    response.call_on_close(screen_events.unsubscribe)
+    return response
+
+@api_bp.route("/api/metrics", methods=["GET"])
+def metrics():
+    """Prometheus text exposition: pipeline spans (latest run + history), uploads, scheduler"""
+    lines = run_metrics.prometheus_lines(run_metrics.load_history(RUN_METRICS_PATH))
+
+    with _upload_stats_lock:
+        uploads = {name: dict(stats) for name, stats in _upload_stats.items()}
+    run_metrics.metric(lines, "cc_uploads_total", "counter", "Uploads received by this API process.",
+                       [({"file": name}, stats["count"]) for name, stats in sorted(uploads.items())])
+    run_metrics.metric(lines, "cc_upload_bytes_total", "counter", "Bytes uploaded to this API process.",
+                       [({"file": name}, stats["bytes_total"]) for name, stats in sorted(uploads.items())])
+    run_metrics.metric(lines, "cc_upload_last_bytes", "gauge", "Size of the latest upload of each file.",
+                       [({"file": name}, stats["last_bytes"]) for name, stats in sorted(uploads.items())])
+    staged = upload_store.staged()
+    sizes = [({"file": name}, staged[name]["bytes"]) for name in INPUT_FILENAMES if name in staged]
+    run_metrics.metric(lines, "cc_input_file_bytes", "gauge", "Size of the latest staged version of each input.", sizes)
+
+    scheduler = preprocessing_scheduler.status()
+    run_metrics.metric(lines, "cc_scheduler_queue_depth", "gauge", "Preprocessing jobs waiting for the worker.",
+                       [({}, scheduler["worker_queue_depth"])])
+    run_metrics.metric(lines, "cc_scheduler_pending_files", "gauge", "Input files received since the last trigger.",
+                       [({}, len(scheduler["pending_files"]))])
+    run_metrics.metric(lines, "cc_scheduler_timer_armed", "gauge", "1 while a debounced run is waiting to fire.",
+                       [({}, int(scheduler["timer_armed"]))])
+    run_metrics.metric(lines, "cc_scheduler_debounce_seconds", "gauge", "Current adaptive debounce delay.",
+                       [({}, scheduler["debounce_seconds"])])
+    run_metrics.metric(lines, "cc_worker_busy", "gauge", "1 while a preprocessing job is queued or running.",
+                       [({}, int(preprocessing_worker.is_busy()))])
+
+    run_metrics.metric(lines, "cc_sse_subscribers", "gauge", "Open screen event streams.",
+                       [({}, screen_events.status()["subscribers"])])
+
+    pool = request_pool.status()
+    run_metrics.metric(lines, "cc_request_pool_in_flight", "gauge", "Upload checks running or waiting in the pool.",
+                       [({}, pool["in_flight"])])
+    run_metrics.metric(lines, "cc_request_pool_queued", "gauge", "Upload checks waiting for a pool worker.",
+                       [({}, pool["queued"])])
+    run_metrics.metric(lines, "cc_request_pool_rejected_total", "counter",
+                       "Uploads turned away (429) or left unchecked (202) by a saturated pool.",
+                       [({}, pool["rejected"])])
+    run_metrics.metric(lines, "cc_request_pool_timeouts_total", "counter", "Requests answered 504 (pool timeout).",
+                       [({}, pool["timeouts"])])
+    return Response("\n".join(lines) + "\n", status=200, mimetype="text/plain; version=0.0.4")
+
+@api_bp.route("/api/metrics/runs", methods=["GET"])
+def metrics_runs():
+    """Structured spans of recent pipeline runs, newest first: ?limit=N"""
+    try:
+        limit = int(request.args.get("limit", 10))
+    except ValueError:
+        return jsonify({"status": "error", "message": "limit must be an integer"}), 400
+    runs = run_metrics.load_history(RUN_METRICS_PATH)[::-1][:max(limit, 0)]
+    return jsonify({"status": "success", "runs": runs}), 200
+
 @api_bp.route("/api/ping", methods=["GET"])
 def ping():
     return jsonify({"status": "ok", "message": "Command Centre API is running"}), 200
@@ -0,0 +1,132 @@
+"""Behavioral check of the document tracker: known moves across successive dumps.
+
+    python -m benchmarks.check_throughput
+
+The goldens start from an empty index (every count 0), so the move counting is checked here
+instead: each step applies one dump and compares the per-queue counts with the expected ones.
+"""
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import document_tracker as tracker  # noqa: E402
+from benchmarks.generate_inputs import data_dump_frame, reso_dump_frame, reso_map_frame  # noqa: E402
+from document_tracker import THROUGHPUT_COLUMNS  # noqa: E402
+from input_schema import conform  # noqa: E402
+
+HOUR = 3600
+T0 = 1700000000
+
+RESO_MAP = pd.DataFrame({"Doc_Type": ["T1", "T2"], "Queue_Desc": ["Fin A", "Fin B"]})
+
+
+def _dump(rows):
+    """Data dump frame from (document, queue) rows, typed as conform() leaves it."""
+    return pd.DataFrame({
+        "Document ID": pd.array([doc for doc, _ in rows], dtype="Int64"),
+        "Queue": [queue for _, queue in rows],
+        "Lock Status": [False] * len(rows),
+    })
+
+
+def _reso(rows):
+    return pd.DataFrame({"Doc ID": pd.array([doc for doc, _ in rows], dtype="Int64"),
+                         "Doc Type": [doc_type for _, doc_type in rows]})
+
+
+DUMP_1 = [(1, "Fin A"), (2, "Fin A"), (3, "Fin A"), (4, "Fin A QC"), (5, "Fin A QC"),
+          (6, "Fin B"), (7, "Fin B QC"), (8, "Fin A"), (8, "Fin A QC")]
+RESO_1 = [(101, "T1"), (102, "T1"), (103, "T2")]
+
+# 1, 2 accepted; 4 QC'ed (gone); 6 moved to another base's QC (not accepted); 7 sent back from
+# QC (QC'ed); 8 dropped its PRO listing but already was in QC (not accepted); 101 resolved
+DUMP_2 = [(1, "Fin A QC"), (2, "Fin A QC"), (3, "Fin A"), (5, "Fin A QC"),
+          (6, "Fin A QC"), (7, "Fin B"), (8, "Fin A QC")]
+RESO_2 = [(102, "T1"), (103, "T2")]
+
+# 30 hours after the first dump: 1, 5 and 6 leave QC outside the SLA; 9 is new; 103 resolved
+DUMP_4 = [(2, "Fin A QC"), (3, "Fin A"), (7, "Fin B"), (8, "Fin A QC"), (9, "Fin B")]
+RESO_4 = [(102, "T1")]
+
+# (dump, reso dump, time, expected non-zero counts {column: {queue: n}})
+STEPS = [
+    ("first dump", DUMP_1, RESO_1, T0, {}),
+    ("moves", DUMP_2, RESO_2, T0 + HOUR, {
+        "Accepted Volumes": {"Fin A": 2},
+        "QC'ed Volumes": {"Fin A": 1, "Fin B": 1},
+        "SLA Met Volumes": {"Fin A": 1, "Fin B": 1},
+        "Resolutions Completed Volumes": {"Fin A": 1},
+    }),
+    ("same dump, rows reversed and repeated", DUMP_2[::-1] + DUMP_2[:3], RESO_2[::-1], T0 + 2 * HOUR, {}),
+    ("moves past the SLA", DUMP_4, RESO_4, T0 + 30 * HOUR, {
+        "QC'ed Volumes": {"Fin A": 3},
+        "Resolutions Completed Volumes": {"Fin B": 1},
+    }),
+]
+
+
+def _nonzero(counts):
+    return {col: {q: int(v) for q, v in counts[col].items() if v} for col in THROUGHPUT_COLUMNS
+            if counts[col].any()}
+
+
+def check_moves():
+    """Apply STEPS in order; returns the list of mismatches."""
+    mismatches = []
+    state = tracker._empty_state()
+    for label, dump, reso, now, expected in STEPS:
+        counts = _nonzero(tracker.advance(state, _dump(dump), _reso(reso), RESO_MAP, now))
+        if counts != expected:
+            mismatches.append(f"{label}: expected {expected}, got {counts}")
+    return mismatches
+
+
+def check_shuffled(n_rows=20000, seed=0):
+    """A shuffled copy of a generated dump is the same dump: nothing moves, the state is unchanged."""
+    dump = conform(data_dump_frame(n_rows, seed), "data_dump")
+    reso = reso_dump_frame(n_rows, seed)
+    reso_map = reso_map_frame(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "document_state.npz")
+        tracker.track_document_throughput(dump, reso, reso_map, path, "w")
+        digest = tracker.load_state(path)["digest"]
+        totals = tracker.track_document_throughput(dump.sample(frac=1, random_state=seed + 1), reso.iloc[::-1],
+                                                   reso_map, path, "w")
+        state = tracker.load_state(path)
+    mismatches = []
+    if totals.to_numpy().any():
+        mismatches.append(f"shuffled dump: expected no moves, got {_nonzero(totals)}")
+    if state["digest"] != digest:
+        mismatches.append("shuffled dump: the index digest changed")
+    return mismatches
+
+
+def check_cache_base():
+    """The stage-cache key of the index is the same before and after applying unchanged inputs."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "document_state.npz")
+        tracker.track_document_throughput(_dump(DUMP_1), _reso(RESO_1), RESO_MAP, path, "w", inputs="1")
+        before = tracker.state_base(path, "2")
+        tracker.track_document_throughput(_dump(DUMP_2), _reso(RESO_2), RESO_MAP, path, "w", inputs="2")
+        after = tracker.state_base(path, "2")
+    return [] if before == after else [f"cache key of the index changed on unchanged inputs: {before} -> {after}"]
+
+
+def run_checks():
+    return check_moves() + check_shuffled() + check_cache_base()
+
+
+def main():
+    mismatches = run_checks()
+    for m in mismatches:
+        print("  ", m)
+    print("Throughput check " + ("FAILED" if mismatches else "passed") + ".")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""Deterministic synthetic versions of every input workbook the pipeline reads.
+
+    python -m benchmarks.generate_inputs <out_dir> [--rows N] [--seed S]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Command_Centre_Final_v1 as pipeline  # noqa: E402
+
+# Excel's sheet limit (1,048,576 rows incl. header); larger dumps only exist in memory
+EXCEL_MAX_ROWS = 1048575
+
+# --- Queue universe shared by the dump, the mapping sheet and the layout screens ---
+GDC_CATEGORIES = {
+    "FINANCIAL - Total": ["Banks", "Brokers", "Insurance", "Asset Managers", "Pension Funds"],
+    "QUASI NON-FINANCIAL - Total": ["Trusts", "Foundations", "Government Entities"],
+    "NON-FINANCIAL - Total": ["Corporates", "Partnerships", "Sole Traders", "Charities"],
+}
+HNW_CATEGORIES = {
+    "INSTITUTIONAL - Total": ["HNW Institutional", "HNW Family Office"],
+    "APP INVESTMENT - Total": ["App Investment", "App Investment Joint"],
+    "UNITED FINANCIALS - Total": ["United Banks", "United Brokers", "United Insurance"],
+}
+OTHER_QUEUES = ["Incoming Fax Queue", "Incoming Email Queue", "Index Queue", "Doc Translation",
+                "Reso Validation", "RMA", "United Doc Translation"]
+SPECIAL_QUEUES = ["DocTranslation", "ResolutionValidation", "ResolutionManagerApproval",
+                  "General Index", "Incoming Fax Queue", "Incoming Email Queue"]
+
+LAYOUT_HEADER = ["Bulletin Board", "PRO Queue", "QC Queue", "Total", "User Locked PRO", "User Locked QC",
+                 None, "Reso Queue", "PRO Personal Folders", "PRO FTE Locked", "RESO Personal Folders",
+                 "RESO FTE Locked", "Accepted Volumes", "QC'ed Volumes", "Resolutions Completed Volumes",
+                 "SLA % Completed", "Processed Volumes"]
+
+LOCK_STATUSES = ["Y", "N", "Locked", " locked ", "UNLOCKED", None]
+LOCK_WEIGHTS = [0.15, 0.45, 0.05, 0.05, 0.2, 0.1]
+N_DOC_TYPES = 120
+N_AGENTS = 400
+N_SUPERVISORS = 25
+
+
+def processing_queues():
+    return [q for cats in (GDC_CATEGORIES, HNW_CATEGORIES) for qs in cats.values() for q in qs]
+
+
+def dump_queue_names():
+    """Queue names as they appear in the ag-grid dump: PRO, both QC spellings, specials, strays."""
+    queues = processing_queues()
+    return (queues + [f"{q}QC" for q in queues] + [f"{q} QC" for q in queues[::3]]
+            + SPECIAL_QUEUES + ["Decommissioned Queue"])
+
+
+def doc_types():
+    return [f"DT{i:03d}" for i in range(1, N_DOC_TYPES + 1)]
+
+
+def data_dump_frame(n_rows, seed=0):
+    """The wide ag-grid export: one row per document/queue assignment."""
+    rng = np.random.default_rng(seed)
+    queues = np.array(dump_queue_names(), dtype=object)
+    # Skewed queue popularity, like the real dump
+    weights = rng.pareto(1.5, len(queues)) + 0.05
+    locks = np.array(LOCK_STATUSES, dtype=object)
+    types = np.array(doc_types(), dtype=object)
+    received = pd.Timestamp("2026-01-05") + pd.to_timedelta(rng.integers(0, 90 * 24 * 3600, n_rows), unit="s")
+    return pd.DataFrame({
+        "Document ID": rng.integers(1, max(2, n_rows // 2), n_rows),
+        "Queue": queues[rng.choice(len(queues), n_rows, p=weights / weights.sum())],
+        "Lock Status": locks[rng.choice(len(locks), n_rows, p=LOCK_WEIGHTS)],
+        "Locked By": np.where(rng.random(n_rows) < 0.3, "AGENT " + pd.Series(rng.integers(0, N_AGENTS, n_rows)).astype(str), None),
+        "Doc Type": types[rng.integers(0, len(types), n_rows)],
+        "Client Name": "Client " + pd.Series(rng.integers(0, 50000, n_rows)).astype(str),
+        "Received Date": received,
+        "Priority": rng.choice(np.array(["High", "Normal", "Low"], dtype=object), n_rows, p=[0.1, 0.7, 0.2]),
+        "Channel": rng.choice(np.array(["Fax", "Email", "Portal", "Post"], dtype=object), n_rows),
+        "Workflow Step": rng.integers(1, 12, n_rows),
+        "Comments": np.where(rng.random(n_rows) < 0.2, "Awaiting client confirmation", None),
+    })
+
+
+def reso_dump_frame(n_rows, seed=0):
+    rng = np.random.default_rng(seed + 1)
+    types = np.array(doc_types() + ["DT999", "DT998"], dtype=object)
+    return pd.DataFrame({
+        "Doc ID": rng.integers(1, max(2, n_rows), n_rows),
+        "Doc Type": types[rng.integers(0, len(types), n_rows)],
+        "Status": rng.choice(np.array(["Open", "Pending", "Escalated"], dtype=object), n_rows),
+    })
+
+
+def reso_map_frame(seed=0):
+    """Doc type -> processing queue; a few doc types map to no known queue."""
+    rng = np.random.default_rng(seed + 2)
+    targets = np.array(processing_queues() + OTHER_QUEUES + ["Retired Queue"], dtype=object)
+    return pd.DataFrame({
+        "Doc_Type": doc_types(),
+        "Queue_Desc": targets[rng.integers(0, len(targets), N_DOC_TYPES)],
+        "Owner": "Ops",
+    })
+
+
+def personal_folder_frame(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    types = np.array(doc_types(), dtype=object)
+    return pd.DataFrame({
+        "Document ID": rng.integers(1, max(2, n_rows * 5), n_rows),
+        "Doc Type": types[rng.integers(0, len(types), n_rows)],
+        "Owner": "AGENT " + pd.Series(rng.integers(0, N_AGENTS, n_rows)).astype(str),
+    })
+
+
+def supervisor_names():
+    return [f"Lead{i}, Super {chr(65 + i % 26)} - Team {i}" for i in range(N_SUPERVISORS)]
+
+
+def boa_frame(seed=0):
+    """BOA master list: each member with their supervisor and shift (a few duplicates, as in the real file)."""
+    rng = np.random.default_rng(seed + 3)
+    supervisors = np.array(supervisor_names(), dtype=object)
+    shifts = np.array(["6AM-3PM", "7AM-4PM", "8AM-5PM", "2PM-11PM"], dtype=object)
+    members = [f"Agent {i}" for i in range(N_AGENTS)] + [f"Agent {i}" for i in range(0, N_AGENTS, 40)]
+    return pd.DataFrame({
+        "Member Name": members,
+        "Supervisor": supervisors[rng.integers(0, len(supervisors), len(members))],
+        "Shift Schedule": shifts[rng.integers(0, len(shifts), len(members))],
+    })
+
+
+def layout_rows(categories, with_other):
+    width = len(LAYOUT_HEADER)
+    blank = [None] * (width - 1)
+    rows = [["Command Centre Dashboard"] + blank, [None] * width, list(LAYOUT_HEADER)]
+    for category, queues in categories.items():
+        rows.append([category] + blank)
+        rows.extend([queue] + blank for queue in queues)
+    if with_other:
+        rows.append(["Other - Total"] + blank)
+        rows.extend([queue] + blank for queue in OTHER_QUEUES)
+    rows.append(["Grand Total by Queue:"] + blank)
+    return rows
+
+
+def users_rows():
+    """USERS_Productivity screen2: agents (odd spacing/case), supervisors in 'Last, First - Team' form, strays."""
+    header = ["Agent Name", "Bulletin Board", "Processed", "QC'ed", "Team"]
+    rows = [header]
+    for i in range(N_AGENTS):
+        rows.append([f" agent {i} " if i % 7 == 0 else f"Agent {i}", None, i % 37, i % 11, f"Team {i % N_SUPERVISORS}"])
+    for supervisor in supervisor_names():
+        rows.append([supervisor, None, None, None, "Leads"])
+    rows.append(["Unknown Person", None, 1, 0, "Team 0"])
+    return rows
+
+
+def calendar_frame():
+    return pd.DataFrame({
+        "Event": ["Townhall", "System Outage", "Training", "Audit Window", "Malformed Entry"],
+        "Start Day (YYYY-MM-DD)": ["2026-10-01", "2026-10-02", "2026-10-05", "2026-10-12", "not a date"],
+        "Start Time (HH:MM)": ["09:00", "13:30", "10:00", "08:00", "xx"],
+        "End Day (YYYY-MM-DD)": ["2026-10-01", "2026-10-02", "2026-10-05", "2026-10-16", "2026-10-20"],
+        "End Time (HH:MM)": ["10:00", "15:00", "12:00", "18:00", "11:00"],
+        "Notes": ["All hands", "Core banking", "New joiners", "Internal audit", "Typo in source"],
+    })
+
+
+# --- Workbook writing (openpyxl write-only: constant memory even for a million-row dump) ---
+
+def _cell(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def write_workbook(path, sheets):
+    """`sheets`: sheet name -> DataFrame (written with its header) or list of raw rows."""
+    wb = Workbook(write_only=True)
+    for sheet_name, content in sheets.items():
+        ws = wb.create_sheet(sheet_name)
+        if isinstance(content, pd.DataFrame):
+            ws.append(list(content.columns))
+            for row in content.itertuples(index=False, name=None):
+                ws.append([_cell(v) for v in row])
+        else:
+            for row in content:
+                ws.append([_cell(v) for v in row])
+    wb.save(path)
+
+
+def generate(out_dir, n_rows, seed=0, write_dump=True):
+    """Write the input workbooks into `out_dir` for a dump of `n_rows` rows.
+
+    With write_dump=False the data dump itself is skipped (scales beyond Excel's
+    row limit feed data_dump_frame() to the pipeline directly).
+    """
+    if write_dump and n_rows > EXCEL_MAX_ROWS:
+        raise ValueError(f"{n_rows} rows do not fit in one worksheet (max {EXCEL_MAX_ROWS}); "
+                         "use data_dump_frame() for in-memory scales")
+    os.makedirs(out_dir, exist_ok=True)
+    path = lambda name: os.path.join(out_dir, name)
+
+    if write_dump:
+        write_workbook(path(pipeline.DATA_DUMP_FILE), {"ag-grid": data_dump_frame(n_rows, seed)})
+    write_workbook(path(pipeline.RESO_DUMP_FILE), {"ag-grid": reso_dump_frame(max(1, n_rows // 5), seed)})
+    write_workbook(path(pipeline.RESO_MAP_FILE), {"Added by Charmaine": reso_map_frame(seed)})
+    write_workbook(path(pipeline.PRO_PF_FILE), {"Sheet1": personal_folder_frame(max(1, n_rows // 20), seed + 4)})
+    write_workbook(path(pipeline.RESO_PF_FILE), {"Sheet1": personal_folder_frame(max(1, n_rows // 40), seed + 5)})
+    write_workbook(path(pipeline.BOA_FILE), {"MasterList_of_Members": boa_frame(seed)})
+    write_workbook(path(pipeline.LAYOUT_FILE), {
+        "CC Full View of GDC+GTA screen1": layout_rows(GDC_CATEGORIES, with_other=True),
+        "CC Full View of HNW Qs1bis": layout_rows(HNW_CATEGORIES, with_other=False),
+        "USERS_Productivity screen2": users_rows(),
+    })
+    write_workbook(path(pipeline.CALENDAR_FILE), {"Events": calendar_frame()})
+    return out_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic Command Centre input workbooks.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--rows", type=int, default=10000, help="rows in the ag-grid data dump")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate(args.out_dir, args.rows, args.seed)
+    print(f"Synthetic inputs ({args.rows} dump rows) written to {args.out_dir}")
@@ -0,0 +1,287 @@
+"""Time and memory-profile every pipeline stage on synthetic inputs, and check outputs against goldens.
+
+    python -m benchmarks.run_benchmarks                       # 10k, 100k and 1M dump rows
+    python -m benchmarks.run_benchmarks --scales 10000 5000000 --json report.json
+    python -m benchmarks.run_benchmarks --golden-only          # regression check only
+    python -m benchmarks.run_benchmarks --update-golden        # after an intended output change
+    python -m benchmarks.run_benchmarks --stream-dump          # streaming data dump ingestion
+
+The document tracker's move counting is checked too (benchmarks.check_throughput): the goldens
+only see first runs, where every throughput count is 0.
+
+Scales above Excel's row limit feed the data dump to the pipeline in memory; every other
+input is still read from generated workbooks. The golden check always runs at GOLDEN_ROWS.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Command_Centre_Final_v1 as pipeline  # noqa: E402
+from benchmarks.check_throughput import run_checks as check_throughput  # noqa: E402
+from benchmarks.generate_inputs import EXCEL_MAX_ROWS, data_dump_frame, generate  # noqa: E402
+from db_export import enable_sqlite_transactions, export_to_databases  # noqa: E402
+from input_schema import conform  # noqa: E402
+from pipeline_dag import topological_order  # noqa: E402
+from sql_aggregates import build_sql_queue_aggregates  # noqa: E402
+
+DEFAULT_SCALES = [10000, 100000, 1000000]
+GOLDEN_ROWS = 10000
+GOLDEN_SEED = 0
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+
+# "Bulletin Board (Generated at 09:15 AM)" changes every run (underscored in exported tables)
+TIMESTAMP_RE = re.compile(r"Generated([ _])at[ _]\d{1,2}:\d{2}[ _][AP]M")
+
+
+# --- Measurement ---
+
+def _rows(value):
+    if isinstance(value, pd.DataFrame):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_rows(v) for v in value.values())
+    return 0
+
+
+def measure(func, kwargs, track_memory=True):
+    """Run func(**kwargs) -> (result, seconds, peak bytes allocated during the call)."""
+    if track_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func(**kwargs)
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if track_memory else None
+    finally:
+        if track_memory:
+            tracemalloc.stop()
+    return result, seconds, peak
+
+
+def run_scale(n_rows, work_dir, seed=0, track_memory=True, stream_dump=False, engine="pandas"):
+    """Run every stage, the Excel write and the DB export once; returns (timings, outputs, paths)."""
+    input_dir = os.path.join(work_dir, f"inputs_{n_rows}")
+    in_memory = n_rows > EXCEL_MAX_ROWS
+    if not os.path.isdir(input_dir):
+        print(f"Generating inputs for {n_rows:,} dump rows...")
+        generate(input_dir, n_rows, seed, write_dump=not in_memory)
+    pipeline.set_upload_dir(input_dir)
+    pipeline._reference_cache.clear()
+    # Fresh document index: every scale measures a first run, so throughput columns stay 0 in the goldens
+    pipeline.DOCUMENT_STATE_PATH = os.path.join(work_dir, f"document_state_{n_rows}.npz")
+    if os.path.exists(pipeline.DOCUMENT_STATE_PATH):
+        os.remove(pipeline.DOCUMENT_STATE_PATH)
+    # SQL engine mode: a fresh database per scale, so every partition is loaded (the costly case)
+    sql_path = os.path.join(work_dir, f"aggregation_{n_rows}.db")
+    if os.path.exists(sql_path):
+        os.remove(sql_path)
+    pipeline.SQL_ENGINE_URL = f"sqlite:///{sql_path}"
+    # The documents stage loads its table itself: keep it in the work dir too
+    pipeline.SQLITE_PATH = os.path.join(work_dir, f"documents_{n_rows}.db")
+
+    timings = []
+    results = {}
+    for stage in topological_order(pipeline.build_stages(stream_dump, engine)):
+        func = stage.func
+        kwargs = dict(stage.params)
+        kwargs.update({arg: results[dep] for arg, dep in stage.deps.items()})
+        if stage.name == "data_dump" and in_memory:
+            dump = conform(data_dump_frame(n_rows, seed), "data_dump")
+            func, kwargs = (lambda: dump), {}
+        if stage.name == "queue_aggregates" and engine == "sql" and in_memory:
+            # No dump workbook to stream at this scale: load the in-memory frames into the database
+            func = build_sql_queue_aggregates
+            kwargs = {"data_dump_df": results["data_dump"], "reso_df": results["reso_dump"],
+                      "reso_map_df": results["reso_map"], "pro_pf_df": results["pro_pf"],
+                      "reso_pf_df": results["reso_pf"], "db_url": pipeline.SQL_ENGINE_URL}
+        value, seconds, peak = measure(func, kwargs, track_memory)
+        results[stage.name] = value
+        timings.append({
+            "stage": stage.name,
+            "rows_in": sum(_rows(results[dep]) for dep in stage.deps.values()),
+            "rows_out": _rows(value),
+            "seconds": seconds,
+            "peak_bytes": peak,
+            "note": ("in-memory dump" if in_memory else "streamed" if stream_dump else "")
+                    if stage.name == "data_dump" else "",
+        })
+
+    outputs = {name: results[name] for name, _, _ in pipeline.OUTPUTS}
+    out_rows = _rows(outputs)
+
+    xlsx_path = os.path.join(work_dir, f"dashboard_{n_rows}.xlsx")
+    _, seconds, peak = measure(pipeline.write_dashboard_workbook,
+                               {"results": outputs, "output_path": xlsx_path}, track_memory)
+    timings.append({"stage": "excel_write", "rows_in": out_rows, "rows_out": out_rows,
+                    "seconds": seconds, "peak_bytes": peak, "note": ""})
+
+    db_path = os.path.join(work_dir, f"dashboard_{n_rows}.db")
+    engine = enable_sqlite_transactions(create_engine(f"sqlite:///{db_path}"))
+    exported, seconds, peak = measure(export_to_databases,
+                                      {"df_dict": pipeline.database_frames(outputs), "sqlite_engine": engine},
+                                      track_memory)
+    timings.append({"stage": "db_export", "rows_in": out_rows, "rows_out": out_rows,
+                    "seconds": seconds, "peak_bytes": peak,
+                    "note": "" if exported["SQLite"] else "FAILED"})
+    return timings, outputs, (xlsx_path, engine)
+
+
+def print_timings(n_rows, timings):
+    print(f"\n=== {n_rows:,} dump rows ===")
+    print(f"{'stage':<22}{'rows in':>12}{'rows out':>12}{'seconds':>10}{'peak MiB':>10}")
+    for t in timings:
+        peak = f"{t['peak_bytes'] / 2**20:.1f}" if t["peak_bytes"] is not None else "-"
+        print(f"{t['stage']:<22}{t['rows_in']:>12,}{t['rows_out']:>12,}{t['seconds']:>10.3f}{peak:>10}  {t['note']}")
+    print(f"{'total':<46}{sum(t['seconds'] for t in timings):>10.3f}")
+
+
+# --- Golden snapshots ---
+
+def _normalize(value):
+    if isinstance(value, str):
+        return TIMESTAMP_RE.sub(r"Generated\1at\1<time>", value)
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    return value
+
+
+def _frame_json(df):
+    return _normalize(json.loads(df.to_json(orient="split", date_format="iso", double_precision=10)))
+
+
+def snapshot(outputs, xlsx_path, engine):
+    """What users see: stage frames, the workbook as read back, and the exported tables."""
+    workbook = pd.read_excel(xlsx_path, sheet_name=None, header=None)
+    return {
+        "frames": {name: _frame_json(df) for name, df in outputs.items()},
+        "workbook": {sheet: _frame_json(df) for sheet, df in workbook.items()},
+        "database": {table: _frame_json(pd.read_sql_table(table, engine))
+                     for _, _, table in pipeline.OUTPUTS},
+    }
+
+
+def _first_difference(expected, actual, path=""):
+    if type(expected) is not type(actual):
+        return f"{path}: {expected!r} != {actual!r}"
+    if isinstance(expected, dict):
+        for key in sorted(set(expected) | set(actual)):
+            if key not in expected or key not in actual:
+                return f"{path}/{key}: present in only one snapshot"
+            diff = _first_difference(expected[key], actual[key], f"{path}/{key}")
+            if diff:
+                return diff
+        return None
+    if isinstance(expected, list):
+        if len(expected) != len(actual):
+            return f"{path}: length {len(expected)} != {len(actual)}"
+        for i, (e, a) in enumerate(zip(expected, actual)):
+            diff = _first_difference(e, a, f"{path}[{i}]")
+            if diff:
+                return diff
+        return None
+    return None if expected == actual else f"{path}: {expected!r} != {actual!r}"
+
+
+def golden_path(section):
+    return os.path.join(GOLDEN_DIR, str(GOLDEN_ROWS), f"{section}.json")
+
+
+def check_golden(current, update=False):
+    """Compare (or with update=True, rewrite) the golden snapshot; returns the list of mismatches."""
+    mismatches = []
+    for section, content in current.items():
+        path = golden_path(section)
+        if update:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8", newline="\n") as f:
+                json.dump(content, f, indent=1, sort_keys=True, ensure_ascii=False)
+                f.write("\n")
+            continue
+        if not os.path.exists(path):
+            mismatches.append(f"{section}: no golden snapshot (run with --update-golden)")
+            continue
+        with open(path, encoding="utf-8") as f:
+            expected = json.load(f)
+        diff = _first_difference(expected, current[section], section)
+        if diff:
+            mismatches.append(diff)
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Command Centre pipeline on synthetic inputs.")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help="data dump row counts to benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the timing report to this file")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip tracemalloc (faster, timings closer to production)")
+    parser.add_argument("--stream-dump", action="store_true",
+                        help="ingest the data dump with the streaming reader (in-memory scales excepted)")
+    parser.add_argument("--engine", choices=["pandas", "sql"], default="pandas",
+                        help="where per-queue aggregates are computed (sql: SQLite files in the work dir)")
+    parser.add_argument("--golden-only", action="store_true", help="only run the golden-output check")
+    parser.add_argument("--update-golden", action="store_true", help="rewrite the golden snapshots")
+    parser.add_argument("--work-dir", help="keep generated inputs/outputs here instead of a temp dir")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="cc_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    report = {"scales": {}}
+    try:
+        if not args.golden_only:
+            for n_rows in args.scales:
+                timings, _, (_, engine) = run_scale(n_rows, work_dir, args.seed, not args.no_memory,
+                                                    stream_dump=args.stream_dump, engine=args.engine)
+                engine.dispose()
+                print_timings(n_rows, timings)
+                report["scales"][str(n_rows)] = timings
+
+        golden_dir = os.path.join(work_dir, "golden_run")
+        _, outputs, (xlsx_path, engine) = run_scale(GOLDEN_ROWS, golden_dir, GOLDEN_SEED, track_memory=False,
+                                                    stream_dump=args.stream_dump, engine=args.engine)
+        mismatches = check_golden(snapshot(outputs, xlsx_path, engine), update=args.update_golden)
+        engine.dispose()
+        report["golden"] = {"rows": GOLDEN_ROWS, "mismatches": mismatches}
+        if args.update_golden:
+            print(f"\nGolden snapshots updated in {os.path.dirname(golden_path('frames'))}")
+        elif mismatches:
+            print("\nGOLDEN MISMATCH:")
+            for m in mismatches:
+                print("  ", m)
+        else:
+            print(f"\nGolden check passed ({GOLDEN_ROWS:,} rows): outputs identical.")
+
+        report["throughput"] = {"mismatches": check_throughput()}
+        if report["throughput"]["mismatches"]:
+            print("\nTHROUGHPUT MISMATCH:")
+            for m in report["throughput"]["mismatches"]:
+                print("  ", m)
+        else:
+            print("Throughput check passed: moves counted as expected.")
+
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"Report written to {args.json}")
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return 1 if report.get("golden", {}).get("mismatches") or report.get("throughput", {}).get("mismatches") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
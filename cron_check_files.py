@@ -1,59 +1,177 @@
 #!/opt/command_centre/venv/bin/python
-import requests, os, time, subprocess
+import requests, os, time, subprocess, json, hashlib
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+import upload_store
 
 # === CONFIGURATION ===
 FUNCTION_KEY = os.getenv("GET_FILES_KEY")
-GET_FILES_URL = f"https://forward-pass-hweec7daafebhqfy.canadacentral-01.azurewebsites.net/api/getNewFiles?code={FUNCTION_KEY}"
-UPLOADS_DIR = "/opt/command_centre/uploads"
-FLASK_API = "http://127.0.0.1:5000/command_centre/api/run_preprocessing"
-PREPROCESS_SCRIPT = "/opt/command_centre/Command_Centre_Final_v1.py"
-
-os.makedirs(UPLOADS_DIR, exist_ok=True)
+# Every URL can be overridden to run the job against local stand-ins (tests/function_standin.py)
+GET_FILES_URL = os.getenv(
+    "GET_FILES_URL",
+    f"https://forward-pass-hweec7daafebhqfy.canadacentral-01.azurewebsites.net/api/getNewFiles?code={FUNCTION_KEY}"
+)
+UPLOADS_DIR = os.getenv("CC_UPLOADS_DIR", "/opt/command_centre/uploads")
+DOWNLOAD_STATE_PATH = os.path.join(UPLOADS_DIR, ".download_state.json")
+DOWNLOAD_WORKERS = int(os.getenv("CC_DOWNLOAD_WORKERS", "4"))
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+API_BASE = os.getenv("CC_API_BASE", "http://127.0.0.1:5000/command_centre/api")
+FLASK_API = f"{API_BASE}/run_preprocessing"
+PREPROCESSING_API = f"{API_BASE}/preprocessing"
+JOB_POLL_INTERVAL = float(os.getenv("CC_JOB_POLL_INTERVAL", "5"))   # seconds between job status checks
+JOB_TIMEOUT = 30 * 60         # give up waiting on the worker after 30 minutes
+INSTALL_DIR = os.getenv("CC_INSTALL_DIR", "/opt/command_centre")
+PREPROCESS_PYTHON = os.getenv("CC_PREPROCESS_PYTHON", os.path.join(INSTALL_DIR, "venv", "bin", "python"))
+PREPROCESS_SCRIPT = os.path.join(INSTALL_DIR, "Command_Centre_Final_v1.py")
 
 def log(msg):
     print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {msg}")
 
+def make_session():
+    """Pooled HTTP session shared by all download threads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=DOWNLOAD_WORKERS, pool_maxsize=DOWNLOAD_WORKERS)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def load_download_state():
+    """Validators (ETag, Last-Modified, sha256) of the last version downloaded per file."""
+    try:
+        with open(DOWNLOAD_STATE_PATH) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+def save_download_state(state):
+    tmp_path = DOWNLOAD_STATE_PATH + ".tmp"
+    with open(tmp_path, "w") as fh:
+        json.dump(state, fh, indent=2)
+    os.replace(tmp_path, DOWNLOAD_STATE_PATH)
+
+def download_one(session, f, previous):
+    """Fetch one blob if it changed. Returns (name, changed, new_state_entry)."""
+    name = os.path.basename(f["filename"])
+    url = f["url"]
+    have_local = name in upload_store.staged()
+
+    headers = {}
+    if have_local and previous.get("etag"):
+        headers["If-None-Match"] = previous["etag"]
+    if have_local and previous.get("last_modified"):
+        headers["If-Modified-Since"] = previous["last_modified"]
+
+    with session.get(url, headers=headers, stream=True, timeout=60) as dl:
+        if dl.status_code == 304:
+            log(f"{name} not modified.")
+            return name, False, previous
+        if dl.status_code != 200:
+            log(f"Failed to download {name}: {dl.status_code}")
+            return name, False, previous
+
+        # Stream into a temp file next to the target, hashing as we go
+        tmp_path = os.path.join(UPLOADS_DIR, f".{name}.download")
+        sha = hashlib.sha256()
+        try:
+            with open(tmp_path, "wb") as fh:
+                for chunk in dl.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    fh.write(chunk)
+                    sha.update(chunk)
+            entry = {
+                "etag": dl.headers.get("ETag"),
+                "last_modified": dl.headers.get("Last-Modified"),
+                "sha256": sha.hexdigest(),
+            }
+            # Into the content-addressed store: runs pick it up once the batch is promoted
+            _, changed = upload_store.ingest_file(tmp_path, name, source="cron", sha256=entry["sha256"])
+            if not changed:
+                log(f"{name} unchanged (same content hash).")
+                return name, False, entry
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    log(f"Downloaded {name} successfully.")
+    return name, True, entry
+
 def download_files():
+    """Download all listed files concurrently; return the names of files that changed."""
     try:
         log("Checking for new files from Azure Function...")
         resp = requests.get(GET_FILES_URL, timeout=60)
         if resp.status_code != 200:
             log(f"Failed to reach Azure Function: {resp.status_code}")
-            return False
+            return []
 
         files = resp.json().get("files", [])
         if not files:
             log("No files found in Azure container.")
-            return False
-
-        for f in files:
-            name = f["filename"]
-            url = f["url"]
-            log(f"Downloading {name}...")
-            dl = requests.get(url, timeout=60)
-            if dl.status_code == 200:
-                local_path = os.path.join(UPLOADS_DIR, name)
-                with open(local_path, "wb") as fh:
-                    fh.write(dl.content)
-                log(f"Downloaded {name} successfully.")
-            else:
-                log(f"Failed to download {name}: {dl.status_code}")
+            return []
 
-        return True
+        os.makedirs(UPLOADS_DIR, exist_ok=True)
+        state = load_download_state()
+        changed = []
+        session = make_session()
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+            futures = [
+                pool.submit(download_one, session, f, state.get(os.path.basename(f["filename"]), {}))
+                for f in files
+            ]
+            for future in futures:
+                try:
+                    name, was_changed, entry = future.result()
+                except Exception as e:
+                    log(f"Error downloading file: {e}")
+                    continue
+                state[name] = entry
+                if was_changed:
+                    changed.append(name)
+        session.close()
+        save_download_state(state)
+        return changed
 
     except Exception as e:
         log(f"Error in download_files: {e}")
-        return False
+        return []
 
 def run_preprocessing():
+    """Submit a job to the Flask app's warm worker; fall back to a local run if it is down."""
+    try:
+        resp = requests.post(PREPROCESSING_API, json={"source": "cron"}, timeout=10)
+        resp.raise_for_status()
+        job_id = resp.json()["job_id"]
+    except Exception as e:
+        log(f"Preprocessing worker unavailable ({e}), running the script directly.")
+        return run_preprocessing_locally()
+
+    log(f"Preprocessing job {job_id} submitted to the worker.")
+    deadline = time.time() + JOB_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(JOB_POLL_INTERVAL)
+        try:
+            job = requests.get(f"{PREPROCESSING_API}/{job_id}", timeout=10).json()
+        except Exception as e:
+            log(f"Could not fetch status of job {job_id}: {e}")
+            continue
+        if job.get("status") in ("succeeded", "coalesced"):
+            log(f"Preprocessing completed. Stages executed: {job.get('stages_executed')}")
+            return True
+        if job.get("status") == "failed":
+            log(f"Preprocessing failed: {job.get('error')}")
+            return False
+    log(f"Timed out waiting for preprocessing job {job_id}.")
+    return False
+
+def run_preprocessing_locally():
     try:
         log("Starting preprocessing...")
         result = subprocess.run(
-            ["/opt/command_centre/venv/bin/python", PREPROCESS_SCRIPT],
+            [PREPROCESS_PYTHON, PREPROCESS_SCRIPT],
 
             capture_output=True,
             text=True,
-            cwd="/opt/command_centre"
+            cwd=INSTALL_DIR
         )
         log("Preprocessing completed.")
         log("STDOUT:")
@@ -65,12 +183,18 @@ def run_preprocessing():
         log(f"Error in run_preprocessing: {e}")
         return False
 
-if __name__ == "__main__":
+def main():
+    """One cron pass: download what changed, preprocess only if anything did. Returns the changed names."""
     log("===== Cron Job Started =====")
-    if download_files():
-        log("All files downloaded. Proceeding to preprocessing...")
+    changed_files = download_files()
+    if changed_files:
+        log(f"Changed files: {', '.join(changed_files)}. Proceeding to preprocessing...")
         run_preprocessing()
     else:
-        log("No files downloaded. Skipping preprocessing.")
+        log("No changed files. Skipping preprocessing.")
     log("===== Cron Job Finished =====\n")
+    return changed_files
+
+if __name__ == "__main__":
+    main()
 
@@ -0,0 +1,93 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from Command_Centre_Final_v1 import OUTPUTS, RUN_MARKER_PATH, get_sqlite_engine
+
+# Screen name -> table written by the pipeline (every configured layout screen included)
+SCREEN_TABLES = {table: table for _, _, table in OUTPUTS}
+
+MAX_CACHED_VIEWS = 256       # serialized (screen, fields) variants kept in memory
+GZIP_MIN_BYTES = 1024        # smaller bodies are not worth compressing
+
+_lock = threading.Lock()
+_frames = {}                 # screen -> (version, DataFrame)
+_views = OrderedDict()       # (screen, fields) -> serialized view
+
+
+def data_version():
+    """Changes whenever a pipeline run completes (in this or any other process)."""
+    try:
+        return os.stat(RUN_MARKER_PATH).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _load_frame(screen, version):
+    with _lock:
+        cached = _frames.get(screen)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    df = pd.read_sql_table(SCREEN_TABLES[screen], get_sqlite_engine())
+    with _lock:
+        _frames[screen] = (version, df)
+    return df
+
+
+def screen_frame(screen, version=None):
+    """The screen's table as of `version` (default: the latest run), read once per run."""
+    return _load_frame(screen, data_version() if version is None else version)
+
+
+def _serialize(screen, df, fields, version):
+    if fields:
+        missing = [f for f in fields if f not in df.columns]
+        if missing:
+            raise KeyError(f"Unknown field(s) for {screen}: {', '.join(missing)}")
+        df = df[list(fields)]
+    body = json.dumps({
+        "screen": screen,
+        "columns": list(df.columns),
+        "rows": json.loads(df.to_json(orient="records")),
+    }, separators=(",", ":")).encode("utf-8")
+    return {
+        "version": version,
+        "body": body,
+        "gzip": gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None,
+        # Content hash: a run that leaves a screen unchanged keeps serving 304s
+        "etag": hashlib.sha1(body).hexdigest(),
+    }
+
+
+def get_view(screen, fields=None):
+    """Serialized screen data (optionally projected to `fields`), rebuilt only after a new run."""
+    if screen not in SCREEN_TABLES:
+        raise LookupError(f"Unknown screen: {screen}")
+    fields = tuple(fields) if fields else ()
+    version = data_version()
+    key = (screen, fields)
+    with _lock:
+        view = _views.get(key)
+        if view is not None and view["version"] == version:
+            _views.move_to_end(key)
+            return view
+
+    view = _serialize(screen, _load_frame(screen, version), fields, version)
+    with _lock:
+        _views[key] = view
+        _views.move_to_end(key)
+        while len(_views) > MAX_CACHED_VIEWS:
+            _views.popitem(last=False)
+    return view
+
+
+def invalidate():
+    """Drop every cached frame and view; the next request reloads from the database."""
+    with _lock:
+        _frames.clear()
+        _views.clear()
@@ -0,0 +1,138 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Float, MetaData, Table, Text, event
+
+import run_metrics
+
+SQLITE_BATCH_SIZE = 5000
+STAGING_SUFFIX = "__staging"
+
+
+def enable_sqlite_transactions(engine):
+    """Make pysqlite wrap DDL in real transactions (SQLAlchemy's documented recipe) and use WAL,
+    so the staging-table swap is atomic and dashboard readers are not blocked by the export."""
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+    @event.listens_for(engine, "begin")
+    def on_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    return engine
+
+
+def column_type(series):
+    """Explicit SQL type for a DataFrame column, decided from its dtype rather than its values."""
+    if pd.api.types.is_bool_dtype(series):
+        return Boolean()
+    if pd.api.types.is_integer_dtype(series):
+        return BigInteger()
+    if pd.api.types.is_float_dtype(series):
+        return Float()
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return DateTime()
+    # Object columns (e.g. layout cells mixing blanks and numbers) keep the type pandas'
+    # to_sql used to pick for them, so readers see the same column types as before
+    inferred = pd.api.types.infer_dtype(series, skipna=True)
+    if inferred == "floating":
+        return Float()
+    if inferred == "integer":
+        return BigInteger()
+    if inferred == "boolean":
+        return Boolean()
+    if inferred in ("datetime", "datetime64"):
+        return DateTime()
+    return Text()
+
+
+def staging_table(name, df):
+    metadata = MetaData()
+    return Table(
+        f"{name}{STAGING_SUFFIX}",
+        metadata,
+        *[Column(str(col), column_type(df[col])) for col in df.columns]
+    )
+
+
+def records(df):
+    """Rows as plain Python values with NaN/NaT turned into NULLs."""
+    clean = df.astype(object).where(df.notna(), None)
+    return clean.to_dict(orient="records")
+
+
+def swap_in(conn, name, staging_name):
+    q = conn.dialect.identifier_preparer.quote
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {q(name)}")
+    conn.exec_driver_sql(f"ALTER TABLE {q(staging_name)} RENAME TO {q(name)}")
+
+
+def load_sqlite(conn, name, df):
+    """Batched executemany into a fresh staging table."""
+    table = staging_table(name, df)
+    table.drop(conn, checkfirst=True)
+    table.create(conn)
+    rows = records(df)
+    for start in range(0, len(rows), SQLITE_BATCH_SIZE):
+        conn.execute(table.insert(), rows[start:start + SQLITE_BATCH_SIZE])
+    return table.name
+
+
+def load_postgres(conn, name, df):
+    """COPY the frame as CSV into a fresh staging table."""
+    table = staging_table(name, df)
+    table.drop(conn, checkfirst=True)
+    table.create(conn)
+
+    q = conn.dialect.identifier_preparer.quote
+    columns = ", ".join(q(str(col)) for col in df.columns)
+    buf = io.StringIO()
+    df.to_csv(buf, index=False, header=False, na_rep="\\N")
+    buf.seek(0)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {q(table.name)} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buf
+        )
+    finally:
+        cursor.close()
+    return table.name
+
+
+def export_snapshot(engine, df_dict, loader, label):
+    """Load every frame into staging tables and swap them all in within one transaction.
+
+    Readers see either the previous snapshot or the new one, never a partial export.
+    """
+    n_rows = sum(len(df) for df in df_dict.values())
+    try:
+        with run_metrics.span("db_export", kind="output", target=label, rows_in=n_rows) as entry:
+            with engine.begin() as conn:
+                staged = {name: loader(conn, name, df) for name, df in df_dict.items()}
+                for name, staging_name in staged.items():
+                    swap_in(conn, name, staging_name)
+            entry["rows_out"] = n_rows
+        for name in df_dict:
+            print(f"Saved '{name}' to {label}")
+        return True
+    except Exception as e:
+        print(f"Error exporting to {label}, previous tables kept:", e)
+        return False
+
+
+def export_to_databases(df_dict, sqlite_engine, postgres_engine=None):
+    """Export all frames to SQLite and PostgreSQL in parallel. Returns {target: succeeded}."""
+    targets = {"SQLite": (sqlite_engine, load_sqlite)}
+    if postgres_engine is not None:
+        targets["PostgreSQL"] = (postgres_engine, load_postgres)
+
+    with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+        futures = {
+            label: pool.submit(export_snapshot, engine, df_dict, loader, label)
+            for label, (engine, loader) in targets.items()
+        }
+        return {label: future.result() for label, future in futures.items()}
@@ -0,0 +1,235 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+import run_metrics
+from db_export import enable_sqlite_transactions
+
+from layout_template import SPECIAL_PRO_QUEUES
+from queue_aggregates import split_qc_queues
+from screen_config import workbook_metric
+
+DOCUMENT_TABLE = "documents"
+
+# One row per document and source sheet, behind the dashboard counts:
+#   data_dump - queue as dumped (PRO or QC), base_queue its PRO queue, locked from Lock Status
+#   reso_dump, pro_pf, reso_pf - queue is the Reso mapping's Queue_Desc of the Doc Type
+SOURCES = ("data_dump", "reso_dump", "pro_pf", "reso_pf")
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+_SCHEMA = [
+    f"""CREATE TABLE {DOCUMENT_TABLE}__staging (
+        id INTEGER PRIMARY KEY,
+        source TEXT NOT NULL,
+        document_id TEXT NOT NULL,
+        doc_type TEXT,
+        queue TEXT,
+        base_queue TEXT,
+        is_qc INTEGER NOT NULL,
+        locked INTEGER NOT NULL
+    )""",
+]
+
+# Created after the rows are loaded (one sorted build per index instead of per-row upkeep)
+_INDEXES = [
+    f"CREATE INDEX ix_{DOCUMENT_TABLE}_queue ON {DOCUMENT_TABLE} (source, queue, locked, doc_type, document_id)",
+    f"CREATE INDEX ix_{DOCUMENT_TABLE}_base_queue ON {DOCUMENT_TABLE} (source, base_queue, is_qc, locked, document_id)",
+    f"CREATE INDEX ix_{DOCUMENT_TABLE}_doc_type ON {DOCUMENT_TABLE} (source, doc_type)",
+    f"CREATE INDEX ix_{DOCUMENT_TABLE}_document_id ON {DOCUMENT_TABLE} (document_id)",
+]
+
+# Dashboard cell (metric column) -> the documents it counts, as document_filters() arguments.
+# The row label of the cell is the queue (base queue for the QC columns); the screens count
+# distinct documents for data dump cells and documents per Doc Type for the others. "Other"
+# section rows show 0 outside PRO Queue; their drill-downs still list the documents.
+CELL_FILTERS = {
+    "PRO Queue": {"source": "data_dump", "queue_column": "queue", "qc": False},
+    "User Locked PRO": {"source": "data_dump", "queue_column": "queue", "qc": False, "locked": True},
+    "QC Queue": {"source": "data_dump", "queue_column": "base_queue", "qc": True},
+    "User Locked QC": {"source": "data_dump", "queue_column": "base_queue", "qc": True, "locked": True},
+    "Processed Volumes": {"source": "data_dump", "queue_column": "queue"},
+    "Reso Queue": {"source": "reso_dump", "queue_column": "queue"},
+    "PRO Personal Folders": {"source": "pro_pf", "queue_column": "queue"},
+    "RESO Personal Folders": {"source": "reso_pf", "queue_column": "queue"},
+}
+
+COLUMNS = ["source", "document_id", "doc_type", "queue", "base_queue", "is_qc", "locked"]
+
+
+def _source_rows(source, ids, doc_types, queues, locked):
+    """Distinct rows of one source in table column order (blank IDs dropped)."""
+    frame = pd.DataFrame({
+        "source": source,
+        "document_id": ids.astype(str).to_numpy(dtype=object),
+        "doc_type": doc_types,
+        "queue": queues,
+        "locked": locked,
+    })[ids.notna().to_numpy()]
+    # A document listed both locked and unlocked in one queue is one locked document, as on the screens
+    frame = frame.sort_values("locked", ascending=False, kind="stable")
+    frame = frame.drop_duplicates(["document_id", "doc_type", "queue"])
+    is_qc, base = split_qc_queues(frame["queue"].fillna(""))
+    frame["base_queue"] = np.where(frame["queue"].notna(), base, None)
+    frame["is_qc"] = is_qc & frame["queue"].notna().to_numpy()
+    return frame[COLUMNS]
+
+
+def build_document_rows(data_dump_df, reso_df, reso_map_df, pro_pf_df, reso_pf_df):
+    """The document table of one run, sorted the way drill-downs page through it."""
+    doc_type_queue = dict(zip(reso_map_df["Doc_Type"], reso_map_df["Queue_Desc"]))
+
+    def mapped(df, id_column, source):
+        doc_types = df["Doc Type"].astype(object)
+        return _source_rows(source, df[id_column], doc_types.to_numpy(),
+                            doc_types.map(doc_type_queue).to_numpy(), False)
+
+    frames = [
+        _source_rows("data_dump", data_dump_df["Document ID"], None,
+                     data_dump_df["Queue"].astype(object).to_numpy(),
+                     data_dump_df["Lock Status"].to_numpy(dtype=bool)),
+        mapped(reso_df, "Doc ID", "reso_dump"),
+        mapped(pro_pf_df, "Document ID", "pro_pf"),
+        mapped(reso_pf_df, "Document ID", "reso_pf"),
+    ]
+    rows = pd.concat(frames, ignore_index=True)
+    rows = rows.sort_values(["source", "queue", "document_id"], na_position="last", kind="stable")
+    return rows.reset_index(drop=True)
+
+
+def replace_documents(engine, rows, batch_size=20000):
+    """Swap in a new document table, indexes included, in one transaction."""
+    q_staging = f"{DOCUMENT_TABLE}__staging"
+    insert = text(f"INSERT INTO {q_staging} ({', '.join(COLUMNS)}) VALUES ({', '.join(':' + c for c in COLUMNS)})")
+    records = rows.astype(object).where(rows.notna(), None)
+    records["is_qc"] = rows["is_qc"].astype(int)
+    records["locked"] = rows["locked"].astype(int)
+    records = records.to_dict(orient="records")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {q_staging}")
+        for statement in _SCHEMA:
+            conn.exec_driver_sql(statement)
+        for start in range(0, len(records), batch_size):
+            conn.execute(insert, records[start:start + batch_size])
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {DOCUMENT_TABLE}")
+        conn.exec_driver_sql(f"ALTER TABLE {q_staging} RENAME TO {DOCUMENT_TABLE}")
+        for statement in _INDEXES:
+            conn.exec_driver_sql(statement)
+        # Statistics let the planner pick the narrowest index (e.g. queue over doc type for breakdowns)
+        conn.exec_driver_sql(f"ANALYZE {DOCUMENT_TABLE}")
+    return len(records)
+
+
+def load_documents(data_dump_df, reso_df, reso_map_df, pro_pf_df, reso_pf_df, db_path):
+    """Pipeline stage: rebuild the document table in the SQLite database at `db_path`.
+    Returns the number of rows loaded, or None if the load failed (the previous table is kept)."""
+    rows = build_document_rows(data_dump_df, reso_df, reso_map_df, pro_pf_df, reso_pf_df)
+    engine = enable_sqlite_transactions(create_engine(f"sqlite:///{db_path}", echo=False))
+    try:
+        with run_metrics.span("documents_load", kind="output", rows_in=len(rows)) as entry:
+            entry["rows_out"] = replace_documents(engine, rows)
+        return entry["rows_out"]
+    except Exception as e:
+        print("Error loading document table, previous table kept:", e)
+        return None
+    finally:
+        engine.dispose()
+
+
+# --- Queries ---
+
+def document_filters(source, queue=None, queue_column="queue", qc=None, locked=None, doc_type=None):
+    """WHERE clause and parameters for a drill-down; every combination is served by an index prefix."""
+    if source not in SOURCES:
+        raise ValueError(f"Unknown source '{source}', expected one of: {', '.join(SOURCES)}")
+    if queue_column not in ("queue", "base_queue"):
+        raise ValueError(f"Unknown queue column '{queue_column}'")
+    clauses, params = ["source = :source"], {"source": source}
+    if queue is not None:
+        clauses.append(f"{queue_column} = :queue")
+        params["queue"] = queue
+    if qc is not None:
+        clauses.append("is_qc = :qc")
+        params["qc"] = int(qc)
+    if locked is not None:
+        clauses.append("locked = :locked")
+        params["locked"] = int(locked)
+    if doc_type is not None:
+        clauses.append("doc_type = :doc_type")
+        params["doc_type"] = doc_type
+    return " AND ".join(clauses), params
+
+
+def cell_filters(metric, queue, special_queues=SPECIAL_PRO_QUEUES):
+    """document_filters() arguments for one dashboard cell (metric column, queue row).
+    Accepts the workbook column names and their database forms ("PRO_Queue"); `special_queues`
+    is the screen's "Other" row mapping."""
+    metric = workbook_metric(metric)
+    if metric not in CELL_FILTERS:
+        raise ValueError(f"No drill-down for '{metric}', expected one of: {', '.join(CELL_FILTERS)}")
+    if metric == "PRO Queue" and queue in special_queues:
+        # Rows the screens fill with another queue's processed volume
+        return dict(CELL_FILTERS["Processed Volumes"], queue=special_queues[queue])
+    return dict(CELL_FILTERS[metric], queue=queue)
+
+
+def page_size(value):
+    size = DEFAULT_PAGE_SIZE if value is None else int(value)
+    if size < 1:
+        raise ValueError("page_size must be at least 1")
+    return min(size, MAX_PAGE_SIZE)
+
+
+def query_documents(engine, filters, after=0, limit=DEFAULT_PAGE_SIZE):
+    """One page of documents matching `filters`, keyset-paginated on the row id.
+
+    Returns {"total", "distinct_documents", "documents", "next"}: `total` counts rows (a document
+    in two queues of one base, e.g. "Fin A QC" and "Fin AQC", is listed under both); pass `next`
+    back as `after` for the following page (None on the last page). The table is replaced as a whole per run, so a cursor from an
+    older run may skip or repeat rows.
+    """
+    where, params = document_filters(**filters)
+    with engine.connect() as conn:
+        if not _table_exists(conn):
+            return {"total": 0, "distinct_documents": 0, "documents": [], "next": None}
+        total, distinct = conn.execute(
+            text(f"SELECT COUNT(*), COUNT(DISTINCT document_id) FROM {DOCUMENT_TABLE} WHERE {where}"), params
+        ).one()
+        rows = conn.execute(
+            text(f"SELECT id, {', '.join(COLUMNS)} FROM {DOCUMENT_TABLE} WHERE {where} AND id > :after "
+                 "ORDER BY id LIMIT :limit"),
+            dict(params, after=int(after), limit=limit + 1)
+        ).fetchall()
+    documents = [dict(row._mapping, is_qc=bool(row.is_qc), locked=bool(row.locked)) for row in rows[:limit]]
+    return {
+        "total": total,
+        "distinct_documents": distinct,
+        "documents": documents,
+        "next": documents[-1]["id"] if len(rows) > limit else None,
+    }
+
+
+def doc_type_breakdown(engine, filters):
+    """Document count per Doc Type among the documents matching `filters`, largest first."""
+    where, params = document_filters(**filters)
+    with engine.connect() as conn:
+        if not _table_exists(conn):
+            return []
+        rows = conn.execute(
+            text(f"SELECT doc_type, COUNT(*) AS documents FROM {DOCUMENT_TABLE} WHERE {where} "
+                 "GROUP BY doc_type ORDER BY documents DESC, doc_type"),
+            params
+        ).fetchall()
+    return [dict(row._mapping) for row in rows]
+
+
+def has_documents(engine):
+    with engine.connect() as conn:
+        return _table_exists(conn)
+
+
+def _table_exists(conn):
+    return conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": DOCUMENT_TABLE}
+    ).first() is not None
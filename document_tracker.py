@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from queue_aggregates import split_qc_queues
+
+# Document-state index carried from one data dump to the next. Each document is a 64-bit hash of
+# its ID; the index holds the sorted (document, queue) pairs of the last dumps applied and, per
+# document, the time it was first seen. Pairs are kept as sets, so a dump listing a document in
+# several queues, or the same rows in another order, gives the same index and digest. A run aligns
+# the new dump's sorted pairs against it (searchsorted), so its cost follows the size of the
+# current dumps, never the length of the history.
+#   Accepted Volumes               left a PRO queue for a QC queue of the same base it was not in
+#   QC'ed Volumes                  left a QC queue and holds no other QC queue of that base
+#                                  (counted for its PRO queue)
+#   Resolutions Completed Volumes  left the Reso dump (counted for its mapped queues)
+#   SLA % Completed                share of QC'ed documents that left QC within SLA_HOURS
+#                                  of first being seen
+# Counts accumulate per window (calendar day); the screens show the current one.
+SLA_HOURS = float(os.getenv("CC_SLA_HOURS", "24"))
+WINDOWS_KEPT = 14
+
+THROUGHPUT_COLUMNS = [
+    "Accepted Volumes",
+    "QC'ed Volumes",
+    "Resolutions Completed Volumes",
+    "SLA Met Volumes",           # QC'ed within SLA; with QC'ed Volumes gives SLA % Completed
+]
+
+# (document key, queue code) pair; sorts by document, then queue
+PAIR = np.dtype([("key", np.uint64), ("queue", np.int32)])
+
+_ARRAYS = ("pairs", "reso_pairs", "documents", "first_seen")
+_META = ("queues", "digest", "windows", "inputs", "base")
+
+
+def current_window(now=None):
+    return datetime.fromtimestamp(time.time() if now is None else now).strftime("%Y-%m-%d")
+
+
+def document_keys(ids):
+    """64-bit hash of each document ID's text form (123 and "123" are the same document)."""
+    return pd.util.hash_array(ids.astype(str).to_numpy(dtype=object))
+
+
+def _empty_state():
+    return {
+        "queues": [],
+        "pairs": np.empty(0, dtype=PAIR),
+        "reso_pairs": np.empty(0, dtype=PAIR),
+        "documents": np.empty(0, dtype=np.uint64),
+        "first_seen": np.empty(0, dtype=np.int64),
+        "digest": None,
+        "windows": {},
+        "inputs": None,     # fingerprint of the inputs the digest was computed from
+        "base": None,       # digest before those inputs were applied
+    }
+
+
+def load_state(path, arrays=_ARRAYS):
+    state = _empty_state()
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            arrays = {name: data[name] for name in arrays}
+    except (OSError, ValueError, KeyError) as e:
+        if os.path.exists(path):
+            print(f"Ignoring unreadable document state {path}:", e)
+        return state
+    state.update(meta)
+    state.update(arrays)
+    return state
+
+
+def save_state(path, state):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    meta = {k: state[k] for k in _META}
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, meta=np.array(json.dumps(meta)), **{k: state[k] for k in _ARRAYS})
+    os.replace(tmp_path, path)
+
+
+def state_base(path, inputs):
+    """Stage-cache key of the index for `inputs` (a fingerprint of the dumps).
+
+    The digest the index had before `inputs` were applied, so the run after the one that applied
+    them keys the same (the index was rewritten, its inputs were not); the current digest otherwise.
+    Reads only the metadata.
+    """
+    state = load_state(path, arrays=())
+    return state["base"] if inputs is not None and state["inputs"] == inputs else state["digest"]
+
+
+def _queue_codes(names, queues):
+    """Codes of `names` in the persisted queue list (-1 for missing names). New queues are
+    appended in sorted order, so the codes never depend on the order of the rows."""
+    names = pd.Series(names, dtype=object)
+    present = names.notna().to_numpy()
+    text = names[present].astype(str)
+    queues.extend(sorted(set(text.unique()) - set(queues)))
+    codes = np.full(len(names), -1, dtype=np.int32)
+    codes[present] = pd.Index(queues).get_indexer(text)
+    return codes
+
+
+def _pairs(keys, codes):
+    """Distinct (key, code) pairs, sorted."""
+    pairs = np.empty(len(keys), dtype=PAIR)
+    pairs["key"] = keys
+    pairs["queue"] = codes
+    return np.unique(pairs)
+
+
+def _align(old_keys, new_keys):
+    """Position of each new key in the sorted old keys, or -1 (keys or pairs)."""
+    if len(old_keys) == 0:
+        return np.full(len(new_keys), -1, dtype=np.int64)
+    pos = np.minimum(np.searchsorted(old_keys, new_keys), len(old_keys) - 1)
+    return np.where(old_keys[pos] == new_keys, pos, -1)
+
+
+def _missing(pairs, other):
+    """Pairs of `pairs` not in `other` (both sorted)."""
+    return pairs[_align(other, pairs) < 0]
+
+
+def _per_queue(codes, n):
+    codes = codes[codes >= 0]
+    return np.bincount(codes, minlength=n).astype(np.int64)
+
+
+def advance(state, data_dump_df, reso_df, reso_map_df, now):
+    """Diff the current dumps against `state`; returns the per-queue throughput counted this run.
+    Updates `state` in place. A dump with the same (document, queue) pairs as the last one
+    applied counts nothing, whatever its row order."""
+    queues = list(state["queues"])
+
+    dump = data_dump_df[data_dump_df["Document ID"].notna()]
+    pairs = _pairs(document_keys(dump["Document ID"]),
+                   _queue_codes(dump["Queue"].astype(object).to_numpy(), queues))
+
+    doc_type_queue = dict(zip(reso_map_df["Doc_Type"], reso_map_df["Queue_Desc"]))
+    reso = reso_df[reso_df["Doc ID"].notna()]
+    reso_pairs = _pairs(document_keys(reso["Doc ID"]),
+                        _queue_codes(reso["Doc Type"].astype(object).map(doc_type_queue).to_numpy(), queues))
+
+    digest = hashlib.sha1(pairs.tobytes() + b"|" + reso_pairs.tobytes()).hexdigest()
+    is_qc, base = split_qc_queues(queues)
+    base_codes, base_names = pd.factorize(base)
+    # Lookup tables by queue code; the trailing slot absorbs missing queues (-1)
+    qc_lut = np.append(is_qc, False)
+    base_lut = np.append(base_codes, -1).astype(np.int32)
+    counts = pd.DataFrame(0, index=base_names, columns=THROUGHPUT_COLUMNS)
+    if digest == state["digest"]:
+        return counts
+
+    def by_base(p, qc):
+        """Distinct (document, base queue) pairs of the PRO (qc=False) or QC pairs in `p`."""
+        p = p[qc_lut[p["queue"]] == qc]
+        return _pairs(p["key"], base_lut[p["queue"]])
+
+    documents = np.unique(pairs["key"])
+    first_seen = np.full(len(documents), int(now), dtype=np.int64)
+    old_pairs = state["pairs"]
+    if len(old_pairs):
+        pos = _align(state["documents"], documents)
+        kept = pos >= 0
+        first_seen[kept] = state["first_seen"][pos[kept]]
+
+        removed, added = _missing(old_pairs, pairs), _missing(pairs, old_pairs)
+        # A PRO queue left for a QC queue of its base the document was not already in
+        left_pro, entered_qc = by_base(removed, False), by_base(added, True)
+        accepted = left_pro[_align(entered_qc, left_pro) >= 0]
+        counts["Accepted Volumes"] = _per_queue(accepted["queue"], len(base_names))
+
+        # A QC queue left, with no QC queue of that base remaining (gone from the dump or moved on)
+        qced = _missing(by_base(removed, True), by_base(pairs, True))
+        seen = state["first_seen"][_align(state["documents"], qced["key"])]
+        within_sla = (now - seen) <= SLA_HOURS * 3600
+        counts["QC'ed Volumes"] = _per_queue(qced["queue"], len(base_names))
+        counts["SLA Met Volumes"] = _per_queue(qced["queue"][within_sla], len(base_names))
+
+    old_reso = state["reso_pairs"]
+    if len(old_reso):
+        resolved = old_reso[_align(np.unique(reso_pairs["key"]), old_reso["key"]) < 0]
+        resolved = _pairs(resolved["key"], base_lut[resolved["queue"]])
+        counts["Resolutions Completed Volumes"] = _per_queue(resolved["queue"], len(base_names))
+
+    state.update(queues=queues, pairs=pairs, reso_pairs=reso_pairs, documents=documents,
+                 first_seen=first_seen, digest=digest)
+    return counts
+
+
+def track_document_throughput(data_dump_df, reso_df, reso_map_df, state_path, window, inputs=None, base=None):
+    """Apply this run's dumps to the persisted index and return the window's per-queue throughput.
+
+    `inputs` fingerprints the dumps and is recorded with the index; `base` (state_base()) only
+    keys the stage cache.
+    """
+    state = load_state(state_path)
+    digest = state["digest"]
+    counts = advance(state, data_dump_df, reso_df, reso_map_df, time.time())
+
+    windows = state["windows"]
+    totals = pd.DataFrame(windows.get(window, {}), columns=THROUGHPUT_COLUMNS, dtype=np.float64).fillna(0)
+    totals = totals.add(counts[(counts != 0).any(axis=1)], fill_value=0).fillna(0).astype(np.int64)
+    if state["digest"] != digest:
+        state.update(inputs=inputs, base=digest)
+    if state["digest"] != digest or window not in windows:
+        windows[window] = {col: {q: int(v) for q, v in totals[col].items() if v} for col in THROUGHPUT_COLUMNS}
+        state["windows"] = {w: windows[w] for w in sorted(windows)[-WINDOWS_KEPT:]}
+        save_state(state_path, state)
+    return totals
+
+
+def sla_percent(completed, met):
+    """SLA % Completed, in whole percent, from QC'ed and in-SLA counts (0 where nothing was completed)."""
+    completed = pd.to_numeric(completed, errors="coerce").fillna(0)
+    met = pd.to_numeric(met, errors="coerce").fillna(0)
+    return (100 * met / completed.where(completed > 0)).fillna(0).round().astype(int)
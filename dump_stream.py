@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+# The strings read_excel turns into NaN by default; matched here so both paths see the same blanks
+from pandas._libs.parsers import STR_NA_VALUES
+
+from input_schema import INPUT_SCHEMAS, LOCKED_VALUES, to_ids
+
+CHUNK_ROWS = 50000
+DOC_BITS = 40                         # (queue code, document code) packed into one int64 key
+DOC_MASK = (1 << DOC_BITS) - 1
+
+NA_STRINGS = frozenset(STR_NA_VALUES) | frozenset(ERROR_CODES)
+
+
+def cell_value(value):
+    """A cell as read_excel would hold it: NA strings/errors -> None, integral floats -> int."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return None if value in NA_STRINGS else value
+    if isinstance(value, float):
+        if value != value:
+            return None
+        if value.is_integer():
+            return int(value)
+    return value
+
+
+def _column_index(header, column, path, name):
+    for i, value in enumerate(header):
+        if value is not None and str(value).strip() == column:
+            return i
+    schema = INPUT_SCHEMAS[name]
+    raise ValueError(f"{path} [{schema.sheet}]: missing column {column} (needed by {', '.join(schema.used_by)})")
+
+
+def sheet_rows(path, name, columns):
+    """Yield `columns` of every data row of input `name` (schema sheet, openpyxl read-only),
+    each cell as read_excel would hold it. The sheet is never materialized."""
+    sheet = INPUT_SCHEMAS[name].sheet
+    wb = load_workbook(path, read_only=True)
+    try:
+        ws = wb.worksheets[sheet] if isinstance(sheet, int) else wb[sheet]
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, ())
+        indexes = [_column_index(header, column, path, name) for column in columns]
+        width = max(indexes) + 1
+        for row in rows:
+            if len(row) < width:
+                row = tuple(row) + (None,) * (width - len(row))
+            yield tuple(cell_value(row[i]) for i in indexes)
+    finally:
+        wb.close()
+
+
+def read_sheet(path, name):
+    """Input `name` as a frame of its schema columns, cells as read (for small reference sheets)."""
+    columns = list(INPUT_SCHEMAS[name].columns)
+    return pd.DataFrame(list(sheet_rows(path, name, columns)), columns=columns, dtype=object)
+
+
+def _distinct_keys(coded, chunk_rows):
+    """Distinct packed (group, document) keys of (group code, document code, flag) rows, and
+    those of the flagged rows. Folded chunk by chunk: memory follows the distinct pairs, not the rows."""
+    keys = np.empty(0, dtype=np.int64)
+    flagged_keys = np.empty(0, dtype=np.int64)
+    pending = []                                # per-chunk uniques not yet folded in
+
+    def compact():
+        nonlocal keys, flagged_keys
+        keys = np.unique(np.concatenate([keys] + [k for k, _ in pending]))
+        flagged_keys = np.unique(np.concatenate([flagged_keys] + [k for _, k in pending]))
+        pending.clear()
+
+    def merge(chunk_keys, chunk_flags):
+        chunk_keys = np.asarray(chunk_keys, dtype=np.int64)
+        chunk_flags = np.asarray(chunk_flags, dtype=bool)
+        pending.append((np.unique(chunk_keys), np.unique(chunk_keys[chunk_flags])))
+        # Fold in once the backlog rivals what is already merged: amortized O(pairs log pairs)
+        if sum(len(k) for k, _ in pending) >= max(len(keys), chunk_rows):
+            compact()
+
+    chunk_keys, chunk_flags = [], []
+    for group, doc, flag in coded:
+        chunk_keys.append((group << DOC_BITS) | doc)
+        chunk_flags.append(flag)
+        if len(chunk_keys) >= chunk_rows:
+            merge(chunk_keys, chunk_flags)
+            chunk_keys, chunk_flags = [], []
+    merge(chunk_keys, chunk_flags)
+    compact()
+    return keys, flagged_keys
+
+
+def _decoded(codes):
+    """Values of a value -> code dict, ordered by code."""
+    values = np.empty(len(codes), dtype=object)
+    values[list(codes.values())] = list(codes.keys())
+    return values
+
+
+def stream_distinct_dump(path, chunk_rows=CHUNK_ROWS):
+    """Read the data dump row by row (openpyxl read-only) without materializing the sheet.
+
+    Returns a schema-conformant frame holding each distinct (Queue, Document ID, locked)
+    combination once. Distinct-document counts over it equal those over the full dump,
+    so build_queue_aggregates gives identical numbers. Memory is bounded by the distinct
+    queues, documents and queue/document pairs: 8 bytes per pair, never per sheet row or column.
+    """
+    queue_codes = {}      # queue name -> code
+    doc_codes = {}        # raw document ID -> code
+    lock_flags = {}       # Lock Status cell -> bool
+
+    def coded():
+        for queue, doc, lock in sheet_rows(path, "data_dump", ("Queue", "Document ID", "Lock Status")):
+            if queue is None:
+                continue
+            q = queue_codes.setdefault(queue, len(queue_codes))
+            if doc is None:
+                continue
+            locked = lock_flags.get(lock)
+            if locked is None:
+                locked = lock is not None and str(lock).strip().upper() in LOCKED_VALUES
+                lock_flags[lock] = locked
+            yield q, doc_codes.setdefault(doc, len(doc_codes)), locked
+
+    keys, locked_keys = _distinct_keys(coded(), chunk_rows)
+    return distinct_frame(queue_codes, doc_codes, keys, locked_keys)
+
+
+def stream_distinct_doc_types(path, name, id_column, chunk_rows=CHUNK_ROWS):
+    """Distinct (Doc Type, document) rows of a Doc Type sheet (reso dump, personal folders),
+    read like stream_distinct_dump; rows without a Doc Type or ID are left out."""
+    type_codes = {}
+    doc_codes = {}
+
+    def coded():
+        for doc_type, doc in sheet_rows(path, name, ("Doc Type", id_column)):
+            if doc_type is not None and doc is not None:
+                t = type_codes.setdefault(doc_type, len(type_codes))
+                yield t, doc_codes.setdefault(doc, len(doc_codes)), False
+
+    keys, _ = _distinct_keys(coded(), chunk_rows)
+    doc_values = to_ids(pd.Series(_decoded(doc_codes), dtype=object))
+    return pd.DataFrame({
+        "Doc Type": pd.Series(_decoded(type_codes)[keys >> DOC_BITS], dtype=object).astype("category"),
+        id_column: doc_values.iloc[keys & DOC_MASK].reset_index(drop=True),
+    })
+
+
+def distinct_frame(queue_codes, doc_codes, keys, locked_keys):
+    """Decode packed keys into Queue / Document ID / Lock Status rows (schema dtypes)."""
+    queues = _decoded(queue_codes)
+    # Same ID rule as the DataFrame path: all-integral IDs become int64 (so 123 and "123" are one document)
+    doc_values = to_ids(pd.Series(_decoded(doc_codes), dtype=object))
+
+    all_keys = np.concatenate([keys, locked_keys])
+    queue_idx = np.concatenate([all_keys >> DOC_BITS, np.arange(len(queues))])
+    doc_idx = all_keys & DOC_MASK
+    locked = np.concatenate([np.zeros(len(keys), dtype=bool), np.ones(len(locked_keys), dtype=bool),
+                             np.zeros(len(queues), dtype=bool)])
+    # One document-less row per queue keeps queues that only had blank IDs in the categories
+    doc_column = pd.concat([doc_values.iloc[doc_idx], pd.Series([None] * len(queues), dtype=object)],
+                           ignore_index=True)
+    if pd.api.types.is_integer_dtype(doc_values.dtype):
+        doc_column = doc_column.astype("Int64")
+    return pd.DataFrame({
+        "Queue": pd.Series(queues[queue_idx], dtype=object).astype("category"),
+        "Document ID": doc_column,
+        "Lock Status": locked,
+    })
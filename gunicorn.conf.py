@@ -0,0 +1,20 @@
+import os
+
+# Serve app.py with: gunicorn -c gunicorn.conf.py wsgi:app
+bind = os.getenv("CC_BIND", "0.0.0.0:5000")
+
+# One process by default: the preprocessing scheduler, warm pipeline worker and upload
+# counters live in it. Concurrency comes from threads; upload parsing goes to the
+# bounded request pool (CC_POOL_WORKERS / CC_POOL_QUEUE / CC_POOL_TIMEOUT_SECONDS).
+workers = int(os.getenv("CC_WEB_WORKERS", "1"))
+worker_class = "gthread"
+# Each open screen event stream holds a thread: keep room for CC_SSE_MAX_CLIENTS (32) of them
+threads = int(os.getenv("CC_WEB_THREADS", "40"))
+
+# Hard limit for a worker that stops responding; per-request limits are enforced by the pool
+timeout = int(os.getenv("CC_WEB_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
@@ -0,0 +1,177 @@
+import re
+from datetime import datetime, timedelta
+
+import pandas as pd
+from sqlalchemy import text
+
+from screen_config import workbook_metric
+
+HISTORY_TABLE = "queue_history"
+
+# Full resolution for a week, then the last run of every hour, dropped after 90 days
+RAW_RETENTION_DAYS = 7
+HISTORY_RETENTION_DAYS = 90
+
+# Executive View rows that start a section; rows below them are stored as "<section> / <row>"
+EXEC_SECTION_SUFFIXES = (" Volumes",)
+EXEC_SECTION_ROWS = {"Other Queues"}
+
+TS_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+_SCHEMA = [
+    f"""CREATE TABLE IF NOT EXISTS {HISTORY_TABLE} (
+        run_ts TEXT NOT NULL,
+        screen TEXT NOT NULL,
+        queue TEXT NOT NULL,
+        metric TEXT NOT NULL,
+        value REAL NOT NULL
+    )""",
+    f"CREATE INDEX IF NOT EXISTS ix_{HISTORY_TABLE}_series ON {HISTORY_TABLE} (screen, queue, metric, run_ts)",
+    f"CREATE INDEX IF NOT EXISTS ix_{HISTORY_TABLE}_run_ts ON {HISTORY_TABLE} (run_ts)",
+]
+
+
+def metric_name(metric):
+    """Stored form of a metric name: the workbook's ("PRO Queue"), also for the database and
+    API column form ("PRO_Queue"), mapped through the screen config's METRIC_COLUMNS."""
+    return workbook_metric(metric)
+
+
+def ensure_schema(conn):
+    for statement in _SCHEMA:
+        conn.exec_driver_sql(statement)
+
+
+def layout_snapshot(df, screen):
+    """Long-format rows (screen, queue, metric, value) from a GDC/HNW frame indexed by queue name."""
+    numeric = df.apply(pd.to_numeric, errors="coerce")
+    numeric = numeric.loc[:, numeric.notna().any()]
+    numeric = numeric.loc[[str(q) != "nan" for q in numeric.index]]
+    long = numeric.rename_axis("queue").reset_index().melt(id_vars="queue", var_name="metric")
+    long = long.dropna(subset=["value"])
+    long["metric"] = long["metric"].map(metric_name)
+    long.insert(0, "screen", screen)
+    long["queue"] = long["queue"].astype(str)
+    return long
+
+
+def executive_snapshot(df_exec, screen="executive_view", sections=None):
+    """Long-format rows from the Executive View, qualifying rows with their section name.
+    `sections` names the section header rows (default: recognized by EXEC_SECTION_SUFFIXES/ROWS)."""
+    label_col = df_exec.columns[0]
+    metric_cols = [c for c in df_exec.columns[1:] if "Bulletin Board" not in c]
+    section = None
+    names = []
+    for label in df_exec[label_col].astype(str):
+        if (label in sections) if sections is not None else (
+                label.endswith(EXEC_SECTION_SUFFIXES) or label in EXEC_SECTION_ROWS):
+            section = label
+            names.append(label)
+        else:
+            names.append(f"{section} / {label}" if section else label)
+    frame = df_exec[metric_cols].copy()
+    frame.index = names
+    return layout_snapshot(frame, screen)
+
+
+def append_snapshot(engine, frames, run_ts=None):
+    """Append one run's per-queue volumes to the history table and apply retention.
+
+    `frames` maps a screen name to a long-format frame from layout_snapshot/executive_snapshot.
+    """
+    run_ts = run_ts or datetime.now()
+    ts = run_ts.strftime(TS_FORMAT)
+    rows = pd.concat(frames.values(), ignore_index=True)
+    rows.insert(0, "run_ts", ts)
+    records = rows.astype({"value": float}).to_dict(orient="records")
+    with engine.begin() as conn:
+        ensure_schema(conn)
+        if records:
+            conn.execute(
+                text(f"INSERT INTO {HISTORY_TABLE} (run_ts, screen, queue, metric, value) "
+                     "VALUES (:run_ts, :screen, :queue, :metric, :value)"),
+                records
+            )
+        apply_retention(conn, run_ts)
+    return len(records)
+
+
+def apply_retention(conn, now):
+    """Drop expired rows and downsample older ones to the last run of each hour."""
+    expire_before = (now - timedelta(days=HISTORY_RETENTION_DAYS)).strftime(TS_FORMAT)
+    downsample_before = (now - timedelta(days=RAW_RETENTION_DAYS)).strftime(TS_FORMAT)
+    conn.execute(text(f"DELETE FROM {HISTORY_TABLE} WHERE run_ts < :cutoff"), {"cutoff": expire_before})
+    conn.execute(
+        text(f"""DELETE FROM {HISTORY_TABLE}
+                 WHERE run_ts < :cutoff
+                   AND run_ts NOT IN (
+                       SELECT MAX(run_ts) FROM {HISTORY_TABLE}
+                       WHERE run_ts < :cutoff
+                       GROUP BY substr(run_ts, 1, 13)
+                   )"""),
+        {"cutoff": downsample_before}
+    )
+
+
+def parse_period(period):
+    """'30m', '6h', '1d' or '2w' -> timedelta."""
+    match = re.fullmatch(r"\s*(\d+)\s*([mhdw])\s*", str(period))
+    if not match:
+        raise ValueError(f"Invalid period '{period}', expected e.g. 30m, 6h, 1d or 2w")
+    amount, unit = int(match.group(1)), match.group(2)
+    return {"m": timedelta(minutes=amount), "h": timedelta(hours=amount),
+            "d": timedelta(days=amount), "w": timedelta(weeks=amount)}[unit]
+
+
+def query_series(engine, screen, queue, metric=None, start=None, end=None):
+    """Time series for one queue (or category total) of a screen, oldest first.
+    `metric` may be given in either form metric_name() accepts."""
+    sql = f"SELECT run_ts, metric, value FROM {HISTORY_TABLE} WHERE screen = :screen AND queue = :queue"
+    params = {"screen": screen, "queue": queue}
+    if metric:
+        sql += " AND metric = :metric"
+        params["metric"] = metric_name(metric)
+    if start:
+        sql += " AND run_ts >= :start"
+        params["start"] = start
+    if end:
+        sql += " AND run_ts <= :end"
+        params["end"] = end
+    sql += " ORDER BY metric, run_ts"
+    with engine.connect() as conn:
+        ensure_schema(conn)
+        return [dict(row._mapping) for row in conn.execute(text(sql), params)]
+
+
+def query_delta(engine, screen, queue, metric, period="1d"):
+    """Latest value of a series against its value one period earlier."""
+    metric = metric_name(metric)
+    series_filter = "screen = :screen AND queue = :queue AND metric = :metric"
+    params = {"screen": screen, "queue": queue, "metric": metric}
+    with engine.connect() as conn:
+        ensure_schema(conn)
+        latest = conn.execute(
+            text(f"SELECT run_ts, value FROM {HISTORY_TABLE} WHERE {series_filter} "
+                 "ORDER BY run_ts DESC LIMIT 1"),
+            params
+        ).fetchone()
+        if latest is None:
+            return None
+        baseline_ts = (datetime.strptime(latest.run_ts, TS_FORMAT) - parse_period(period)).strftime(TS_FORMAT)
+        previous = conn.execute(
+            text(f"SELECT run_ts, value FROM {HISTORY_TABLE} WHERE {series_filter} AND run_ts <= :ts "
+                 "ORDER BY run_ts DESC LIMIT 1"),
+            dict(params, ts=baseline_ts)
+        ).fetchone()
+
+    result = {
+        "screen": screen, "queue": queue, "metric": metric, "period": period,
+        "current_ts": latest.run_ts, "current": latest.value,
+        "previous_ts": None, "previous": None, "delta": None, "pct_change": None,
+    }
+    if previous is not None:
+        result.update(previous_ts=previous.run_ts, previous=previous.value,
+                      delta=latest.value - previous.value)
+        if previous.value:
+            result["pct_change"] = round(100.0 * result["delta"] / previous.value, 2)
+    return result
@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+from openpyxl import load_workbook
+
+from pipeline_dag import file_fingerprint
+
+# One input sheet: `columns` maps each column a stage reads to its target dtype, `used_by`
+# names those stages. Columns not listed here are never materialized.
+#   "category"  - repeated names (queues, doc types), stored as pandas categoricals
+#   "id"        - document IDs, int64 (nullable Int64 with blanks); non-numeric IDs are kept as read
+#   "lock_flag" - bool, True where the cell reads Y or LOCKED (any case/whitespace)
+#   "text"      - left as read
+SheetSchema = namedtuple("SheetSchema", ["sheet", "columns", "used_by"])
+
+LOCKED_VALUES = {"Y", "LOCKED"}
+
+INPUT_SCHEMAS = {
+    "data_dump": SheetSchema("ag-grid", {
+        "Queue": "category",
+        "Document ID": "id",
+        "Lock Status": "lock_flag",
+    }, used_by=("queue_aggregates", "document_throughput", "documents")),
+    "reso_dump": SheetSchema("ag-grid", {
+        "Doc Type": "category",
+        "Doc ID": "id",
+    }, used_by=("queue_aggregates", "document_throughput", "documents")),
+    "reso_map": SheetSchema("Added by Charmaine", {
+        "Doc_Type": "text",
+        "Queue_Desc": "text",
+    }, used_by=("queue_aggregates", "document_throughput", "documents")),
+    "pro_pf": SheetSchema(0, {
+        "Doc Type": "category",
+        "Document ID": "id",
+    }, used_by=("queue_aggregates", "documents")),
+    "reso_pf": SheetSchema(0, {
+        "Doc Type": "category",
+        "Document ID": "id",
+    }, used_by=("queue_aggregates", "documents")),
+    "boa": SheetSchema("MasterList_of_Members", {
+        "Member Name": "text",
+        "Supervisor": "text",
+        "Shift Schedule": "text",
+    }, used_by=("users_productivity",)),
+    "calendar": SheetSchema("Events", {
+        "Event": "text",
+        "Start Day (YYYY-MM-DD)": "text",
+        "Start Time (HH:MM)": "text",
+        "End Day (YYYY-MM-DD)": "text",
+        "End Time (HH:MM)": "text",
+    }, used_by=("calendar",)),
+}
+
+_validated = {}   # schema name -> fingerprint of the file that passed (paths change per upload snapshot)
+
+
+def usecols(name):
+    """read_excel `usecols` callable keeping only the schema's columns (header whitespace ignored)."""
+    wanted = set(INPUT_SCHEMAS[name].columns)
+    return lambda column: str(column).strip() in wanted
+
+
+def to_ids(series):
+    numeric = pd.to_numeric(series, errors="coerce")
+    present = series.notna()
+    if numeric[present].isna().any() or (numeric[present] % 1 != 0).any():
+        return series
+    if present.all():
+        return numeric.astype(np.int64)
+    return numeric.astype("Int64")
+
+
+def to_lock_flags(series):
+    """Vectorized over distinct values: NaN, blanks and anything else count as unlocked."""
+    codes, uniques = pd.factorize(series)
+    flags = np.array([str(u).strip().upper() in LOCKED_VALUES for u in uniques] + [False])
+    return pd.Series(flags[codes], index=series.index, name=series.name)
+
+
+CONVERTERS = {
+    "category": lambda s: s.astype("category"),
+    "id": to_ids,
+    "lock_flag": to_lock_flags,
+    "text": lambda s: s,
+}
+
+
+def missing_columns(columns, name):
+    present = {str(c).strip() for c in columns}
+    return [c for c in INPUT_SCHEMAS[name].columns if c not in present]
+
+
+def conform(df, name, source="input"):
+    """Keep the schema's columns (in schema order) and convert them to their target dtypes."""
+    schema = INPUT_SCHEMAS[name]
+    missing = missing_columns(df.columns, name)
+    if missing:
+        raise ValueError(f"{source}: missing column(s) {', '.join(missing)} "
+                         f"(needed by {', '.join(schema.used_by)})")
+    df = df.rename(columns=lambda c: str(c).strip())
+    return pd.DataFrame({
+        column: CONVERTERS[dtype](df[column]) for column, dtype in schema.columns.items()
+    })
+
+
+def header_problems(path, name):
+    """Problems with one input file's sheet and header row, read without loading the data."""
+    schema = INPUT_SCHEMAS[name]
+    try:
+        wb = load_workbook(path, read_only=True)
+    except FileNotFoundError:
+        return [f"{path}: file not found"]
+    except Exception as e:
+        return [f"{path}: not a readable workbook ({e})"]
+    try:
+        if isinstance(schema.sheet, int):
+            ws = wb.worksheets[schema.sheet] if schema.sheet < len(wb.worksheets) else None
+        else:
+            ws = wb[schema.sheet] if schema.sheet in wb.sheetnames else None
+        if ws is None:
+            return [f"{path}: sheet '{schema.sheet}' not found"]
+        header = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ())
+    finally:
+        wb.close()
+    missing = missing_columns([c for c in header if c is not None], name)
+    if missing:
+        return [f"{path} [{schema.sheet}]: missing column(s) {', '.join(missing)} "
+                f"(needed by {', '.join(schema.used_by)})"]
+    return []
+
+
+def validate_inputs(paths):
+    """Check every input's sheet and header against the schema before any stage runs.
+
+    `paths` maps schema name -> workbook path. Files that already passed are not reopened
+    until their content changes. Raises ValueError listing every problem found.
+    """
+    problems = []
+    for name, path in paths.items():
+        try:
+            fingerprint = file_fingerprint(path)
+        except OSError:
+            problems.append(f"{path}: file not found")
+            continue
+        if _validated.get(name) == fingerprint:
+            continue
+        found = header_problems(path, name)
+        if found:
+            problems.extend(found)
+        else:
+            _validated[name] = fingerprint
+    if problems:
+        raise ValueError("Input schema check failed:\n  " + "\n  ".join(problems))
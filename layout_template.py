@@ -0,0 +1,157 @@
+import hashlib
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+import run_metrics
+from pipeline_dag import file_fingerprint, load_cached, store_cached
+
+# Row labels the screen rollups address by name
+GRAND_TOTAL_LABEL = "Grand Total by Queue:"
+OTHER_TOTAL_LABEL = "Other - Total"
+OTHER_SECTION_ROWS = [
+    "Incoming Fax Queue",
+    "Incoming Email Queue",
+    "Index Queue",
+    "Doc Translation",
+    "Reso Validation",
+    "RMA",
+    "United Doc Translation"
+]
+
+# "Other" rows whose PRO Queue shows the processed volume of a differently named queue
+SPECIAL_PRO_QUEUES = {
+    "Doc Translation": "DocTranslation",
+    "Reso Validation": "ResolutionValidation",
+    "RMA": "ResolutionManagerApproval",
+    "Index Queue": "General Index"
+}
+
+# A GDC/HNW-style screen: `frame` is the sheet below its header row with cleaned column
+# names and a normalized QueueName column; `label_rows` maps each QueueName to its row positions.
+ScreenTemplate = namedtuple("ScreenTemplate", ["sheet_name", "header_row", "columns", "frame", "label_rows"])
+# A plain table (e.g. USERS_Productivity): first row is the header, names stripped.
+TableTemplate = namedtuple("TableTemplate", ["sheet_name", "columns", "frame"])
+
+CACHE_NAME = "layout_template"
+
+_compiled = {}    # template key -> {sheet: {"screen": ScreenTemplate or None, "table": TableTemplate}}; latest only
+
+
+def clean_columns(df):
+    df.columns = (
+        df.columns.astype(str)
+        .str.strip()
+        .str.replace("\xa0", " ", regex=False)
+        .str.replace(r"\s+", " ", regex=True)
+    )
+    return df
+
+
+def find_header_row(raw):
+    """Position of the first row with a "PRO Queue" cell, or None."""
+    hits = raw.astype(str).apply(lambda col: col.str.contains("PRO Queue", case=False, regex=False)).any(axis=1)
+    positions = np.flatnonzero(hits.to_numpy())
+    return int(positions[0]) if len(positions) else None
+
+
+def compile_screen(sheet_name, raw):
+    header_row = find_header_row(raw)
+    if header_row is None:
+        return None
+    columns = [str(c).strip().replace("\xa0", " ") for c in raw.iloc[header_row].tolist()]
+
+    frame = raw.iloc[header_row + 1:].reset_index(drop=True)
+    frame.columns = columns
+    frame = clean_columns(frame)
+    if "QueueName" not in frame.columns:
+        frame.insert(0, "QueueName", raw.iloc[header_row + 1:, 0].reset_index(drop=True))
+    frame["QueueName"] = (
+        frame["QueueName"].astype(str)
+        .str.strip()
+        .str.replace(r"\s+", " ", regex=True)
+    )
+    label_rows = frame.groupby("QueueName", sort=False).indices
+    return ScreenTemplate(sheet_name, header_row, list(frame.columns), frame, label_rows)
+
+
+def compile_table(sheet_name, raw):
+    columns = [str(c).strip() for c in raw.iloc[0].tolist()] if len(raw) else []
+    frame = raw[1:].reset_index(drop=True)
+    frame.columns = columns
+    return TableTemplate(sheet_name, columns, frame)
+
+
+def compile_workbook(path):
+    """Parse every sheet of the layout workbook once and compile both template kinds."""
+    with run_metrics.span(os.path.basename(path), kind="input", bytes=os.path.getsize(path)) as entry:
+        sheets = pd.read_excel(path, sheet_name=None, header=None)
+        entry["rows_out"] = run_metrics.count_rows(sheets)
+    return {
+        sheet_name: {"screen": compile_screen(sheet_name, raw), "table": compile_table(sheet_name, raw)}
+        for sheet_name, raw in sheets.items()
+    }
+
+
+def template_key(path):
+    """Workbook content hash + this module's source, so a compiler change recompiles."""
+    h = hashlib.sha256()
+    h.update(file_fingerprint(path).encode())
+    h.update(file_fingerprint(os.path.abspath(__file__)).encode())
+    return h.hexdigest()[:32]
+
+
+def compiled_layout(path, cache_dir):
+    """Compiled templates of the layout workbook: from memory, else the persisted copy, else parsed."""
+    key = template_key(path)
+    if key in _compiled:
+        return _compiled[key]
+    hit, templates = load_cached(cache_dir, CACHE_NAME, key)
+    if not hit:
+        print(f"Compiling layout templates from {os.path.basename(path)}...")
+        templates = compile_workbook(path)
+        store_cached(cache_dir, CACHE_NAME, key, templates)
+    _compiled.clear()
+    _compiled[key] = templates
+    return templates
+
+
+def _sheet(path, sheet_name, cache_dir):
+    templates = compiled_layout(path, cache_dir)
+    if sheet_name not in templates:
+        raise ValueError(f"{os.path.basename(path)}: sheet '{sheet_name}' not found")
+    return templates[sheet_name]
+
+
+def screen_template(path, sheet_name, cache_dir):
+    template = _sheet(path, sheet_name, cache_dir)["screen"]
+    if template is None:
+        raise ValueError(f"{os.path.basename(path)} [{sheet_name}]: no header row with a 'PRO Queue' column")
+    return template
+
+
+def table_template(path, sheet_name, cache_dir):
+    return _sheet(path, sheet_name, cache_dir)["table"]
+
+
+def rows_mask(template, labels):
+    """Boolean row mask of the rows carrying any of `labels`."""
+    mask = np.zeros(len(template.frame), dtype=bool)
+    for label in labels:
+        positions = template.label_rows.get(label)
+        if positions is not None:
+            mask[positions] = True
+    return mask
+
+
+def category_membership(template, category_headers):
+    """Category of each row: the nearest category header above it (grand-total rows excluded)."""
+    labels = template.frame["QueueName"]
+    is_header = labels.isin(category_headers)
+    current = labels.where(is_header).ffill()
+    member = ~is_header & (labels != GRAND_TOTAL_LABEL) & current.notna()
+    # Resolved by label, last occurrence winning, as the screens have always done
+    mapping = dict(zip(labels[member], current[member]))
+    return labels.map(mapping)
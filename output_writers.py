@@ -0,0 +1,142 @@
+import importlib.util
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+
+import run_metrics
+
+ROW_CHUNK = 10000      # rows converted to Python values at a time by the Excel writer
+
+# Header cells look like the ones pandas' to_excel writes
+_THIN = Side(style="thin")
+HEADER_FONT = Font(bold=True)
+HEADER_BORDER = Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN)
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="top")
+
+
+# --- Writers ---
+
+def _cell_columns(chunk):
+    """Each column of `chunk` as an object array of plain Python values (blanks -> None)."""
+    columns = []
+    for j in range(chunk.shape[1]):
+        series = chunk.iloc[:, j]
+        values = series.to_numpy(dtype=object, na_value=None)
+        if pd.api.types.is_float_dtype(series.dtype):
+            raw = series.to_numpy()
+            values[np.isposinf(raw)] = "inf"      # as to_excel's default inf_rep
+            values[np.isneginf(raw)] = "-inf"
+        columns.append(values)
+    return columns
+
+
+def write_xlsx(sheets, path):
+    """Workbook with one sheet per (name, frame), streamed in openpyxl's write-only mode.
+
+    Rows go straight to the sheet XML instead of a cell tree held for the whole workbook,
+    so memory stays flat in the number of rows. Values read back as with to_excel(index=False).
+    """
+    wb = Workbook(write_only=True)
+    for sheet_name, df in sheets:
+        ws = wb.create_sheet(title=sheet_name)
+        header = []
+        for column in df.columns:
+            cell = WriteOnlyCell(ws, value=column)
+            cell.font, cell.border, cell.alignment = HEADER_FONT, HEADER_BORDER, HEADER_ALIGNMENT
+            header.append(cell)
+        ws.append(header)
+        for start in range(0, len(df), ROW_CHUNK):
+            for row in zip(*_cell_columns(df.iloc[start:start + ROW_CHUNK])):
+                ws.append(row)
+    wb.save(path)
+
+
+def _parquet_safe(df):
+    """Parquet columns need one type: mixed object columns (e.g. numbers and labels) become text."""
+    df = df.copy()
+    for column in df.columns:
+        if df[column].dtype == object and pd.api.types.infer_dtype(df[column], skipna=True).startswith("mixed"):
+            df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+    return df
+
+
+def write_parquet(df, path):
+    _parquet_safe(df).to_parquet(path, index=False)
+
+
+def write_json(df, path):
+    df.to_json(path, orient="split", index=False, date_format="iso")
+
+
+# One output format: a workbook of every sheet, or one snapshot file per table.
+# `requires` lists modules of which at least one must be importable.
+OutputFormat = namedtuple("OutputFormat", ["extension", "per_table", "write", "requires"])
+
+FORMATS = {
+    "xlsx": OutputFormat(".xlsx", False, write_xlsx, ()),
+    "parquet": OutputFormat(".parquet", True, write_parquet, ("pyarrow", "fastparquet")),
+    "json": OutputFormat(".json", True, write_json, ()),
+}
+
+WORKBOOK_NAME = "Processed_Dashboard_Output"
+SNAPSHOT_DIR = "snapshots"
+
+
+def parse_formats(spec):
+    """"xlsx,parquet" -> ["xlsx", "parquet"]; unknown formats or missing engines raise ValueError."""
+    formats = [f.strip().lower() for f in str(spec).split(",") if f.strip()]
+    if not formats:
+        raise ValueError("No output format selected")
+    for fmt in formats:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown output format '{fmt}' (choose from {', '.join(FORMATS)})")
+        requires = FORMATS[fmt].requires
+        if requires and not any(importlib.util.find_spec(m) for m in requires):
+            raise ValueError(f"Output format '{fmt}' needs {' or '.join(requires)} installed")
+    return list(dict.fromkeys(formats))
+
+
+def atomic_write(write, path, *args):
+    """write(*args, tmp_path), then rename over `path`: readers see the old file or the new one."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(*args, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def output_paths(output_dir, fmt, tables=()):
+    """Workbook path, or {table: snapshot path} for per-table formats."""
+    spec = FORMATS[fmt]
+    if spec.per_table:
+        return {table: os.path.join(output_dir, SNAPSHOT_DIR, table + spec.extension) for table in tables}
+    return os.path.join(output_dir, WORKBOOK_NAME + spec.extension)
+
+
+def write_outputs(sheets, tables, formats, output_dir):
+    """Write every selected format; returns {format: path (workbook) or {table: path}}.
+
+    `sheets` is the workbook's [(sheet name, frame)], `tables` the snapshots' {table: frame}.
+    """
+    written = {}
+    for fmt in formats:
+        spec = FORMATS[fmt]
+        paths = output_paths(output_dir, fmt, tables)
+        n_rows = run_metrics.count_rows(tables) if spec.per_table else sum(len(df) for _, df in sheets)
+        with run_metrics.span(f"{fmt}_write", kind="output", target=fmt, rows_in=n_rows) as entry:
+            if spec.per_table:
+                for table, path in paths.items():
+                    atomic_write(spec.write, path, tables[table])
+            else:
+                atomic_write(spec.write, paths, sheets)
+            entry["rows_out"] = n_rows
+        written[fmt] = paths
+    return written
@@ -0,0 +1,253 @@
+import os
+import glob
+import hashlib
+import multiprocessing
+import pickle
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import run_metrics
+
+# A pipeline stage: `files` are workbook paths it reads, `deps` maps keyword
+# arguments of `func` to upstream stage names, `params` are fixed keyword arguments.
+# Transient stages (raw workbook loads) are never memoized: they only run when a
+# downstream stage has to be recomputed, and their output is dropped once consumed.
+Stage = namedtuple("Stage", ["name", "func", "files", "deps", "params", "transient"])
+Stage.__new__.__defaults__ = ((), {}, {}, False)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_file_hash_cache = {}
+
+# Latest output per stage kept in memory, so a long-lived worker skips even the unpickling
+_memory_cache = {}
+
+
+def _remember(memo_key, digest):
+    """Store a hash, dropping older versions of the same path and paths that no longer exist
+    (upload snapshots are promoted into new directories and old ones removed)."""
+    for key in list(_file_hash_cache):
+        if key[0] == memo_key[0] or not os.path.exists(key[0]):
+            _file_hash_cache.pop(key, None)
+    _file_hash_cache[memo_key] = digest
+
+
+def file_fingerprint(path):
+    """Content hash of a file, remembered per (path, size, mtime) so unchanged files are hashed once."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    digest = _file_hash_cache.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        _remember(memo_key, digest)
+    return digest
+
+
+def remember_fingerprint(path, digest):
+    """Record a content hash computed elsewhere (e.g. by the upload store) so the file is not rehashed."""
+    st = os.stat(path)
+    _remember((os.path.abspath(path), st.st_size, st.st_mtime_ns), digest)
+
+
+def code_fingerprint(code_dir):
+    """Hash of the pipeline's Python sources, so code changes invalidate memoized outputs."""
+    h = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(code_dir, "*.py"))):
+        h.update(os.path.basename(path).encode())
+        h.update(file_fingerprint(path).encode())
+    return h.hexdigest()
+
+
+def topological_order(stages):
+    """Order stages so every stage comes after its dependencies (declaration order otherwise)."""
+    by_name = {s.name: s for s in stages}
+    ordered, done, visiting = [], set(), set()
+
+    def visit(stage):
+        if stage.name in done:
+            return
+        if stage.name in visiting:
+            raise ValueError(f"Dependency cycle at stage '{stage.name}'")
+        visiting.add(stage.name)
+        for dep in stage.deps.values():
+            if dep not in by_name:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+            visit(by_name[dep])
+        visiting.discard(stage.name)
+        done.add(stage.name)
+        ordered.append(stage)
+
+    for stage in stages:
+        visit(stage)
+    return ordered
+
+
+def stage_key(stage, dep_keys, code_hash):
+    """Fingerprint of a stage: its code, parameters, input file contents and upstream keys."""
+    h = hashlib.sha256()
+    h.update(code_hash.encode())
+    h.update(stage.name.encode())
+    h.update(repr(sorted((k, sorted(v) if isinstance(v, (set, frozenset)) else v)
+                         for k, v in stage.params.items())).encode())
+    for path in stage.files:
+        h.update(os.path.basename(path).encode())
+        h.update(file_fingerprint(path).encode())
+    for arg, dep in sorted(stage.deps.items()):
+        h.update(f"{arg}={dep_keys[dep]}".encode())
+    return h.hexdigest()[:32]
+
+
+def _cache_path(cache_dir, name, key):
+    return os.path.join(cache_dir, f"{name}-{key}.pkl")
+
+
+def load_cached(cache_dir, name, key):
+    path = _cache_path(cache_dir, name, key)
+    if not os.path.exists(path):
+        return False, None
+    try:
+        with open(path, "rb") as f:
+            return True, pickle.load(f)
+    except Exception as e:
+        print(f"Ignoring unreadable cache entry for '{name}':", e)
+        return False, None
+
+
+def store_cached(cache_dir, name, key, value):
+    """Write the memoized output atomically and drop older entries of the same stage."""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(cache_dir, name, key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    for old in glob.glob(os.path.join(cache_dir, f"{name}-*.pkl")):
+        if old != path:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def discard_cached(cache_dir, name):
+    """Forget the memoized output of a stage, so its next run recomputes it."""
+    _memory_cache.pop(name, None)
+    for path in glob.glob(os.path.join(cache_dir, f"{name}-*.pkl")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _lookup(stage, key, cache_dir):
+    cached = _memory_cache.get(stage.name)
+    if cached is not None and cached[0] == key:
+        return True, cached[1]
+    return load_cached(cache_dir, stage.name, key)
+
+
+def stages_to_run(ordered, results):
+    """Non-transient stages without a cached output, plus whatever upstream stages they need."""
+    by_name = {s.name: s for s in ordered}
+    required = set()
+
+    def require(name):
+        if name in results or name in required:
+            return
+        required.add(name)
+        for dep in by_name[name].deps.values():
+            require(dep)
+
+    for stage in ordered:
+        if not stage.transient:
+            require(stage.name)
+    return [s for s in ordered if s.name in required]
+
+
+def run_stages(stages, cache_dir, code_dir, force=False, max_workers=1, initializer=None, initargs=()):
+    """Run the stage DAG, reusing on-disk outputs of stages whose fingerprint is unchanged.
+
+    With max_workers > 1, stages whose inputs are ready run concurrently in a process
+    pool; results are gathered by stage name, so the outcome does not depend on timing.
+    Workers are spawned, not forked, so they inherit no module state: initializer(*initargs)
+    runs in each one to pass in whatever the stage functions read besides their arguments.
+    Returns (results, keys, executed) where `executed` lists the stages that actually
+    ran, in dependency order.
+    """
+    ordered = topological_order(stages)
+    code_hash = code_fingerprint(code_dir)
+    keys = {}
+    for stage in ordered:
+        keys[stage.name] = stage_key(stage, keys, code_hash)
+
+    results = {}
+    for stage in ordered:
+        if stage.transient or force:
+            continue
+        hit, value = _lookup(stage, keys[stage.name], cache_dir)
+        if hit:
+            print(f"Stage '{stage.name}' unchanged, reusing cached output.")
+            results[stage.name] = value
+            run_metrics.record([{"name": stage.name, "kind": "stage", "cached": True}])
+
+    by_name = {s.name: s for s in ordered}
+    pending = stages_to_run(ordered, results)
+    # Remaining consumers per stage, so transient outputs can be released early
+    consumers = {s.name: 0 for s in ordered}
+    for stage in pending:
+        for dep in stage.deps.values():
+            consumers[dep] += 1
+
+    def finish(stage, value):
+        results[stage.name] = value
+        if not stage.transient:
+            store_cached(cache_dir, stage.name, keys[stage.name], value)
+            _memory_cache[stage.name] = (keys[stage.name], value)
+        for dep in stage.deps.values():
+            consumers[dep] -= 1
+            if consumers[dep] == 0 and by_name[dep].transient:
+                results.pop(dep, None)
+
+    def call_args(stage):
+        kwargs = dict(stage.params)
+        kwargs.update({arg: results[dep] for arg, dep in stage.deps.items()})
+        return kwargs
+
+    def rows_in(stage):
+        counts = [run_metrics.count_rows(results[dep]) for dep in stage.deps.values()]
+        return sum(c for c in counts if c is not None) if stage.deps else None
+
+    def done(stage, outcome):
+        value, spans = outcome
+        run_metrics.record(spans)
+        finish(stage, value)
+
+    if max_workers is None or max_workers <= 1 or len(pending) <= 1:
+        for stage in pending:
+            print(f"Running stage '{stage.name}'...")
+            done(stage, run_metrics.timed_call(stage.name, stage.func, call_args(stage), rows_in(stage)))
+    else:
+        waiting = list(pending)
+        running = {}
+        # spawn, not fork: the pipeline runs from request, scheduler and worker threads
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=initializer, initargs=initargs) as pool:
+            while waiting or running:
+                ready = [s for s in waiting if all(dep in results for dep in s.deps.values())]
+                for stage in ready:
+                    print(f"Running stage '{stage.name}' in worker process...")
+                    future = pool.submit(run_metrics.timed_call, stage.name, stage.func,
+                                         call_args(stage), rows_in(stage))
+                    running[future] = stage
+                    waiting.remove(stage)
+                completed, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    done(running.pop(future), future.result())
+
+    executed = [s.name for s in pending]
+    outputs = {s.name: results[s.name] for s in ordered if not s.transient}
+    return outputs, keys, executed
@@ -0,0 +1,113 @@
+import statistics
+import threading
+import time
+from collections import deque
+
+import preprocessing_worker
+from Command_Centre_Final_v1 import INPUT_FILENAMES
+
+# Debounce for partial batches adapts to how fast files of a batch usually follow each other
+DEFAULT_DEBOUNCE = 30     # seconds, used until enough arrival gaps have been observed
+MIN_DEBOUNCE = 5
+MAX_DEBOUNCE = 60
+DEBOUNCE_GAP_FACTOR = 3   # wait this many typical gaps before deciding the batch is over
+MAX_BATCH_GAP = 120       # gaps longer than this start a new batch rather than count as "typical"
+
+EXPECTED_FILES = frozenset(INPUT_FILENAMES)
+
+_lock = threading.Lock()
+_timer = None
+_pending_files = set()
+_pending_changed = False   # any file in the pending batch differs from what was already staged
+_last_arrival = None
+_recent_gaps = deque(maxlen=50)
+_last_job_id = None
+
+
+def current_debounce():
+    """Seconds to wait after the latest arrival before running on a partial batch."""
+    if len(_recent_gaps) < 3:
+        return DEFAULT_DEBOUNCE
+    typical_gap = statistics.median(_recent_gaps)
+    return min(MAX_DEBOUNCE, max(MIN_DEBOUNCE, DEBOUNCE_GAP_FACTOR * typical_gap))
+
+
+def _fire(reason):
+    global _timer, _last_job_id, _pending_changed
+    with _lock:
+        _timer = None
+        batch = sorted(_pending_files)
+        changed = _pending_changed
+        _pending_files.clear()
+        _pending_changed = False
+    if batch and not changed:
+        print(f"Batch {batch} only re-sent files already staged; nothing to rerun.")
+        return
+    print(f"Triggering preprocessing ({reason}); batch: {batch or 'no new files'}")
+    job = preprocessing_worker.submit_job(source=f"scheduler:{reason}")
+    with _lock:
+        _last_job_id = job["id"]
+
+
+def _arm(delay):
+    """(Re)start the debounce timer; caller holds _lock."""
+    global _timer
+    if _timer is not None:
+        _timer.cancel()
+    _timer = threading.Timer(delay, _fire, args=("debounce",))
+    _timer.daemon = True
+    _timer.start()
+
+
+def notify_upload(filename, changed=True):
+    """Record an arrived input file; run immediately once the whole input set is present.
+    Unchanged re-uploads still count towards the batch but do not by themselves cause a run."""
+    global _last_arrival, _timer, _pending_changed
+    now = time.monotonic()
+    with _lock:
+        if _last_arrival is not None and now - _last_arrival <= MAX_BATCH_GAP:
+            _recent_gaps.append(now - _last_arrival)
+        _last_arrival = now
+        _pending_files.add(filename)
+        _pending_changed = _pending_changed or changed
+        complete = EXPECTED_FILES <= _pending_files
+        if complete:
+            if _timer is not None:
+                _timer.cancel()
+                _timer = None
+        else:
+            delay = current_debounce()
+            _arm(delay)
+
+    if complete:
+        _fire("complete batch")
+        return 0
+    print(f"Received {filename}; {len(EXPECTED_FILES & _pending_files)}/{len(EXPECTED_FILES)} "
+          f"inputs in batch, running in {delay:.0f}s if nothing else arrives.")
+    return delay
+
+
+def request_run():
+    """Explicit trigger from the uploader: run now if the batch is complete, else debounce."""
+    with _lock:
+        complete = EXPECTED_FILES <= _pending_files
+        if not complete:
+            delay = current_debounce()
+            _arm(delay)
+    if complete:
+        _fire("complete batch")
+        return 0
+    return delay
+
+
+def status():
+    with _lock:
+        return {
+            "pending_files": sorted(_pending_files),
+            "pending_changed": _pending_changed,
+            "missing_files": sorted(EXPECTED_FILES - _pending_files),
+            "timer_armed": _timer is not None,
+            "debounce_seconds": current_debounce(),
+            "last_job_id": _last_job_id,
+            "worker_queue_depth": preprocessing_worker.queue_depth(),
+        }
@@ -0,0 +1,125 @@
+import queue
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+import openpyxl  # noqa: F401 -- imported up front so the first run does not pay for it
+
+# Importing the pipeline loads pandas/SQLAlchemy once for the lifetime of the process;
+# its engines, reference sheets and stage outputs then stay warm between runs.
+import Command_Centre_Final_v1 as pipeline
+import dashboard_cache
+
+MAX_JOB_HISTORY = 200
+
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+_job_queue = queue.Queue()
+_worker_thread = None
+_pending_job_id = None   # the one job allowed to wait behind the running one
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _ensure_worker():
+    global _worker_thread
+    with _jobs_lock:
+        if _worker_thread is None or not _worker_thread.is_alive():
+            _worker_thread = threading.Thread(target=_worker_loop, name="preprocessing-worker", daemon=True)
+            _worker_thread.start()
+
+
+def submit_job(source="api", force=False):
+    """Queue a preprocessing run and return a snapshot of its job record.
+
+    Requests that arrive while a run is already waiting are coalesced into that
+    waiting job, so there is never more than one run in flight plus one queued.
+    """
+    global _pending_job_id
+    with _jobs_lock:
+        pending = _jobs.get(_pending_job_id)
+        if pending is not None and pending["status"] == "queued":
+            pending["force"] = pending["force"] or force
+            pending["coalesced_requests"] += 1
+            print(f"Preprocessing request from {source} coalesced into queued job {pending['id']}.")
+            return dict(pending)
+
+    job = {
+        "id": uuid.uuid4().hex,
+        "status": "queued",
+        "source": source,
+        "force": force,
+        "submitted_at": _now(),
+        "started_at": None,
+        "finished_at": None,
+        "stages_executed": None,
+        "error": None,
+        "coalesced_requests": 0,
+    }
+    with _jobs_lock:
+        _jobs[job["id"]] = job
+        _pending_job_id = job["id"]
+        while len(_jobs) > MAX_JOB_HISTORY:
+            _jobs.popitem(last=False)
+    _job_queue.put(job["id"])
+    _ensure_worker()
+    print(f"Preprocessing job {job['id']} queued (source: {source}).")
+    return dict(job)
+
+
+def get_job(job_id):
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+
+def queue_depth():
+    return _job_queue.qsize()
+
+
+def is_busy():
+    """True while a job is running or waiting to run."""
+    with _jobs_lock:
+        return any(job["status"] in ("queued", "running") for job in _jobs.values())
+
+
+def _update(job_id, **fields):
+    with _jobs_lock:
+        if job_id in _jobs:
+            _jobs[job_id].update(fields)
+            return dict(_jobs[job_id])
+    return None
+
+
+def _worker_loop():
+    global _pending_job_id
+    while True:
+        job_id = _job_queue.get()
+        with _jobs_lock:
+            if _pending_job_id == job_id:
+                _pending_job_id = None
+        job = _update(job_id, status="running", started_at=_now())
+        if job is None:
+            continue
+        print(f"Preprocessing job {job_id} started.")
+        try:
+            summary = pipeline.main(force=job["force"])
+            # Screens served from this process reload now, even if the run marker's mtime did not tick
+            dashboard_cache.invalidate()
+            if summary["coalesced"]:
+                # Another process already has a run queued; it will pick up the same inputs
+                _update(job_id, status="coalesced", finished_at=_now(), stages_executed=[])
+            else:
+                _update(job_id, status="succeeded", finished_at=_now(),
+                        stages_executed=summary["stages_executed"])
+            print(f"Preprocessing job {job_id} finished.")
+        except Exception as e:
+            traceback.print_exc()
+            _update(job_id, status="failed", finished_at=_now(), error=str(e))
+            print(f"Preprocessing job {job_id} failed:", e)
+        finally:
+            _job_queue.task_done()
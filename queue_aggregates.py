@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+# Column names match the layout sheet headers so every screen can align on them directly
+AGGREGATE_COLUMNS = [
+    "PRO Queue",
+    "User Locked PRO",
+    "QC Queue",
+    "User Locked QC",
+    "Processed Volumes",
+    "Reso Queue",
+    "PRO Personal Folders",
+    "RESO Personal Folders",
+]
+
+
+def distinct_counts(group_codes, doc_codes, n_groups):
+    """Count distinct document codes per group code; negative codes are ignored."""
+    group_codes = np.asarray(group_codes, dtype=np.int64)
+    doc_codes = np.asarray(doc_codes, dtype=np.int64)
+    valid = (group_codes >= 0) & (doc_codes >= 0)
+    if not valid.any():
+        return np.zeros(n_groups, dtype=np.int64)
+    n_docs = int(doc_codes[valid].max()) + 1
+    keys = np.unique(group_codes[valid] * n_docs + doc_codes[valid])
+    return np.bincount(keys // n_docs, minlength=n_groups).astype(np.int64)
+
+
+def map_doc_type_counts(df, id_column, reso_map_df):
+    """Distinct documents per Doc Type, rolled up to the mapped processing queue."""
+    counts = df.groupby("Doc Type", observed=True)[id_column].nunique().reset_index(name="Count")
+    mapped = pd.merge(
+        counts,
+        reso_map_df[["Doc_Type", "Queue_Desc"]],
+        left_on="Doc Type",
+        right_on="Doc_Type",
+        how="left"
+    )
+    return mapped.groupby("Queue_Desc")["Count"].sum()
+
+
+def split_qc_queues(queue_names):
+    """Return (is_qc, base_queue) for an index of queue names."""
+    names = pd.Index(queue_names).astype(str)
+    is_qc = np.asarray(names.str.endswith("QC"), dtype=bool)
+    base = names.str.replace(r"QC$", "", regex=True).str.strip()
+    return is_qc, base
+
+
+def dump_queue_counts(data_dump_df):
+    """Single pass over the data dump: per-queue and per-QC-base distinct document counts.
+
+    Queue is categorical-coded so the PRO/QC split and the base-queue name cleanup run
+    once per distinct queue instead of once per row; Lock Status is the schema's bool flag.
+    """
+    queue_cat = data_dump_df["Queue"].astype("category")
+    queues = queue_cat.cat.categories
+    queue_codes = queue_cat.cat.codes.to_numpy(dtype=np.int64)
+
+    locked = data_dump_df["Lock Status"].to_numpy(dtype=bool)
+
+    doc_codes, _ = pd.factorize(data_dump_df["Document ID"])
+
+    is_qc, base = split_qc_queues(queues)
+    base_codes, base_names = pd.factorize(base[is_qc])
+    # Lookup table queue code -> QC base code; the trailing slot absorbs missing queues (-1)
+    base_lut = np.full(len(queues) + 1, -1, dtype=np.int64)
+    base_lut[np.flatnonzero(is_qc)] = base_codes
+    row_base = base_lut[queue_codes]
+
+    per_queue = distinct_counts(queue_codes, doc_codes, len(queues))
+    per_queue_locked = distinct_counts(np.where(locked, queue_codes, -1), doc_codes, len(queues))
+    per_base = distinct_counts(row_base, doc_codes, len(base_names))
+    per_base_locked = distinct_counts(np.where(locked, row_base, -1), doc_codes, len(base_names))
+
+    return {
+        "PRO Queue": pd.Series(per_queue[~is_qc], index=queues[~is_qc]),
+        "User Locked PRO": pd.Series(per_queue_locked[~is_qc], index=queues[~is_qc]),
+        "QC Queue": pd.Series(per_base, index=base_names),
+        "User Locked QC": pd.Series(per_base_locked, index=base_names),
+        "Processed Volumes": pd.Series(per_queue, index=queues),
+    }
+
+
+def freeze_table(counts):
+    """Assemble per-metric Series into one read-only int64 table indexed by queue name."""
+    table = pd.concat(counts, axis=1, sort=False).reindex(columns=AGGREGATE_COLUMNS)
+    values = table.fillna(0).to_numpy(dtype=np.int64, copy=True)
+    values.setflags(write=False)
+    return pd.DataFrame(values, index=table.index, columns=table.columns, copy=False)
+
+
+def build_queue_aggregates(data_dump_df, reso_df, reso_map_df, pro_pf_df, reso_pf_df):
+    """Build the immutable per-queue aggregate table shared by every layout screen."""
+    counts = dump_queue_counts(data_dump_df)
+    counts["Reso Queue"] = map_doc_type_counts(reso_df, "Doc ID", reso_map_df)
+    counts["PRO Personal Folders"] = map_doc_type_counts(pro_pf_df, "Document ID", reso_map_df)
+    counts["RESO Personal Folders"] = map_doc_type_counts(reso_pf_df, "Document ID", reso_map_df)
+    return freeze_table(counts)
@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+# CPU-heavy request work (upload parsing) runs here instead of in the request thread.
+# POOL_WORKERS processes run tasks; up to POOL_QUEUE more wait for one. Past that, callers
+# get "busy" right away (the API answers 429) rather than piling up behind the burst.
+POOL_WORKERS = int(os.getenv("CC_POOL_WORKERS", "2"))
+POOL_QUEUE = int(os.getenv("CC_POOL_QUEUE", "4"))
+POOL_TIMEOUT_SECONDS = float(os.getenv("CC_POOL_TIMEOUT_SECONDS", "60"))
+RETRY_AFTER_SECONDS = 5
+
+_lock = threading.Lock()
+_executor = None
+_slots = threading.BoundedSemaphore(POOL_WORKERS + POOL_QUEUE)
+_stats = {"in_flight": 0, "completed": 0, "rejected": 0, "timeouts": 0}
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # spawn, not fork: the web process has request and scheduler threads running
+            _executor = ProcessPoolExecutor(max_workers=POOL_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def _release(future):
+    _slots.release()
+    with _lock:
+        _stats["in_flight"] -= 1
+        _stats["completed"] += 1
+
+
+def saturated():
+    """True when a new task would be turned away. Lets a handler answer 429 before reading a
+    large request body; a True answer is counted as a rejection."""
+    with _lock:
+        full = _stats["in_flight"] >= POOL_WORKERS + POOL_QUEUE
+        if full:
+            _stats["rejected"] += 1
+    return full
+
+
+def run(func, *args, timeout=None):
+    """Run func(*args) in the pool and wait for it.
+
+    Returns ("ok", value), ("busy", None) when every worker and queue slot is taken, or
+    ("timeout", None) after `timeout` seconds (default POOL_TIMEOUT_SECONDS). A timed-out
+    task keeps its slot until it finishes, so slow work still counts against the limit.
+    Exceptions raised by `func` propagate.
+    """
+    global _executor
+    if not _slots.acquire(blocking=False):
+        with _lock:
+            _stats["rejected"] += 1
+        return "busy", None
+    try:
+        future = _get_executor().submit(func, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    with _lock:
+        _stats["in_flight"] += 1
+    future.add_done_callback(_release)
+
+    try:
+        return "ok", future.result(timeout=POOL_TIMEOUT_SECONDS if timeout is None else timeout)
+    except TimeoutError:
+        with _lock:
+            _stats["timeouts"] += 1
+        return "timeout", None
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory): start a fresh pool for the next request
+        with _lock:
+            _executor = None
+        raise
+
+
+def status():
+    with _lock:
+        stats = dict(_stats)
+    stats.update({
+        "workers": POOL_WORKERS,
+        "queue_slots": POOL_QUEUE,
+        "queued": max(stats["in_flight"] - POOL_WORKERS, 0),
+        "timeout_seconds": POOL_TIMEOUT_SECONDS,
+    })
+    return stats
@@ -0,0 +1,78 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Declarative rollup levels, applied in order; each level sees the results of the previous ones.
+#   SumLevel:      every target row gets the column sums of its source rows
+#   OverrideLevel: rows with a given label get a fixed value in one column
+#   ZeroLevel:     rows get 0 in every rolled-up column except `keep`
+# Sources are row labels, or ChildrenOf(category) for the rows listed under a category header.
+SumLevel = namedtuple("SumLevel", ["groups"])                # target label -> sources
+OverrideLevel = namedtuple("OverrideLevel", ["column", "values"])   # label -> value
+ZeroLevel = namedtuple("ZeroLevel", ["labels", "keep"])
+ChildrenOf = namedtuple("ChildrenOf", ["category"])
+
+
+def _select(sources, labels, categories):
+    if isinstance(sources, ChildrenOf):
+        return (categories == sources.category).to_numpy()
+    return labels.isin(list(sources)).to_numpy()
+
+
+def apply_rollups(frame, columns, levels, labels, categories):
+    """Apply `levels` to `columns` of `frame` (in place) and return it.
+
+    `labels` is each row's label (QueueName) and `categories` each row's category. Every level is
+    computed on the whole metric block at once (group sums are a selector-matrix product). The
+    frame is written back in one aligned assignment. Non-numeric columns never contribute to sums
+    (as with sum(numeric_only=True)); they only receive the 0s the levels write.
+    """
+    labels = pd.Series(labels.to_numpy(), dtype=object)
+    categories = pd.Series(categories.to_numpy(), dtype=object)
+    block = frame[columns]
+    numeric = np.array([pd.api.types.is_numeric_dtype(block[c]) for c in columns], dtype=bool)
+
+    # Numeric columns are rolled up as one float matrix; other columns keep their cells as objects
+    values = np.zeros(block.shape, dtype=np.float64)
+    if numeric.any():
+        values[:, numeric] = block.loc[:, numeric].to_numpy(dtype=np.float64)
+    cells = block.to_numpy(dtype=object, copy=True)
+
+    def write(rows, cols, row_values):
+        """Set `row_values` (one object per column) into rows x cols."""
+        num, obj = cols & numeric, cols & ~numeric
+        values[np.ix_(rows, num)] = row_values[num].astype(np.float64)
+        cells[np.ix_(rows, obj)] = row_values[obj]
+
+    def constant(value):
+        return np.full(len(columns), value, dtype=object)
+
+    everything = np.ones(len(columns), dtype=bool)
+    for level in levels:
+        if isinstance(level, SumLevel):
+            targets = list(level.groups)
+            selectors = np.array([_select(level.groups[t], labels, categories) for t in targets],
+                                 dtype=np.float64).reshape(len(targets), -1)
+            sums = (selectors @ np.where(np.isnan(values), 0.0, values)).astype(object)
+            sums[:, ~numeric] = 0
+            for target, row_sums in zip(targets, sums):
+                write(np.flatnonzero((labels == target).to_numpy()), everything, row_sums)
+        elif isinstance(level, OverrideLevel):
+            cols = np.array([c == level.column for c in columns], dtype=bool)
+            for label, value in level.values.items():
+                write(np.flatnonzero((labels == label).to_numpy()), cols, constant(value))
+        elif isinstance(level, ZeroLevel):
+            cols = np.array([c not in level.keep for c in columns], dtype=bool)
+            write(np.flatnonzero(labels.isin(list(level.labels)).to_numpy()), cols, constant(0))
+        else:
+            raise TypeError(f"Unknown rollup level: {level!r}")
+
+    result = {}
+    for j, col in enumerate(columns):
+        if numeric[j]:
+            result[col] = pd.Series(values[:, j], index=frame.index).astype(block[col].dtype)
+        else:
+            result[col] = pd.Series(cells[:, j], index=frame.index, dtype=object)
+    frame[columns] = pd.DataFrame(result, index=frame.index)
+    return frame
@@ -0,0 +1,97 @@
+import hashlib
+import os
+from collections import namedtuple
+
+import pandas as pd
+
+from pipeline_dag import file_fingerprint, load_cached, store_cached
+
+# Shift lookup over the BOA master list. `members` / `supervisors` map each normalized name to
+# one shift (unique index, so lookups are a single hash join). A name listed more than once with
+# different shifts still resolves to its last row, as the screen always has, but is kept in
+# `ambiguous_*` (name -> every shift it was listed with, in file order) so it is never silent.
+RosterIndex = namedtuple("RosterIndex", ["members", "supervisors", "ambiguous_members", "ambiguous_supervisors"])
+
+CACHE_NAME = "roster_index"
+MAX_REPORTED = 10        # ambiguous names listed in the build message
+
+_indexes = {}    # index key -> RosterIndex; latest only
+
+
+# --- Vectorized name normalization ---
+
+def normalize_agent_names(names):
+    """ "  Jane Doe " -> "JANE DOE" """
+    return names.astype(str).str.strip().str.upper()
+
+
+def normalize_supervisor_names(names):
+    """ "Doe, Jane A - Team 4" -> "JANE DOE"; names without a comma are just upper-cased. """
+    base = names.astype(str).str.replace(r"-.*", "", regex=True).str.strip()
+    # last name before the first comma, first word after it
+    parts = base.str.extract(r"^([^,]*),\s*([^\s,]+)")
+    flipped = parts[1] + " " + parts[0].str.strip()
+    return flipped.where(parts[1].notna(), base).str.upper()
+
+
+# --- Index build ---
+
+def _keyed(keys, shifts):
+    """(name -> shift of its last row, name -> [shifts] for names listed with more than one shift)"""
+    last = ~keys.duplicated(keep="last")
+    resolved = pd.Series(shifts[last].to_numpy(), index=keys[last].to_numpy(), dtype=object)
+
+    distinct = pd.DataFrame({"key": keys.to_numpy(), "shift": shifts.to_numpy()}).drop_duplicates()
+    conflicting = distinct[distinct["key"].duplicated(keep=False)]
+    ambiguous = {key: list(group) for key, group in conflicting.groupby("key", sort=True)["shift"]}
+    return resolved, ambiguous
+
+
+def build_roster_index(boa_df):
+    shifts = boa_df["Shift Schedule"].reset_index(drop=True)
+    members, ambiguous_members = _keyed(normalize_agent_names(boa_df["Member Name"]).reset_index(drop=True), shifts)
+    supervisors, ambiguous_supervisors = _keyed(
+        normalize_supervisor_names(boa_df["Supervisor"]).reset_index(drop=True), shifts)
+    return RosterIndex(members, supervisors, ambiguous_members, ambiguous_supervisors)
+
+
+def index_key(path):
+    """BOA content hash + this module's source, so a normalization change rebuilds."""
+    h = hashlib.sha256()
+    h.update(file_fingerprint(path).encode())
+    h.update(file_fingerprint(os.path.abspath(__file__)).encode())
+    return h.hexdigest()[:32]
+
+
+def roster_index(path, cache_dir, load):
+    """Roster index of the BOA file at `path`: from memory, else the persisted copy, else built.
+
+    `load` returns the BOA frame (Member Name / Supervisor / Shift Schedule); it is only
+    called when the file changed since the index was last built.
+    """
+    key = index_key(path)
+    if key in _indexes:
+        return _indexes[key]
+    hit, index = load_cached(cache_dir, CACHE_NAME, key)
+    if not hit:
+        index = build_roster_index(load())
+        print(f"Built roster index from {os.path.basename(path)}: "
+              f"{len(index.members)} members, {len(index.supervisors)} supervisors.")
+        if index.ambiguous_members:
+            names = sorted(index.ambiguous_members)
+            more = f" (+{len(names) - MAX_REPORTED} more)" if len(names) > MAX_REPORTED else ""
+            print(f"Warning: {len(names)} member name(s) listed with different shifts, last row used: "
+                  f"{', '.join(names[:MAX_REPORTED])}{more}")
+        store_cached(cache_dir, CACHE_NAME, key, index)
+    _indexes.clear()
+    _indexes[key] = index
+    return index
+
+
+# --- Batch lookup ---
+
+def lookup_shifts(index, names):
+    """Shift for each raw layout name: by member name, else by the name read as a supervisor."""
+    by_member = normalize_agent_names(names).map(index.members)
+    by_supervisor = normalize_supervisor_names(names).map(index.supervisors)
+    return by_member.fillna(by_supervisor)
@@ -0,0 +1,183 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import pandas as pd
+
+MAX_RUN_HISTORY = 100    # runs kept in the metrics file
+
+# Spans recorded in this process for the current run
+_lock = threading.Lock()
+_spans = []
+_run_started = None
+
+
+def peak_rss_bytes():
+    """High-water mark of this process's resident memory (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def count_rows(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(count_rows(v) for v in value.values())
+    return None
+
+
+def record(spans):
+    with _lock:
+        _spans.extend(spans)
+
+
+@contextmanager
+def span(name, kind="stage", **labels):
+    """Time the enclosed block; set record["rows_out"] (or other fields) inside it."""
+    entry = {"name": name, "kind": kind, "pid": os.getpid(), "started_at": time.time(),
+             "rows_in": None, "rows_out": None}
+    entry.update(labels)
+    wall_start, cpu_start = time.perf_counter(), time.thread_time()
+    try:
+        yield entry
+    finally:
+        entry["wall_seconds"] = time.perf_counter() - wall_start
+        entry["cpu_seconds"] = time.thread_time() - cpu_start
+        entry["peak_rss_bytes"] = peak_rss_bytes()
+        record([entry])
+
+
+def timed_call(name, func, kwargs, rows_in=None):
+    """Run one stage under a span. Returns (value, spans recorded during the call) so spans
+    from worker processes can be shipped back to the parent with the stage output."""
+    with _lock:
+        mark = len(_spans)
+    with span(name, rows_in=rows_in) as entry:
+        value = func(**kwargs)
+        entry["rows_out"] = count_rows(value)
+    with _lock:
+        spans = _spans[mark:]
+        del _spans[mark:]
+    return value, spans
+
+
+def begin_run():
+    global _run_started
+    with _lock:
+        _spans.clear()
+        _run_started = time.time()
+
+
+def load_history(path):
+    try:
+        with open(path) as f:
+            return json.load(f)["runs"]
+    except (OSError, ValueError, KeyError):
+        return []
+
+
+def finish_run(path, status, **fields):
+    """Append this run's spans to the metrics history file (atomic rewrite, newest last)."""
+    with _lock:
+        spans = list(_spans)
+        _spans.clear()
+        started = _run_started or time.time()
+    run = {
+        "started_at": datetime.fromtimestamp(started).isoformat(timespec="seconds"),
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+        "duration_seconds": time.time() - started,
+        "status": status,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "spans": spans,
+    }
+    run.update(fields)
+    runs = (load_history(path) + [run])[-MAX_RUN_HISTORY:]
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"runs": runs}, f)
+    os.replace(tmp_path, path)
+    return run
+
+
+# --- Prometheus text exposition ---
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def metric(lines, name, metric_type, help_text, samples):
+    """Append one metric family; `samples` is a list of (labels dict, value)."""
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {metric_type}")
+    for labels, value in samples:
+        if value is None:
+            continue
+        label_str = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+        lines.append(f"{name}{{{label_str}}} {float(value)!r}" if label_str else f"{name} {float(value)!r}")
+
+
+def _quantile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def prometheus_lines(runs):
+    """Latest-run gauges per stage and input file, plus wall-time quantiles over the kept history."""
+    lines = []
+    metric(lines, "cc_pipeline_runs_recorded", "gauge", "Pipeline runs kept in the metrics history.",
+           [({}, len(runs))])
+    if not runs:
+        return lines
+    last = runs[-1]
+    metric(lines, "cc_pipeline_last_run_timestamp_seconds", "gauge", "Unix time the last run finished.",
+           [({}, datetime.fromisoformat(last["finished_at"]).timestamp())])
+    metric(lines, "cc_pipeline_last_run_duration_seconds", "gauge", "Wall time of the last run.",
+           [({}, last["duration_seconds"])])
+    metric(lines, "cc_pipeline_last_run_success", "gauge", "1 if the last run succeeded.",
+           [({}, 1 if last["status"] == "succeeded" else 0)])
+    metric(lines, "cc_pipeline_last_run_peak_rss_bytes", "gauge", "Peak RSS of the process that ran the pipeline.",
+           [({}, last.get("peak_rss_bytes"))])
+
+    def labels(s):
+        out = {"kind": s["kind"], "name": s["name"]}
+        out.update({k: s[k] for k in ("sheet", "target") if s.get(k) is not None})
+        return out
+
+    spans = last["spans"]
+    for field, name, help_text in [
+        ("wall_seconds", "cc_span_wall_seconds", "Wall time of each stage/input/output span in the last run."),
+        ("cpu_seconds", "cc_span_cpu_seconds", "CPU time of each span in the last run."),
+        ("peak_rss_bytes", "cc_span_peak_rss_bytes", "Process peak RSS when the span ended."),
+        ("rows_in", "cc_span_rows_in", "Rows consumed by each span in the last run."),
+        ("rows_out", "cc_span_rows_out", "Rows produced by each span in the last run."),
+        ("bytes", "cc_span_input_bytes", "Size of each input file read in the last run."),
+    ]:
+        metric(lines, name, "gauge", help_text,
+               [(labels(s), s.get(field)) for s in spans if not s.get("cached")])
+    metric(lines, "cc_span_cached", "gauge", "1 for stages served from the stage cache in the last run.",
+           [(labels(s), 1) for s in spans if s.get("cached")])
+
+    history = {}
+    for run in runs:
+        for s in run["spans"]:
+            if not s.get("cached") and s.get("wall_seconds") is not None:
+                history.setdefault(tuple(sorted(labels(s).items())), []).append(s["wall_seconds"])
+    samples = []
+    for key, values in sorted(history.items()):
+        for q in (0.5, 0.9, 1.0):
+            samples.append((dict(key, quantile=q), _quantile(values, q)))
+    metric(lines, "cc_span_wall_seconds_history", "gauge",
+           "Wall-time quantiles of each span over the runs in the metrics history.", samples)
+    return lines
@@ -0,0 +1,92 @@
+import json
+from collections import namedtuple
+
+from layout_template import SPECIAL_PRO_QUEUES
+from queue_aggregates import AGGREGATE_COLUMNS
+
+# Declarative screen set (screens.json). Every layout screen is rendered by the same engine from
+# the shared per-queue aggregates; adding a screen or a site is a config change, not a code change.
+#   name            stage name and key in the run's results
+#   sheet           layout sheet (also the output workbook sheet)
+#   table           database table / API screen name
+#   categories      category header rows, in Executive View order
+#   metrics         metric columns the engine fills (default: all METRICS); other metric columns
+#                   keep the layout sheet's cells and are still rolled up
+#   special_queues  "Other" row -> queue whose Processed Volumes fills its PRO Queue
+# Executive View sections, in order, each read from one layout screen:
+#   label           section header row
+#   screen          layout screen `name`
+#   processing      column summed into "Total Outstanding Processing Volumes"
+#   quality_control column for "Total Outstanding Quality Control Volumes" (null: 0)
+#   rows            rows listed under the header (default: the screen's categories)
+#   total_row       row whose value heads the section (default: the sum of `rows`); the
+#                   section is left out when the screen has no such row or no `processing` column
+LayoutScreen = namedtuple("LayoutScreen", ["name", "sheet", "table", "categories", "metrics", "special_queues"])
+ExecutiveSection = namedtuple("ExecutiveSection",
+                              ["label", "screen", "processing", "quality_control", "rows", "total_row"])
+
+THROUGHPUT_METRICS = ["Accepted Volumes", "QC'ed Volumes", "Resolutions Completed Volumes", "SLA % Completed"]
+METRICS = AGGREGATE_COLUMNS + THROUGHPUT_METRICS
+# Layout columns recomputed from the filled metrics, and the Executive View's value columns
+TOTAL_METRICS = ["Total", "Total_1", "Total_2", "PRO FTE Locked", "RESO FTE Locked"]
+EXECUTIVE_METRICS = ["Total Outstanding Processing Volumes", "Total Outstanding Quality Control Volumes"]
+
+
+def metric_column(metric):
+    """Database/API column name of a workbook column ("PRO Queue" -> "PRO_Queue")."""
+    return str(metric).strip().replace(" ", "_").replace("-", "_")
+
+
+# Database/API column -> workbook metric, for every metric the screens and Executive View carry
+METRIC_COLUMNS = {metric_column(m): m for m in METRICS + TOTAL_METRICS + EXECUTIVE_METRICS}
+
+
+def workbook_metric(metric):
+    """Workbook name of a metric given in either form; names outside METRIC_COLUMNS are kept as given."""
+    return METRIC_COLUMNS.get(str(metric), str(metric))
+
+
+def _layout_screen(entry, path):
+    missing = [k for k in ("name", "sheet", "table", "categories") if k not in entry]
+    if missing:
+        raise ValueError(f"{path}: layout screen {entry.get('name', '?')} is missing {', '.join(missing)}")
+    enabled = set(entry.get("metrics", METRICS))
+    unknown = sorted(enabled - set(METRICS))
+    if unknown:
+        raise ValueError(f"{path}: screen {entry['name']}: unknown metric(s) {', '.join(unknown)}")
+    if "SLA % Completed" in enabled and "QC'ed Volumes" not in enabled:
+        raise ValueError(f"{path}: screen {entry['name']}: SLA % Completed needs QC'ed Volumes")
+    return LayoutScreen(
+        name=entry["name"],
+        sheet=entry["sheet"],
+        table=entry["table"],
+        categories=list(entry["categories"]),
+        metrics=[m for m in METRICS if m in enabled],   # fill order never depends on the config's
+        special_queues=dict(entry.get("special_queues", SPECIAL_PRO_QUEUES)),
+    )
+
+
+def _executive_section(entry, screens, path):
+    if entry.get("screen") not in screens:
+        raise ValueError(f"{path}: executive section {entry.get('label', '?')} reads unknown screen "
+                         f"{entry.get('screen')!r}")
+    return ExecutiveSection(
+        label=entry["label"],
+        screen=entry["screen"],
+        processing=entry["processing"],
+        quality_control=entry.get("quality_control"),
+        rows=list(entry["rows"]) if "rows" in entry else list(screens[entry["screen"]].categories),
+        total_row=entry.get("total_row"),
+    )
+
+
+def load_screen_config(path):
+    """(layout screens, executive sections) from a screens.json file."""
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    screens = [_layout_screen(entry, path) for entry in config["layout_screens"]]
+    by_name = {s.name: s for s in screens}
+    if len(by_name) != len(screens) or len({s.table for s in screens}) != len(screens):
+        raise ValueError(f"{path}: layout screen names and tables must be unique")
+    sections = [_executive_section(entry, by_name, path) for entry in config.get("executive_view", [])]
+    return screens, sections
@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import dashboard_cache
+
+# Change feed behind the per-screen event streams. One watcher thread per process notices
+# completed runs (the run marker changes, whichever process ran), reloads each screen once and
+# records what changed since the previous run. Every subscriber of a screen shares that event.
+POLL_SECONDS = float(os.getenv("CC_SSE_POLL_SECONDS", "2"))
+MAX_SUBSCRIBERS = int(os.getenv("CC_SSE_MAX_CLIENTS", "32"))
+EVENTS_KEPT = 20             # per screen; a subscriber further behind gets a fresh snapshot
+
+_lock = threading.Condition()
+_watcher = None
+_seen_version = None
+_frames = {}                 # screen -> (version, JSON column names, JSON rows) of the last run seen
+_events = {screen: deque(maxlen=EVENTS_KEPT) for screen in dashboard_cache.SCREEN_TABLES}
+_subscribers = 0
+
+
+def _json_frame(df):
+    """Column names and rows as JSON values (NaN -> None), the form clients hold."""
+    return [str(c) for c in df.columns], json.loads(df.to_json(orient="values"))
+
+
+def cell_changes(old_columns, old_rows, new_columns, new_rows):
+    """Cells that differ between two runs of a screen, by row position and new column name.
+
+    Returns (columns or None, [[row, column, value], ...]); `columns` is the new header when
+    only names changed (e.g. a run timestamp in a header). None when the shape changed, so
+    positions no longer line up and clients need the whole screen.
+    """
+    if len(old_columns) != len(new_columns) or len(old_rows) != len(new_rows):
+        return None
+    cells = [
+        [i, new_columns[j], value]
+        for i, (old_row, new_row) in enumerate(zip(old_rows, new_rows))
+        for j, value in enumerate(new_row)
+        if old_row[j] != value
+    ]
+    return (new_columns if new_columns != old_columns else None), cells
+
+
+def _advance(version):
+    """Diff every screen against the previous run and publish one event per changed screen."""
+    global _seen_version
+    published = {}
+    for screen in dashboard_cache.SCREEN_TABLES:
+        try:
+            columns, rows = _json_frame(dashboard_cache.screen_frame(screen, version))
+        except Exception as e:
+            print(f"Screen events: could not load {screen}:", e)
+            continue
+        previous = _frames.get(screen)
+        _frames[screen] = (version, columns, rows)
+        if previous is None:
+            continue
+        changes = cell_changes(previous[1], previous[2], columns, rows)
+        if changes is None:
+            published[screen] = {"type": "snapshot", "base": previous[0], "version": version}
+        elif changes[0] is not None or changes[1]:
+            event = {"type": "delta", "base": previous[0], "version": version, "cells": changes[1]}
+            if changes[0] is not None:
+                event["columns"] = changes[0]
+            published[screen] = event
+    with _lock:
+        for screen, event in published.items():
+            _events[screen].append(event)
+        _seen_version = version
+        _lock.notify_all()
+
+
+def _watch():
+    while True:
+        try:
+            version = dashboard_cache.data_version()
+            if version != _seen_version:
+                _advance(version)
+        except Exception as e:
+            print("Screen events watcher error:", e)
+        time.sleep(POLL_SECONDS)
+
+
+def _ensure_watcher():
+    global _watcher
+    with _lock:
+        if _watcher is None or not _watcher.is_alive():
+            _watcher = threading.Thread(target=_watch, name="screen-events", daemon=True)
+            _watcher.start()
+
+
+def subscribe():
+    """Claim a subscriber slot (False when MAX_SUBSCRIBERS streams are open); pair with unsubscribe()."""
+    global _subscribers
+    _ensure_watcher()
+    with _lock:
+        if _subscribers >= MAX_SUBSCRIBERS:
+            return False
+        _subscribers += 1
+        return True
+
+
+def unsubscribe():
+    global _subscribers
+    with _lock:
+        _subscribers -= 1
+
+
+def wait_for(screen, version, timeout):
+    """Events of `screen` newer than `version`, waiting up to `timeout` seconds for one ([] if none)."""
+    def newer():
+        return [e for e in _events[screen] if e["version"] > version]
+
+    with _lock:
+        _lock.wait_for(newer, timeout=timeout)
+        return newer()
+
+
+def status():
+    with _lock:
+        return {"subscribers": _subscribers, "max_subscribers": MAX_SUBSCRIBERS, "seen_version": _seen_version}
@@ -0,0 +1,406 @@
+import hashlib
+import io
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+import run_metrics
+from db_export import enable_sqlite_transactions
+from dump_stream import read_sheet, stream_distinct_doc_types, stream_distinct_dump
+from input_schema import INPUT_SCHEMAS
+from pipeline_dag import file_fingerprint
+from queue_aggregates import freeze_table, split_qc_queues
+
+# SQL push-down engine for the per-queue aggregate table (CC_AGGREGATION_ENGINE=sql).
+# Raw input rows are bulk-loaded into one table per source, split into slices (queues of the
+# data dump, Doc Types of the other sheets); the distinct-document counts are kept in
+# materialized tables, rebuilt only for the slices whose rows changed:
+#   raw_data_dump  -> mv_dump_queue   (per queue)   and mv_dump_qc_base (per QC base queue)
+#   raw_reso_dump / raw_pro_pf / raw_reso_pf -> mv_doc_types (per source and Doc Type)
+#   raw_reso_map   (joined at query time)
+# v_queue_aggregates joins them into (queue, metric, value) rows with the same numbers as
+# build_queue_aggregates. An input whose key (workbook fingerprint) is unchanged is not read at
+# all (sql_partitions); one that changed is read and compared slice by slice (sql_slices).
+# Documents are keyed by their ID, integer IDs as themselves and others by a hash of type and
+# value, so keys are stable between runs and 123 and "123" stay as distinct as in pandas.
+# Tables (not PostgreSQL materialized views) because a REFRESH always recomputes everything.
+# Runs on SQLite and PostgreSQL (COPY load, same DDL).
+# Scope: only the per-queue aggregate table is pushed down (v_doc_type_queues, v_queue_aggregates).
+# The category rollups (rollup_engine) and the Executive View (process_executive_view) are computed
+# in pandas from that table under either engine: they are small and follow the layout workbook.
+
+BATCH_SIZE = 5000
+RAW_FORMAT = 2    # part of every input key and slice digest: bump when the raw rows change meaning
+
+# Raw rows of one source: `slices` maps slice -> (digest, rows); chunks(names) yields the rows
+# of those slices as DataFrames of at most BATCH_SIZE rows
+Partition = namedtuple("Partition", ["n_rows", "slices", "chunks"])
+# One input: `key` identifies its content (None: unknown, every slice is compared); load() -> Partition
+SourceInput = namedtuple("SourceInput", ["key", "load"])
+
+_DOC_TYPE_SOURCES = {"reso_dump": "Doc ID", "pro_pf": "Document ID", "reso_pf": "Document ID"}
+
+_RAW_TABLES = {
+    "data_dump": ("raw_data_dump",
+                  "queue TEXT NOT NULL, base_queue TEXT NOT NULL, is_qc INTEGER NOT NULL, "
+                  "doc_key BIGINT NOT NULL, document_id TEXT NOT NULL, locked INTEGER NOT NULL",
+                  ["CREATE INDEX ix_raw_data_dump_queue ON raw_data_dump (queue, doc_key, locked)",
+                   "CREATE INDEX ix_raw_data_dump_base ON raw_data_dump (is_qc, base_queue, doc_key, locked)"]),
+    "reso_map": ("raw_reso_map", "doc_type TEXT NOT NULL, queue_desc TEXT", []),
+    **{source: (f"raw_{source}", "doc_type TEXT NOT NULL, doc_key BIGINT NOT NULL, document_id TEXT NOT NULL",
+                [f"CREATE INDEX ix_raw_{source}_doc_type ON raw_{source} (doc_type, doc_key)"])
+       for source in _DOC_TYPE_SOURCES},
+}
+
+# Raw table column a source is sliced on (None: reloaded as a whole)
+_SLICE_COLUMNS = {"data_dump": "queue", "reso_map": None, **{source: "doc_type" for source in _DOC_TYPE_SOURCES}}
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS sql_partitions (source TEXT PRIMARY KEY, digest TEXT NOT NULL, n_rows BIGINT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS sql_slices (source TEXT NOT NULL, slice TEXT NOT NULL, digest TEXT NOT NULL, "
+    "n_rows BIGINT NOT NULL, PRIMARY KEY (source, slice))",
+    "CREATE TABLE IF NOT EXISTS mv_dump_queue (queue TEXT PRIMARY KEY, is_qc INTEGER NOT NULL, "
+    "documents BIGINT NOT NULL, locked_documents BIGINT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS mv_dump_qc_base (base_queue TEXT PRIMARY KEY, "
+    "documents BIGINT NOT NULL, locked_documents BIGINT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS mv_doc_types (source TEXT NOT NULL, doc_type TEXT NOT NULL, "
+    "documents BIGINT NOT NULL, PRIMARY KEY (source, doc_type))",
+    *[f"CREATE TABLE IF NOT EXISTS {table} ({columns})" for table, columns, _ in _RAW_TABLES.values()],
+]
+
+_VIEWS = {
+    # Doc Type counts rolled up to the mapped queue (a Doc Type mapped twice counts twice, as in pandas' merge)
+    "v_doc_type_queues": """
+        SELECT t.source AS source, m.queue_desc AS queue, SUM(t.documents) AS documents
+        FROM mv_doc_types t JOIN raw_reso_map m ON m.doc_type = t.doc_type
+        WHERE m.queue_desc IS NOT NULL
+        GROUP BY t.source, m.queue_desc""",
+    "v_queue_aggregates": """
+        SELECT queue, 'PRO Queue' AS metric, documents AS value FROM mv_dump_queue WHERE is_qc = 0
+        UNION ALL SELECT queue, 'User Locked PRO', locked_documents FROM mv_dump_queue WHERE is_qc = 0
+        UNION ALL SELECT base_queue, 'QC Queue', documents FROM mv_dump_qc_base
+        UNION ALL SELECT base_queue, 'User Locked QC', locked_documents FROM mv_dump_qc_base
+        UNION ALL SELECT queue, 'Processed Volumes', documents FROM mv_dump_queue
+        UNION ALL SELECT queue, 'Reso Queue', documents FROM v_doc_type_queues WHERE source = 'reso_dump'
+        UNION ALL SELECT queue, 'PRO Personal Folders', documents FROM v_doc_type_queues WHERE source = 'pro_pf'
+        UNION ALL SELECT queue, 'RESO Personal Folders', documents FROM v_doc_type_queues WHERE source = 'reso_pf'""",
+}
+
+
+def connect(url):
+    engine = create_engine(url, echo=False)
+    if engine.dialect.name == "sqlite":
+        enable_sqlite_transactions(engine)
+    return engine
+
+
+def _texts(values):
+    return np.array([None if pd.isna(v) else str(v) for v in values], dtype=object)
+
+
+def _doc_key(value):
+    if isinstance(value, (int, np.integer)) or (isinstance(value, float) and value.is_integer()):
+        if -2 ** 63 <= int(value) < 2 ** 63:
+            return int(value)
+    digest = hashlib.blake2b(f"{type(value).__name__}:{value!r}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % 2 ** 63 - 2 ** 63
+
+
+def _doc_keys(ids):
+    """(code per row, -1 for blanks; stable key and text per code) of a document ID column.
+    Codes follow pandas' identity (factorize); keys are the integer IDs themselves, anything
+    else a negative 63-bit hash of its type and value."""
+    codes, uniques = pd.factorize(ids)
+    if pd.api.types.is_integer_dtype(uniques.dtype):
+        keys = np.asarray(uniques, dtype=np.int64)
+    else:
+        keys = np.array([_doc_key(v) for v in uniques], dtype=np.int64)
+    return codes, keys, _texts(uniques)
+
+
+def _partition(slice_names, slice_codes, hashes, make_chunk):
+    """Partition of raw rows given the slice code (into `slice_names`) and content hash of every
+    row. A slice digest sums its row hashes (mod 2**64), so it does not depend on row order.
+    make_chunk(rows) builds the DataFrame of the given row positions."""
+    slice_codes = np.asarray(slice_codes, dtype=np.int64)
+    counts = np.bincount(slice_codes, minlength=len(slice_names))
+    sums = np.zeros(len(slice_names), dtype=np.uint64)
+    np.add.at(sums, slice_codes, np.asarray(hashes, dtype=np.uint64))
+    order = np.argsort(slice_codes, kind="stable")
+    ends = np.cumsum(counts)
+    positions = {name: (end - n, end) for name, n, end in zip(slice_names, counts, ends) if n}
+    slices = {name: (f"{RAW_FORMAT}:{total:016x}:{n}", int(n))
+              for name, total, n in zip(slice_names, sums, counts) if n}
+
+    def chunks(names):
+        taken = np.concatenate([order[slice(*positions[name])] for name in names] + [np.empty(0, dtype=np.int64)])
+        for start in range(0, len(taken), BATCH_SIZE):
+            yield make_chunk(taken[start:start + BATCH_SIZE])
+    return Partition(int(counts.sum()), slices, chunks)
+
+
+def _row_hashes(**columns):
+    return pd.util.hash_pandas_object(pd.DataFrame(columns), index=False).to_numpy()
+
+
+def _dump_rows(df):
+    """raw_data_dump rows sliced by queue, one per distinct (queue, document, locked); the QC
+    split is decided once per distinct queue, as dump_queue_counts does. Only integer codes are
+    kept per row; the text columns are built chunk by chunk."""
+    queue_cat = df["Queue"].astype("category")
+    queue_slices, queues = pd.factorize(_texts(queue_cat.cat.categories))
+    queues = np.asarray(queues, dtype=object)
+    codes = queue_cat.cat.codes.to_numpy()
+    doc_codes, keys, ids = _doc_keys(df["Document ID"])
+    valid = (codes >= 0) & (doc_codes >= 0)
+    rows = pd.DataFrame({
+        "slice": queue_slices[codes[valid]],
+        "doc": doc_codes[valid],
+        "locked": df["Lock Status"].to_numpy(dtype=bool)[valid],
+    }).drop_duplicates()
+    slices, docs, locked = (rows[c].to_numpy() for c in ("slice", "doc", "locked"))
+    is_qc, base = split_qc_queues(queues)
+    base = np.asarray(base, dtype=object)
+
+    def chunk(taken):
+        s, d = slices[taken], docs[taken]
+        return pd.DataFrame({
+            "queue": queues[s],
+            "base_queue": base[s],
+            "is_qc": is_qc[s].astype(np.int64),
+            "doc_key": keys[d],
+            "document_id": ids[d],
+            "locked": locked[taken].astype(np.int64),
+        })
+    return _partition(queues, slices, _row_hashes(doc_key=keys[docs], locked=locked), chunk)
+
+
+def _doc_type_rows(df, id_column):
+    """raw_<source> rows sliced by Doc Type, one per distinct (Doc Type, document)."""
+    type_codes, doc_types = pd.factorize(df["Doc Type"])
+    type_slices, names = pd.factorize(_texts(doc_types))
+    names = np.asarray(names, dtype=object)
+    doc_codes, keys, ids = _doc_keys(df[id_column])
+    valid = (type_codes >= 0) & (doc_codes >= 0)
+    rows = pd.DataFrame({"slice": type_slices[type_codes[valid]], "doc": doc_codes[valid]}).drop_duplicates()
+    slices, docs = rows["slice"].to_numpy(), rows["doc"].to_numpy()
+
+    def chunk(taken):
+        d = docs[taken]
+        return pd.DataFrame({"doc_type": names[slices[taken]], "doc_key": keys[d], "document_id": ids[d]})
+    return _partition(names, slices, _row_hashes(doc_key=keys[docs]), chunk)
+
+
+def _map_rows(df):
+    """raw_reso_map rows, one slice; duplicate mappings are kept (they count twice, as in pandas)."""
+    rows = pd.DataFrame({"doc_type": _texts(df["Doc_Type"]), "queue_desc": _texts(df["Queue_Desc"])})
+    rows = rows[rows["doc_type"].notna()].reset_index(drop=True)
+    return _partition(np.array([""], dtype=object), np.zeros(len(rows), dtype=np.int64),
+                      _row_hashes(doc_type=rows["doc_type"], queue_desc=rows["queue_desc"]),
+                      lambda taken: rows.iloc[taken])
+
+
+def _bulk_insert(conn, table, chunks):
+    """Insert DataFrame chunks: at most BATCH_SIZE rows are materialized at a time. Returns the rows inserted."""
+    n_rows = 0
+    if conn.dialect.name == "postgresql":
+        cursor = conn.connection.cursor()
+        try:
+            for rows in chunks:
+                buf = io.StringIO()
+                rows.to_csv(buf, index=False, header=False, na_rep="\\N")
+                buf.seek(0)
+                cursor.copy_expert(f"COPY {table} ({', '.join(rows.columns)}) FROM STDIN "
+                                   "WITH (FORMAT csv, NULL '\\N')", buf)
+                n_rows += len(rows)
+        finally:
+            cursor.close()
+        return n_rows
+    # Positional tuples straight to the driver's executemany: no per-row dict or statement compilation
+    marker = "%s" if conn.dialect.paramstyle in ("format", "pyformat") else "?"
+    for rows in chunks:
+        insert = f"INSERT INTO {table} ({', '.join(rows.columns)}) VALUES ({', '.join([marker] * len(rows.columns))})"
+        values = rows.astype(object).where(rows.notna(), None)
+        conn.exec_driver_sql(insert, list(zip(*(values[c].tolist() for c in rows.columns))))
+        n_rows += len(rows)
+    return n_rows
+
+
+def _rebuild(conn, keys, delete, insert, condition):
+    """Run a DELETE and an INSERT ... SELECT over every row (keys None) or once per key, narrowed
+    by `condition` (binding :key) in place of their {where} / {also} placeholders."""
+    if keys is None:
+        for statement in (delete, insert):
+            conn.exec_driver_sql(statement.format(where="", also=""))
+    elif keys:
+        params = [{"key": key} for key in keys]
+        for statement in (delete, insert):
+            conn.execute(text(statement.format(where=f" WHERE {condition}", also=f" AND {condition}")), params)
+
+
+def _refresh_materialized(conn, source, slices):
+    """Recompute the materialized rows derived from `slices` of a source (None: all of them)."""
+    if source == "data_dump":
+        bases = None
+        if slices is not None:
+            is_qc, base = split_qc_queues(slices)
+            bases = sorted(set(base[is_qc]))
+        _rebuild(conn, slices, "DELETE FROM mv_dump_queue{where}",
+                 """INSERT INTO mv_dump_queue (queue, is_qc, documents, locked_documents)
+                    SELECT queue, MAX(is_qc), COUNT(DISTINCT doc_key),
+                           COUNT(DISTINCT CASE WHEN locked = 1 THEN doc_key END)
+                    FROM raw_data_dump{where} GROUP BY queue""",
+                 "queue = :key")
+        # A QC base queue counts the documents of every QC queue that rolls up into it
+        _rebuild(conn, bases, "DELETE FROM mv_dump_qc_base{where}",
+                 """INSERT INTO mv_dump_qc_base (base_queue, documents, locked_documents)
+                    SELECT base_queue, COUNT(DISTINCT doc_key), COUNT(DISTINCT CASE WHEN locked = 1 THEN doc_key END)
+                    FROM raw_data_dump WHERE is_qc = 1{also} GROUP BY base_queue""",
+                 "base_queue = :key")
+    elif source in _DOC_TYPE_SOURCES:
+        _rebuild(conn, slices, f"DELETE FROM mv_doc_types WHERE source = '{source}'{{also}}",
+                 f"""INSERT INTO mv_doc_types (source, doc_type, documents)
+                     SELECT '{source}', doc_type, COUNT(DISTINCT doc_key) FROM raw_{source}{{where}}
+                     GROUP BY doc_type""",
+                 "doc_type = :key")
+
+
+def _reload(conn, source, partition, changed, removed, known):
+    """Replace the changed and removed slices of a raw table and what derives from them.
+    Rebuilt as a whole (indexes after the load) when nothing was loaded before, the source is
+    not sliced, or most rows changed. Returns the rows inserted."""
+    table, columns, indexes = _RAW_TABLES[source]
+    column = _SLICE_COLUMNS[source]
+    changed_rows = sum(partition.slices[name][1] for name in changed)
+    if not known or column is None or 2 * changed_rows > partition.n_rows:
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {table}")
+        conn.exec_driver_sql(f"CREATE TABLE {table} ({columns})")
+        n_rows = _bulk_insert(conn, table, partition.chunks(list(partition.slices)))
+        for statement in indexes:
+            conn.exec_driver_sql(statement)
+        _refresh_materialized(conn, source, None)
+        return n_rows
+    conn.execute(text(f"DELETE FROM {table} WHERE {column} = :key"), [{"key": name} for name in changed + removed])
+    n_rows = _bulk_insert(conn, table, partition.chunks(changed))
+    _refresh_materialized(conn, source, changed + removed)
+    return n_rows
+
+
+def refresh(engine, sources):
+    """Bring the raw tables up to date with `sources` (source -> SourceInput) and refresh what
+    derives from them. Inputs whose key is unchanged are not loaded; of the others only the
+    slices whose digest changed are reloaded, all in one transaction.
+    Returns {source: (slices reloaded or removed, slices)} for the sources that changed."""
+    with engine.begin() as conn:
+        for statement in _SCHEMA:
+            conn.exec_driver_sql(statement)
+        known_keys = dict(conn.execute(text("SELECT source, digest FROM sql_partitions")).fetchall())
+        known_slices = {}
+        for source, name, digest in conn.execute(text("SELECT source, slice, digest FROM sql_slices")):
+            known_slices.setdefault(source, {})[name] = digest
+    loaded = {source: source_input.load() for source, source_input in sources.items()
+              if source_input.key is None or known_keys.get(source) != source_input.key}
+
+    reloaded = {}
+    with engine.begin() as conn:
+        # Views go first and come back last: a raw table cannot be dropped under a view reading it
+        for name in reversed(list(_VIEWS)):
+            conn.exec_driver_sql(f"DROP VIEW IF EXISTS {name}")
+        for source, partition in loaded.items():
+            known = known_slices.get(source, {})
+            changed = [name for name, (digest, _) in partition.slices.items() if known.get(name) != digest]
+            removed = [name for name in known if name not in partition.slices]
+            if changed or removed:
+                with run_metrics.span(f"sql_load_{source}", kind="input", rows_in=partition.n_rows) as entry:
+                    entry["rows_out"] = _reload(conn, source, partition, changed, removed, known)
+                conn.execute(text("DELETE FROM sql_slices WHERE source = :source AND slice = :slice"),
+                             [{"source": source, "slice": name} for name in changed + removed])
+                if changed:
+                    conn.execute(text("INSERT INTO sql_slices (source, slice, digest, n_rows) "
+                                      "VALUES (:source, :slice, :digest, :n)"),
+                                 [{"source": source, "slice": name, "digest": partition.slices[name][0],
+                                   "n": partition.slices[name][1]} for name in changed])
+                reloaded[source] = (len(changed) + len(removed), len(partition.slices))
+            conn.execute(text("DELETE FROM sql_partitions WHERE source = :source"), {"source": source})
+            conn.execute(text("INSERT INTO sql_partitions (source, digest, n_rows) VALUES (:source, :digest, :n)"),
+                         {"source": source, "digest": sources[source].key or "", "n": partition.n_rows})
+        for name, sql in _VIEWS.items():
+            conn.exec_driver_sql(f"CREATE VIEW {name} AS {sql}")
+    return reloaded
+
+
+def query_aggregates(engine):
+    """The per-queue aggregate table, read from v_queue_aggregates."""
+    with engine.connect() as conn:
+        long = pd.read_sql_query(text("SELECT queue, metric, value FROM v_queue_aggregates"), conn)
+    long["value"] = long["value"].astype(np.int64)
+    return {metric: group.set_index("queue")["value"].rename_axis(None)
+            for metric, group in long.groupby("metric", sort=False)}
+
+
+def frame_sources(data_dump_df, reso_df, reso_map_df, pro_pf_df, reso_pf_df):
+    """Inputs from the frames the pandas loaders return (no key: every slice is compared)."""
+    frames = {"reso_dump": reso_df, "pro_pf": pro_pf_df, "reso_pf": reso_pf_df}
+    sources = {
+        "data_dump": SourceInput(None, lambda: _dump_rows(data_dump_df)),
+        "reso_map": SourceInput(None, lambda: _map_rows(reso_map_df)),
+    }
+    for source, id_column in _DOC_TYPE_SOURCES.items():
+        sources[source] = SourceInput(None, lambda df=frames[source], id_column=id_column: _doc_type_rows(df, id_column))
+    return sources
+
+
+def _streamed(name, path, read):
+    sheet = INPUT_SCHEMAS[name].sheet
+    with run_metrics.span(os.path.basename(path), kind="input", bytes=os.path.getsize(path),
+                          sheet=sheet if isinstance(sheet, str) else None, mode="stream") as entry:
+        df = read(path)
+        entry["rows_out"] = len(df)
+    return df
+
+
+def _workbook_source(name, path, read, rows):
+    return SourceInput(f"{RAW_FORMAT}:{file_fingerprint(path)}", lambda: rows(_streamed(name, path, read)))
+
+
+def workbook_sources(paths):
+    """Inputs read straight from the workbooks at `paths` (input name -> path), keyed by file
+    fingerprint: a workbook that did not change is not opened. Sheets are streamed with openpyxl
+    and only distinct rows are kept (the counts are of distinct documents), so neither the
+    pandas loaders nor a whole sheet are ever needed."""
+    sources = {
+        "data_dump": _workbook_source("data_dump", paths["data_dump"], stream_distinct_dump, _dump_rows),
+        "reso_map": _workbook_source("reso_map", paths["reso_map"], lambda path: read_sheet(path, "reso_map"),
+                                     _map_rows),
+    }
+    for source, id_column in _DOC_TYPE_SOURCES.items():
+        sources[source] = _workbook_source(
+            source, paths[source],
+            lambda path, source=source, id_column=id_column: stream_distinct_doc_types(path, source, id_column),
+            lambda df, id_column=id_column: _doc_type_rows(df, id_column))
+    return sources
+
+
+def _aggregate(sources, db_url):
+    engine = connect(db_url)
+    try:
+        reloaded = refresh(engine, sources)
+        print("SQL aggregation: reloaded " + (", ".join(f"{source} ({n} of {total} slices)"
+                                                        for source, (n, total) in reloaded.items())
+                                             or "nothing (all inputs unchanged)"))
+        return freeze_table(query_aggregates(engine))
+    finally:
+        engine.dispose()
+
+
+def build_sql_queue_aggregates(data_dump_df, reso_df, reso_map_df, pro_pf_df, reso_pf_df, db_url):
+    """build_queue_aggregates, computed in the database at `db_url`."""
+    return _aggregate(frame_sources(data_dump_df, reso_df, reso_map_df, pro_pf_df, reso_pf_df), db_url)
+
+
+def stream_sql_queue_aggregates(paths, db_url):
+    """build_queue_aggregates over the input workbooks at `paths`, computed in the database at `db_url`."""
+    return _aggregate(workbook_sources(paths), db_url)
@@ -41,9 +41,9 @@ source $VENV_DIR/bin/activate
 pip install --upgrade pip
 pip install -r requirements.txt
 
-# Run Flask (test mode)
-echo "Starting Flask for testing..."
-nohup $VENV_DIR/bin/python app.py > flask.log 2>&1 &
+# Run the API under gunicorn (settings in gunicorn.conf.py; `python app.py` is the dev server)
+echo "Starting Command Centre API..."
+nohup $VENV_DIR/bin/gunicorn -c gunicorn.conf.py wsgi:app > flask.log 2>&1 &
 
-echo "=== Flask is running in background on port 5000 ==="
+echo "=== Command Centre API is running in background on port 5000 ==="
 echo "Check logs with: tail -f $APP_DIR/flask.log"
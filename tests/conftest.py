@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import upload_store  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """upload_store pointed at an empty directory."""
+    monkeypatch.setattr(upload_store, "STORE_DIR", str(tmp_path / "upload_store"))
+    return upload_store
@@ -0,0 +1,111 @@
+"""Local stand-in for the Azure getNewFiles function and the preprocessing API, for cron_check_files.
+
+    python -m tests.function_standin <files_dir> [--port 8071]
+    GET_FILES_URL=http://127.0.0.1:8071/api/getNewFiles \\
+        CC_API_BASE=http://127.0.0.1:8071/command_centre/api python cron_check_files.py
+
+Every file in <files_dir> is listed and served with an ETag (content hash) and Last-Modified
+(file mtime); conditional requests that still match get 304. Preprocessing jobs are accepted
+and reported as succeeded right away.
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlsplit
+
+LIST_PATH = "/api/getNewFiles"
+FILE_PREFIX = "/files/"
+JOBS_PATH = "/command_centre/api/preprocessing"
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, files_dir, port=0):
+        super().__init__(("127.0.0.1", port), StandinHandler)
+        self.files_dir = files_dir
+        self.log = []       # (method, path, status) per request
+        self.jobs = []      # bodies of the preprocessing jobs submitted
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=None):
+        self.server.log.append((self.command, urlsplit(self.path).path, status))
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status, value):
+        self._send(status, json.dumps(value).encode(), {"Content-Type": "application/json"})
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == LIST_PATH:
+            names = sorted(n for n in os.listdir(self.server.files_dir) if not n.startswith("."))
+            return self._json(200, {"files": [{"filename": n, "url": f"{self.server.url}{FILE_PREFIX}{quote(n)}"}
+                                              for n in names]})
+        if path.startswith(FILE_PREFIX):
+            return self._file(os.path.basename(unquote(path[len(FILE_PREFIX):])))
+        if path.startswith(JOBS_PATH + "/"):
+            return self._json(200, {"id": path.rsplit("/", 1)[1], "status": "succeeded", "stages_executed": []})
+        self._send(404)
+
+    def do_POST(self):
+        if urlsplit(self.path).path != JOBS_PATH:
+            return self._send(404)
+        length = int(self.headers.get("Content-Length") or 0)
+        self.server.jobs.append(json.loads(self.rfile.read(length) or b"{}"))
+        job_id = f"job-{len(self.server.jobs)}"
+        self._json(202, {"status": "queued", "job_id": job_id, "job": {"id": job_id, "status": "queued"}})
+
+    def _file(self, name):
+        path = os.path.join(self.server.files_dir, name)
+        if not os.path.isfile(path):
+            return self._send(404)
+        with open(path, "rb") as f:
+            body = f.read()
+        mtime = int(os.path.getmtime(path))
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        headers = {"ETag": etag, "Last-Modified": formatdate(mtime, usegmt=True)}
+        if_none_match = self.headers.get("If-None-Match")
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_none_match is not None:
+            not_modified = if_none_match == etag
+        elif if_modified_since is not None:
+            not_modified = mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+        else:
+            not_modified = False
+        if not_modified:
+            return self._send(304, headers=headers)
+        self._send(200, body, headers)
+
+
+def start(files_dir, port=0):
+    """Serve `files_dir` from a background thread; call .shutdown() when done."""
+    server = StandinServer(files_dir, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a directory as the getNewFiles function.")
+    parser.add_argument("files_dir")
+    parser.add_argument("--port", type=int, default=8071)
+    args = parser.parse_args()
+    server = StandinServer(args.files_dir, args.port)
+    print(f"Serving {args.files_dir} at {server.url}{LIST_PATH}")
+    server.serve_forever()
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+import cron_check_files
+from tests import function_standin
+
+
+@pytest.fixture
+def standin(tmp_path, store, monkeypatch):
+    files_dir = tmp_path / "container"
+    files_dir.mkdir()
+    (files_dir / "a.xlsx").write_bytes(b"first a")
+    (files_dir / "b.xlsx").write_bytes(b"first b")
+    server = function_standin.start(str(files_dir))
+    uploads = tmp_path / "uploads"
+    monkeypatch.setattr(cron_check_files, "GET_FILES_URL", server.url + function_standin.LIST_PATH)
+    monkeypatch.setattr(cron_check_files, "PREPROCESSING_API", server.url + function_standin.JOBS_PATH)
+    monkeypatch.setattr(cron_check_files, "UPLOADS_DIR", str(uploads))
+    monkeypatch.setattr(cron_check_files, "DOWNLOAD_STATE_PATH", str(uploads / ".download_state.json"))
+    monkeypatch.setattr(cron_check_files, "JOB_POLL_INTERVAL", 0)
+    yield server, files_dir
+    server.shutdown()
+    server.server_close()
+
+
+def file_statuses(server):
+    return {path.rsplit("/", 1)[1]: status for method, path, status in server.log
+            if path.startswith(function_standin.FILE_PREFIX)}
+
+
+def test_changed_files_are_downloaded_and_preprocessed(standin, store):
+    server, _ = standin
+    assert sorted(cron_check_files.main()) == ["a.xlsx", "b.xlsx"]
+    assert file_statuses(server) == {"a.xlsx": 200, "b.xlsx": 200}
+    assert len(server.jobs) == 1
+    with open(store.object_path(store.staged()["a.xlsx"]), "rb") as f:
+        assert f.read() == b"first a"
+
+
+def test_unchanged_files_get_304_and_skip_preprocessing(standin, store):
+    server, _ = standin
+    cron_check_files.main()
+    staged = store.staged()
+    server.log.clear()
+
+    assert cron_check_files.main() == []
+    assert file_statuses(server) == {"a.xlsx": 304, "b.xlsx": 304}
+    assert len(server.jobs) == 1
+    assert store.staged() == staged
+
+
+def test_only_the_changed_file_is_fetched(standin, store):
+    server, files_dir = standin
+    cron_check_files.main()
+    server.log.clear()
+    (files_dir / "a.xlsx").write_bytes(b"second a")
+    os.utime(files_dir / "a.xlsx", (os.path.getmtime(files_dir / "a.xlsx") + 5,) * 2)
+
+    assert cron_check_files.main() == ["a.xlsx"]
+    assert file_statuses(server) == {"a.xlsx": 200, "b.xlsx": 304}
+    assert len(server.jobs) == 2
+    with open(store.object_path(store.staged()["a.xlsx"]), "rb") as f:
+        assert f.read() == b"second a"
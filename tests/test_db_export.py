@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, inspect
+
+import db_export
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return db_export.enable_sqlite_transactions(create_engine(f"sqlite:///{tmp_path / 'export.db'}"))
+
+
+def frames(version):
+    return {
+        "gdc": pd.DataFrame({"Queue": ["Fin A", "Fin B"], "PRO_Queue": [version, version + 1]}),
+        "hnw": pd.DataFrame({"Queue": ["Fin C"], "PRO_Queue": [version * 10]}),
+    }
+
+
+def read(engine, name):
+    return pd.read_sql_table(name, engine)
+
+
+def test_export_swaps_in_every_table(engine):
+    assert db_export.export_to_databases(frames(1), engine) == {"SQLite": True}
+    assert db_export.export_to_databases(frames(2), engine) == {"SQLite": True}
+
+    pd.testing.assert_frame_equal(read(engine, "gdc"), frames(2)["gdc"])
+    pd.testing.assert_frame_equal(read(engine, "hnw"), frames(2)["hnw"])
+    assert sorted(inspect(engine).get_table_names()) == ["gdc", "hnw"]
+
+
+def test_failed_load_keeps_every_previous_table(engine, monkeypatch):
+    db_export.export_to_databases(frames(1), engine)
+
+    def load_then_fail(conn, name, df):
+        if name == "hnw":
+            raise ValueError("bad frame")
+        return db_export.load_sqlite(conn, name, df)
+
+    assert not db_export.export_snapshot(engine, frames(2), load_then_fail, "SQLite")
+    # gdc was staged and would have been swapped first; the whole export rolled back
+    pd.testing.assert_frame_equal(read(engine, "gdc"), frames(1)["gdc"])
+    pd.testing.assert_frame_equal(read(engine, "hnw"), frames(1)["hnw"])
+    assert sorted(inspect(engine).get_table_names()) == ["gdc", "hnw"]
+
+
+def test_column_types_follow_the_dtype():
+    df = pd.DataFrame({
+        "n": pd.array([1, None], dtype="Int64"),
+        "x": [1.5, None],
+        "flag": [True, False],
+        "cells": pd.Series([None, 3], dtype=object),   # layout cells: blanks and numbers
+        "label": ["a", None],
+    })
+    types = {c.name: type(c.type).__name__ for c in db_export.staging_table("t", df).columns}
+    assert types == {"n": "BigInteger", "x": "Float", "flag": "Boolean", "cells": "BigInteger", "label": "Text"}
@@ -0,0 +1,78 @@
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+import document_store
+
+RESO_MAP = pd.DataFrame({"Doc_Type": ["T1", "T2"], "Queue_Desc": ["Fin A", "Fin B"]})
+
+
+def frames(n_docs=250):
+    ids = pd.array(range(1, n_docs + 1), dtype="Int64")
+    data_dump = pd.DataFrame({
+        "Document ID": ids,
+        "Queue": ["Fin A" if i % 3 else "Fin A QC" for i in range(n_docs)],
+        "Lock Status": [i % 5 == 0 for i in range(n_docs)],
+    })
+    reso = pd.DataFrame({"Doc ID": ids[:40], "Doc Type": ["T1", "T2"] * 20})
+    pro_pf = pd.DataFrame({"Document ID": ids[:10], "Doc Type": ["T1"] * 10})
+    reso_pf = pd.DataFrame({"Document ID": ids[:0], "Doc Type": []})
+    return data_dump, reso, RESO_MAP, pro_pf, reso_pf
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "documents.db")
+    assert document_store.load_documents(*frames(), db_path=path) > 0
+    return path
+
+
+def all_pages(engine, filters, limit):
+    pages, after = [], 0
+    while after is not None:
+        page = document_store.query_documents(engine, filters, after=after, limit=limit)
+        pages.append(page)
+        after = page["next"]
+    return pages
+
+
+def test_pages_cover_every_matching_row_once(db_path):
+    engine = create_engine(f"sqlite:///{db_path}")
+    filters = dict(document_store.CELL_FILTERS["PRO Queue"], queue="Fin A")
+    pages = all_pages(engine, filters, limit=30)
+
+    ids = [doc["id"] for page in pages for doc in page["documents"]]
+    assert ids == sorted(set(ids))
+    assert len(ids) == pages[0]["total"] == 166
+    assert all(len(page["documents"]) == 30 for page in pages[:-1])
+    assert pages[-1]["next"] is None
+    assert all(doc["queue"] == "Fin A" and not doc["is_qc"] for page in pages for doc in page["documents"])
+
+
+def test_exact_last_page_has_no_next(db_path):
+    engine = create_engine(f"sqlite:///{db_path}")
+    filters = dict(document_store.CELL_FILTERS["Reso Queue"], queue="Fin B")
+    page = document_store.query_documents(engine, filters, limit=20)
+    assert page["total"] == 20
+    assert len(page["documents"]) == 20
+    assert page["next"] is None
+
+
+def test_filters_match_the_index_columns(db_path):
+    engine = create_engine(f"sqlite:///{db_path}")
+    locked_qc = dict(document_store.CELL_FILTERS["User Locked QC"], queue="Fin A")
+    documents = [doc for page in all_pages(engine, locked_qc, limit=7) for doc in page["documents"]]
+    assert documents
+    assert all(doc["is_qc"] and doc["locked"] and doc["base_queue"] == "Fin A" for doc in documents)
+
+
+def test_failed_load_keeps_the_previous_table(db_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{db_path}")
+    before = document_store.query_documents(engine, {"source": "pro_pf"})
+
+    def fail(engine, rows, batch_size=20000):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(document_store, "replace_documents", fail)
+    assert document_store.load_documents(*frames(50), db_path=db_path) is None
+    assert document_store.query_documents(engine, {"source": "pro_pf"}) == before
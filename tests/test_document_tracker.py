@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+
+import pytest
+
+import document_tracker as tracker
+from benchmarks import check_throughput as moves
+
+
+def test_moves_are_counted_step_by_step():
+    state = tracker._empty_state()
+    for label, dump, reso, now, expected in moves.STEPS:
+        counts = tracker.advance(state, moves._dump(dump), moves._reso(reso), moves.RESO_MAP, now)
+        assert moves._nonzero(counts) == expected, label
+
+
+@pytest.mark.parametrize("step", range(1, len(moves.STEPS)))
+def test_each_move_counted_from_saved_state(tmp_path, monkeypatch, step):
+    """Same counts when every dump is applied in its own run, through the saved index."""
+    path = str(tmp_path / "document_state.npz")
+    for label, dump, reso, now, expected in moves.STEPS[:step + 1]:
+        monkeypatch.setattr(tracker, "time", SimpleNamespace(time=lambda: now))
+        counts = tracker.track_document_throughput(moves._dump(dump), moves._reso(reso), moves.RESO_MAP,
+                                                   path, window=f"run-{now}")
+    assert moves._nonzero(counts) == expected
+
+
+def test_window_totals_accumulate_and_survive_a_rerun(tmp_path, monkeypatch):
+    path = str(tmp_path / "document_state.npz")
+    for label, dump, reso, now, expected in moves.STEPS[:3]:
+        monkeypatch.setattr(tracker, "time", SimpleNamespace(time=lambda: now))
+        totals = tracker.track_document_throughput(moves._dump(dump), moves._reso(reso), moves.RESO_MAP,
+                                                   path, window="day")
+    # Step 3 re-sent step 2's dump: the window keeps step 2's moves and counts them only once
+    assert moves._nonzero(totals) == moves.STEPS[1][4]
+
+
+def test_shuffled_dump_moves_nothing():
+    assert moves.check_shuffled(n_rows=2000) == []
+
+
+def test_cache_key_stable_on_unchanged_inputs():
+    assert moves.check_cache_base() == []
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+import history_store
+from screen_config import METRIC_COLUMNS, metric_column
+
+NOW = datetime(2026, 3, 1, 12, 0, 0)
+
+
+def test_metric_names_round_trip():
+    for column, metric in METRIC_COLUMNS.items():
+        assert history_store.metric_name(column) == metric
+        assert history_store.metric_name(metric) == metric
+        assert metric_column(history_store.metric_name(column)) == column
+    assert history_store.metric_name("QC'ed_Volumes") == "QC'ed Volumes"
+    assert history_store.metric_name("SLA_%_Completed") == "SLA % Completed"
+    # Underscores that belong to the name are kept
+    assert history_store.metric_name("Total_1") == "Total_1"
+
+
+def test_layout_snapshot_stores_workbook_names():
+    df = pd.DataFrame({"PRO_Queue": [3, 4], "Total_1": [1, 2], "Bulletin": ["", ""]}, index=["Fin A", "Fin B"])
+    long = history_store.layout_snapshot(df, "gdc_gta")
+    assert sorted(set(long["metric"])) == ["PRO Queue", "Total_1"]
+    assert len(long) == 4
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'history.db'}")
+
+
+def snapshot(value):
+    return {"gdc_gta": pd.DataFrame({"screen": ["gdc_gta"], "queue": ["Fin A"],
+                                     "metric": ["PRO Queue"], "value": [value]})}
+
+
+def stored_runs(engine):
+    with engine.connect() as conn:
+        return [row.run_ts for row in conn.execute(
+            text(f"SELECT run_ts FROM {history_store.HISTORY_TABLE} ORDER BY run_ts"))]
+
+
+def ts(dt):
+    return dt.strftime(history_store.TS_FORMAT)
+
+
+def test_retention_keeps_recent_runs_and_the_last_run_of_older_hours(engine):
+    runs = [
+        NOW - timedelta(days=100),                          # expired
+        NOW - timedelta(days=10, minutes=50),               # same hour as the next run: dropped
+        NOW - timedelta(days=10, minutes=10),               # last run of its hour
+        NOW - timedelta(days=9, hours=3),                   # only run of its hour
+        NOW - timedelta(days=2, minutes=40),                # within a week: all kept
+        NOW - timedelta(days=2, minutes=20),
+    ]
+    for i, run_ts in enumerate(runs):
+        history_store.append_snapshot(engine, snapshot(i), run_ts=run_ts)
+    history_store.append_snapshot(engine, snapshot(99), run_ts=NOW)
+
+    assert stored_runs(engine) == [ts(r) for r in runs[2:]] + [ts(NOW)]
+
+
+def test_series_and_delta_accept_either_metric_form(engine):
+    history_store.append_snapshot(engine, snapshot(10), run_ts=NOW - timedelta(days=1))
+    history_store.append_snapshot(engine, snapshot(15), run_ts=NOW)
+
+    series = history_store.query_series(engine, "gdc_gta", "Fin A", metric="PRO_Queue")
+    assert [row["value"] for row in series] == [10, 15]
+    assert series == history_store.query_series(engine, "gdc_gta", "Fin A", metric="PRO Queue")
+    delta = history_store.query_delta(engine, "gdc_gta", "Fin A", "PRO_Queue", period="1d")
+    assert (delta["metric"], delta["delta"], delta["pct_change"]) == ("PRO Queue", 5, 50.0)
@@ -0,0 +1,84 @@
+import threading
+from collections import deque
+
+import pytest
+
+import preprocessing_scheduler as scheduler
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    """Scheduler with empty state, a short debounce and submit_job recorded instead of run."""
+    submitted = []
+    fired = threading.Event()
+
+    def submit_job(source="api", force=False):
+        submitted.append(source)
+        fired.set()
+        return {"id": f"job-{len(submitted)}"}
+
+    monkeypatch.setattr(scheduler.preprocessing_worker, "submit_job", submit_job)
+    monkeypatch.setattr(scheduler, "_pending_files", set())
+    monkeypatch.setattr(scheduler, "_pending_changed", False)
+    monkeypatch.setattr(scheduler, "_last_arrival", None)
+    monkeypatch.setattr(scheduler, "_recent_gaps", deque(maxlen=50))
+    monkeypatch.setattr(scheduler, "_timer", None)
+    monkeypatch.setattr(scheduler, "DEFAULT_DEBOUNCE", 0.2)
+    monkeypatch.setattr(scheduler, "MIN_DEBOUNCE", 0.2)
+    yield submitted, fired
+    if scheduler._timer is not None:
+        scheduler._timer.cancel()
+
+
+def test_complete_batch_runs_immediately(jobs):
+    submitted, _ = jobs
+    names = sorted(scheduler.EXPECTED_FILES)
+    for name in names[:-1]:
+        assert scheduler.notify_upload(name) > 0
+    assert submitted == []
+
+    assert scheduler.notify_upload(names[-1]) == 0
+    assert submitted == ["scheduler:complete batch"]
+    assert scheduler._timer is None
+    assert scheduler.status()["pending_files"] == []
+
+
+def test_partial_batch_runs_once_after_debounce(jobs):
+    submitted, fired = jobs
+    names = sorted(scheduler.EXPECTED_FILES)
+    scheduler.notify_upload(names[0])
+    scheduler.notify_upload(names[1])
+    assert submitted == []
+    assert scheduler.status()["timer_armed"]
+
+    assert fired.wait(5)
+    assert submitted == ["scheduler:debounce"]
+    assert scheduler.status()["last_job_id"] == "job-1"
+    assert not scheduler.status()["timer_armed"]
+
+
+def test_unchanged_batch_does_not_run(jobs):
+    submitted, _ = jobs
+    for name in sorted(scheduler.EXPECTED_FILES):
+        scheduler.notify_upload(name, changed=False)
+    assert submitted == []
+
+    # One changed file in the batch is enough
+    names = sorted(scheduler.EXPECTED_FILES)
+    scheduler.notify_upload(names[0], changed=False)
+    scheduler.notify_upload(names[1], changed=True)
+    for name in names[2:]:
+        scheduler.notify_upload(name, changed=False)
+    assert submitted == ["scheduler:complete batch"]
+
+
+def test_debounce_follows_arrival_gaps(jobs, monkeypatch):
+    monkeypatch.setattr(scheduler, "DEFAULT_DEBOUNCE", 30)
+    monkeypatch.setattr(scheduler, "MIN_DEBOUNCE", 5)
+    assert scheduler.current_debounce() == 30
+    scheduler._recent_gaps.extend([2, 4, 3])
+    assert scheduler.current_debounce() == 9
+    scheduler._recent_gaps.extend([0.1] * 10)
+    assert scheduler.current_debounce() == 5
+    scheduler._recent_gaps.extend([100] * 20)
+    assert scheduler.current_debounce() == 60
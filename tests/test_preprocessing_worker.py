@@ -0,0 +1,27 @@
+import time
+
+import dashboard_cache
+import preprocessing_worker
+
+
+def wait_for_status(job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = preprocessing_worker.get_job(job_id)
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+def test_finished_job_drops_cached_screens(monkeypatch):
+    monkeypatch.setattr(preprocessing_worker.pipeline, "main",
+                        lambda force=False: {"coalesced": False, "stages_executed": ["queue_aggregates"]})
+    monkeypatch.setitem(dashboard_cache._frames, "screen", (1, None))
+    monkeypatch.setitem(dashboard_cache._views, ("screen", ()), {"version": 1})
+
+    job = wait_for_status(preprocessing_worker.submit_job(source="test")["id"])
+    assert job["status"] == "succeeded"
+    assert job["stages_executed"] == ["queue_aggregates"]
+    assert "screen" not in dashboard_cache._frames
+    assert ("screen", ()) not in dashboard_cache._views
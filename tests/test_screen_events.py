@@ -0,0 +1,61 @@
+import pytest
+from werkzeug.test import EnvironBuilder
+
+import dashboard_cache
+import screen_events
+from screen_events import cell_changes
+
+SCREEN = sorted(dashboard_cache.SCREEN_TABLES)[0]
+
+
+def test_cell_changes_lists_changed_cells():
+    columns = ["Queue", "Volume"]
+    assert cell_changes(columns, [["A", 1], ["B", 2]], columns, [["A", 1], ["B", 2]]) == (None, [])
+    assert cell_changes(columns, [["A", 1], ["B", 2]], columns, [["A", 3], ["B", None]]) == \
+        (None, [[0, "Volume", 3], [1, "Volume", None]])
+
+
+def test_cell_changes_reports_renamed_columns():
+    changes = cell_changes(["Queue", "As of 09:00"], [["A", 1]], ["Queue", "As of 10:00"], [["A", 2]])
+    assert changes == (["Queue", "As of 10:00"], [[0, "As of 10:00", 2]])
+
+
+def test_cell_changes_is_none_when_the_shape_changes():
+    assert cell_changes(["Queue"], [["A"]], ["Queue"], [["A"], ["B"]]) is None
+    assert cell_changes(["Queue"], [["A"]], ["Queue", "Volume"], [["A", 1]]) is None
+
+
+@pytest.fixture
+def events_app(monkeypatch):
+    import app
+
+    monkeypatch.setattr(screen_events, "_ensure_watcher", lambda: None)
+    monkeypatch.setattr(screen_events, "_subscribers", 0)
+    monkeypatch.setattr(screen_events, "MAX_SUBSCRIBERS", 1)
+    monkeypatch.setattr(dashboard_cache, "get_view",
+                        lambda screen: {"body": b"[]", "version": 1, "etag": "1", "gzip": None})
+    return app.app
+
+
+def open_stream(wsgi_app):
+    """Start the event stream the way a WSGI server does, without reading any of the body."""
+    statuses = []
+    environ = EnvironBuilder(path=f"/command_centre/api/screens/{SCREEN}/events").get_environ()
+    body = wsgi_app(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    return statuses[0], body
+
+
+def test_slot_released_when_client_leaves_before_first_chunk(events_app):
+    status, body = open_stream(events_app)
+    assert status.startswith("200")
+    assert screen_events.status()["subscribers"] == 1
+    rejected, rejected_body = open_stream(events_app)
+    assert rejected.startswith("429")
+    rejected_body.close()
+
+    body.close()
+    assert screen_events.status()["subscribers"] == 0
+    status, body = open_stream(events_app)
+    assert status.startswith("200")
+    body.close()
+    assert screen_events.status()["subscribers"] == 0
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import Command_Centre_Final_v1 as pipeline
+import sql_aggregates
+from benchmarks.generate_inputs import data_dump_frame, generate, personal_folder_frame, reso_dump_frame, reso_map_frame
+from input_schema import conform
+from queue_aggregates import build_queue_aggregates
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'aggregates.db'}"
+
+
+@pytest.fixture
+def workbooks(tmp_path):
+    """Input workbooks for a 500-row dump, with the pipeline's paths pointed at them."""
+    upload_dir = pipeline.UPLOAD_DIR
+    pipeline.set_upload_dir(generate(str(tmp_path / "inputs"), 500))
+    yield pipeline.input_paths()
+    pipeline.set_upload_dir(upload_dir)
+
+
+def frames():
+    return {
+        "data_dump_df": conform(data_dump_frame(3000), "data_dump"),
+        "reso_df": conform(reso_dump_frame(600), "reso_dump"),
+        "reso_map_df": conform(reso_map_frame(), "reso_map"),
+        "pro_pf_df": conform(personal_folder_frame(150, 4), "pro_pf"),
+        "reso_pf_df": conform(personal_folder_frame(75, 5), "reso_pf"),
+    }
+
+
+def refresh(frames, db_url):
+    engine = sql_aggregates.connect(db_url)
+    try:
+        reloaded = sql_aggregates.refresh(engine, sql_aggregates.frame_sources(**frames))
+        return reloaded, sql_aggregates.query_aggregates(engine)
+    finally:
+        engine.dispose()
+
+
+def assert_matches_pandas(counts, frames):
+    """Same numbers as build_queue_aggregates; queues missing on one side count as zero."""
+    expected = build_queue_aggregates(**frames)
+    actual = pd.DataFrame(counts)
+    queues = expected.index.union(actual.index)
+    pd.testing.assert_frame_equal(
+        actual.reindex(index=queues, columns=expected.columns).fillna(0).astype(np.int64),
+        expected.reindex(queues).fillna(0).astype(np.int64))
+
+
+def test_only_the_changed_queue_is_reloaded(db_url):
+    inputs = frames()
+    refresh(inputs, db_url)
+    dump = inputs["data_dump_df"]
+    queue = dump["Queue"].value_counts().index[0]
+    n_queues = dump["Queue"].nunique()
+    inputs["data_dump_df"] = dump.drop(dump.index[dump["Queue"] == queue][::2])
+
+    reloaded, counts = refresh(inputs, db_url)
+
+    assert reloaded == {"data_dump": (1, n_queues)}
+    assert_matches_pandas(counts, inputs)
+
+
+def test_removed_slices_are_dropped(db_url):
+    inputs = frames()
+    refresh(inputs, db_url)
+    dump, reso = inputs["data_dump_df"], inputs["reso_df"]
+    qc_queue = next(q for q in dump["Queue"].unique() if str(q).endswith("QC"))
+    doc_type = reso["Doc Type"].iloc[0]
+    inputs["data_dump_df"] = dump[dump["Queue"] != qc_queue]
+    inputs["reso_df"] = reso[reso["Doc Type"] != doc_type]
+
+    reloaded, counts = refresh(inputs, db_url)
+
+    assert reloaded["data_dump"][0] == 1 and reloaded["reso_dump"][0] == 1
+    assert_matches_pandas(counts, inputs)
+
+
+def test_unchanged_rows_reload_nothing(db_url):
+    inputs = frames()
+    refresh(inputs, db_url)
+    # Same rows in another order and with duplicates: same slice digests
+    inputs["reso_df"] = pd.concat([inputs["reso_df"].iloc[::-1], inputs["reso_df"].head(50)])
+
+    reloaded, counts = refresh(inputs, db_url)
+
+    assert reloaded == {}
+    assert_matches_pandas(counts, inputs)
+
+
+def test_sql_engine_matches_pandas(db_url):
+    inputs = frames()
+    pd.testing.assert_frame_equal(
+        sql_aggregates.build_sql_queue_aggregates(**inputs, db_url=db_url).sort_index(),
+        build_queue_aggregates(**inputs).sort_index())
+
+
+def test_streamed_workbooks_match_the_pandas_loaders(workbooks, db_url):
+    expected = build_queue_aggregates(
+        pipeline.load_data_dump(), pipeline.load_reso_dump(), pipeline.load_reso_map(),
+        pipeline.load_pro_personal_folder(), pipeline.load_reso_personal_folder())
+    pd.testing.assert_frame_equal(
+        sql_aggregates.stream_sql_queue_aggregates(workbooks, db_url).sort_index(), expected.sort_index())
+
+
+def test_unchanged_workbooks_are_not_opened(workbooks, db_url, monkeypatch):
+    sql_aggregates.stream_sql_queue_aggregates(workbooks, db_url)
+
+    def opened(name, path, read):
+        raise AssertionError(f"{path} was read again")
+    monkeypatch.setattr(sql_aggregates, "_streamed", opened)
+    engine = sql_aggregates.connect(db_url)
+    try:
+        assert sql_aggregates.refresh(engine, sql_aggregates.workbook_sources(workbooks)) == {}
+    finally:
+        engine.dispose()
@@ -0,0 +1,72 @@
+import io
+import os
+
+REQUIRED = ["a.xlsx", "b.xlsx"]
+
+
+def upload(store, name, content):
+    return store.ingest_stream(io.BytesIO(content), name)
+
+
+def snapshot_contents(snapshot):
+    contents = {}
+    for name in snapshot["files"]:
+        with open(os.path.join(snapshot["dir"], name), "rb") as f:
+            contents[name] = f.read()
+    return contents
+
+
+def test_identical_upload_is_stored_once(store):
+    entry, changed = upload(store, "a.xlsx", b"v1")
+    assert changed
+    again, changed = upload(store, "a.xlsx", b"v1")
+    assert not changed
+    assert again == entry
+    assert os.listdir(os.path.join(store.STORE_DIR, "objects")) == [entry["object"]]
+
+
+def test_promotion_waits_for_every_input(store):
+    upload(store, "a.xlsx", b"a1")
+    assert store.promote(REQUIRED) is None
+    assert store.current_snapshot() is None
+
+    upload(store, "b.xlsx", b"b1")
+    snapshot = store.promote(REQUIRED)
+    assert snapshot == store.current_snapshot()
+    assert snapshot_contents(snapshot) == {"a.xlsx": b"a1", "b.xlsx": b"b1"}
+
+
+def test_staged_versions_do_not_change_the_current_snapshot(store):
+    upload(store, "a.xlsx", b"a1")
+    upload(store, "b.xlsx", b"b1")
+    first = store.promote(REQUIRED)
+    upload(store, "a.xlsx", b"a2")
+    assert store.current_snapshot() == first
+    assert snapshot_contents(first)["a.xlsx"] == b"a1"
+
+    # Re-promoting an unchanged set keeps the snapshot and its timestamp
+    second = store.promote(REQUIRED)
+    assert second["id"] != first["id"]
+    assert store.promote(REQUIRED) == second
+    assert snapshot_contents(second) == {"a.xlsx": b"a2", "b.xlsx": b"b1"}
+
+
+def test_garbage_collection_keeps_recent_snapshots_and_staged_objects(store, monkeypatch):
+    monkeypatch.setattr(store, "KEEP_SNAPSHOTS", 2)
+    upload(store, "b.xlsx", b"b")
+    ids = []
+    for version in range(4):
+        upload(store, "a.xlsx", f"a{version}".encode())
+        ids.append(store.promote(REQUIRED)["id"])
+
+    assert sorted(os.listdir(os.path.join(store.STORE_DIR, "snapshots"))) == sorted(ids[-2:])
+    objects = set(os.listdir(os.path.join(store.STORE_DIR, "objects")))
+    kept = {entry["object"] for sid in ids[-2:]
+            for entry in store._snapshot_record(sid, None)["files"].values()}
+    assert objects == kept
+
+    # An object only staging references (received, not yet promoted) survives collection
+    pending, _ = upload(store, "a.xlsx", b"pending")
+    upload(store, "b.xlsx", b"b2")
+    store.promote(["b.xlsx"])
+    assert os.path.exists(store.object_path(pending))
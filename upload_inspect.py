@@ -0,0 +1,45 @@
+import pandas as pd
+from openpyxl import load_workbook
+
+from input_schema import header_problems
+
+# Runs in the request pool's worker processes: keep imports light (no Flask, no pipeline)
+
+PREVIEW_ROWS = 3
+
+
+def workbook_preview(file_path):
+    """Shape and first rows of the first sheet, reading only what is needed."""
+    try:
+        wb = load_workbook(file_path, read_only=True)
+    except Exception:
+        # Not an openpyxl workbook (e.g. legacy .xls): fall back to a full parse
+        df = pd.read_excel(file_path)
+        rows, cols = df.shape
+        return rows, cols, df.head(PREVIEW_ROWS).astype(str).to_dict(orient="records")
+    try:
+        ws = wb.worksheets[0]
+        max_row, max_col = ws.max_row, ws.max_column
+        if max_row is None or max_col is None:
+            # No stored dimensions: count rows with a streaming pass instead of loading them
+            max_row, max_col = 0, 0
+            for row in ws.iter_rows(values_only=True):
+                max_row += 1
+                max_col = max(max_col, len(row))
+    finally:
+        wb.close()
+
+    df = pd.read_excel(file_path, nrows=PREVIEW_ROWS)
+    rows = max(max_row - 1, 0)  # header row is not a data row
+    cols = max(max_col, df.shape[1])
+    return rows, cols, df.astype(str).to_dict(orient="records")
+
+
+def inspect_upload(file_path, schema=None, label=None):
+    """Preview of an uploaded workbook, plus its sheet/header problems when it is a known input.
+    `label` names the file in problem messages (uploads are stored under their content hash)."""
+    rows, cols, preview = workbook_preview(file_path)
+    problems = header_problems(file_path, schema) if schema is not None else []
+    if label is not None:
+        problems = [p.replace(file_path, label) for p in problems]
+    return {"rows": rows, "cols": cols, "preview": preview, "problems": problems}
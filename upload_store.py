@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: no cross-process locking
+    fcntl = None
+
+# Content-addressed store for input workbooks, shared by the API, the cron downloader and runs.
+#   objects/<sha256><ext>    every version ever received, written once and never modified
+#                            (the extension stays so Excel readers recognize the format)
+#   staging.json             filename -> latest version received (object, sha256, bytes, source, time)
+#   snapshots/<id>/          one complete input set: the files under their input names
+#                            (hard links to objects) plus manifest.json; <id> hashes the set
+#   current.json             the snapshot runs read, swapped atomically on promotion
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_DIR = os.getenv("CC_UPLOAD_STORE", os.path.join(BASE_DIR, "data", "upload_store"))
+
+CHUNK_SIZE = 1024 * 1024
+KEEP_SNAPSHOTS = 5        # older snapshots, and objects nobody references, are removed on promotion
+
+_thread_lock = threading.Lock()
+
+
+def _path(*parts):
+    return os.path.join(STORE_DIR, *parts)
+
+
+def object_path(entry):
+    """Path of the stored object of a staging/manifest entry."""
+    return _path("objects", entry["object"])
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _read_json(path, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _write_json(path, value):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(value, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _locked():
+    """Serialize manifest updates across threads and processes."""
+    os.makedirs(STORE_DIR, exist_ok=True)
+    with _thread_lock, open(_path(".lock"), "a") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+# --- Ingest ---
+
+def _stage(tmp_path, filename, sha256, size, source):
+    """Move a fully written temp file into objects/ and record it as the latest `filename`.
+    Returns (staging entry, changed)."""
+    obj = sha256 + os.path.splitext(filename)[1].lower()
+    target = _path("objects", obj)
+    with _locked():   # also keeps garbage collection from removing the object before it is staged
+        if os.path.exists(target):
+            os.remove(tmp_path)          # identical content already stored: nothing to rewrite
+        else:
+            try:
+                os.replace(tmp_path, target)
+            except OSError:              # temp file on another filesystem
+                shutil.move(tmp_path, target)
+        staging = _read_json(_path("staging.json"), {})
+        changed = staging.get(filename, {}).get("sha256") != sha256
+        if changed:
+            staging[filename] = {"object": obj, "sha256": sha256, "bytes": size, "source": source,
+                                 "received_at": _now()}
+            _write_json(_path("staging.json"), staging)
+        return dict(staging[filename]), changed
+
+
+def ingest_stream(stream, filename, source="api"):
+    """Store an upload read chunk by chunk; returns (staging entry, changed).
+
+    The content is hashed while it is written to a temp file, so a half-written upload
+    is never visible under any name, and re-sending an identical file changes nothing.
+    """
+    filename = os.path.basename(filename)
+    os.makedirs(_path("objects"), exist_ok=True)
+    tmp_path = _path("objects", f".{os.getpid()}.{threading.get_ident()}.part")
+    sha, size = hashlib.sha256(), 0
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                f.write(chunk)
+                sha.update(chunk)
+                size += len(chunk)
+        return _stage(tmp_path, filename, sha.hexdigest(), size, source)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def ingest_file(path, filename, source, sha256=None):
+    """Take over a complete file (moved into the store, not copied); returns (staging entry, changed)."""
+    if sha256 is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                h.update(chunk)
+        sha256 = h.hexdigest()
+    os.makedirs(_path("objects"), exist_ok=True)
+    return _stage(path, os.path.basename(filename), sha256, os.path.getsize(path), source)
+
+
+def adopt_directory(directory, filenames):
+    """Stage inputs found in a plain uploads directory for names not staged yet (one-time migration).
+    Files are copied, the directory is left as it was. Returns the names adopted."""
+    staging = staged()
+    adopted = []
+    for name in filenames:
+        path = os.path.join(directory, name)
+        if name in staging or not os.path.exists(path):
+            continue
+        os.makedirs(_path("objects"), exist_ok=True)
+        tmp_path = _path("objects", f".{os.getpid()}.{threading.get_ident()}.part")
+        shutil.copyfile(path, tmp_path)
+        ingest_file(tmp_path, name, source="adopted")
+        adopted.append(name)
+    return adopted
+
+
+def staged():
+    return _read_json(_path("staging.json"), {})
+
+
+# --- Snapshots ---
+
+def snapshot_id(files):
+    h = hashlib.sha256()
+    for name in sorted(files):
+        h.update(f"{name}\0{files[name]['sha256']}\n".encode())
+    return h.hexdigest()[:16]
+
+
+def _materialize(sid, files):
+    """Create snapshots/<sid> (if new): input-named links to the objects plus manifest.json."""
+    final_dir = _path("snapshots", sid)
+    if os.path.isdir(final_dir):
+        return final_dir
+    tmp_dir = _path("snapshots", f".{sid}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name, entry in files.items():
+        try:
+            os.link(object_path(entry), os.path.join(tmp_dir, name))
+        except OSError:              # no hard links here: fall back to a copy
+            shutil.copyfile(object_path(entry), os.path.join(tmp_dir, name))
+    _write_json(os.path.join(tmp_dir, "manifest.json"), {"id": sid, "files": files, "created_at": _now()})
+    os.replace(tmp_dir, final_dir)
+    return final_dir
+
+
+def _snapshot_record(sid, promoted_at):
+    manifest = _read_json(_path("snapshots", sid, "manifest.json"), None)
+    if manifest is None:
+        return None
+    return {"id": sid, "dir": _path("snapshots", sid), "files": manifest["files"], "promoted_at": promoted_at}
+
+
+def current_snapshot():
+    """The snapshot runs read ({"id", "dir", "files", "promoted_at"}), or None before the first promotion."""
+    pointer = _read_json(_path("current.json"), None)
+    if pointer is None:
+        return None
+    return _snapshot_record(pointer["id"], pointer["promoted_at"])
+
+
+def promote(required):
+    """Make the latest staged version of every `required` input the current snapshot.
+
+    Returns the current snapshot record; None (nothing promoted) while any input has never
+    been staged. Promoting an unchanged set keeps the existing snapshot and its timestamp.
+    """
+    with _locked():
+        staging = _read_json(_path("staging.json"), {})
+        if any(name not in staging for name in required):
+            return None
+        files = {name: staging[name] for name in required}
+        sid = snapshot_id(files)
+        pointer = _read_json(_path("current.json"), None)
+        if pointer is None or pointer["id"] != sid:
+            _materialize(sid, files)
+            pointer = {"id": sid, "promoted_at": _now()}
+            _write_json(_path("current.json"), pointer)
+            history = [h for h in _read_json(_path("history.json"), []) if h["id"] != sid] + [pointer]
+            history = history[-KEEP_SNAPSHOTS:]
+            _write_json(_path("history.json"), history)
+            _collect_garbage({h["id"] for h in history}, staging)
+            print(f"Promoted input snapshot {sid}.")
+        return _snapshot_record(sid, pointer["promoted_at"])
+
+
+def _collect_garbage(keep, staging):
+    """Drop snapshots not in `keep` and objects neither they nor staging use. Caller holds the store lock."""
+    referenced = {entry["object"] for entry in staging.values()}
+    for sid in os.listdir(_path("snapshots")):
+        if sid.startswith("."):
+            continue
+        if sid not in keep:
+            shutil.rmtree(_path("snapshots", sid), ignore_errors=True)
+            continue
+        manifest = _read_json(_path("snapshots", sid, "manifest.json"), {"files": {}})
+        referenced.update(entry["object"] for entry in manifest["files"].values())
+    for name in os.listdir(_path("objects")):
+        if not name.startswith(".") and name not in referenced:
+            try:
+                os.remove(_path("objects", name))
+            except OSError:
+                pass